@@ -0,0 +1,302 @@
+"""
+Script Name: data_generator.py
+Script Description: This script generates synthetic raw files in the formats of the Mobilithek and Meteostat sources
+Usage: python -m benchmarks.data_generator --output-dir DIR [--scale N] [--first-year Y] [--last-year Y]
+       [--counting-stations N] [--weather-stations N] [--weather-granularity G] [--base-url URL]
+       (run from the project directory)
+"""
+
+
+# Python imports
+from typing import Dict, List
+import os, json, gzip, random, argparse, datetime
+
+# Third party imports
+
+# Self imports
+
+
+# the counting stations of today's data with the first year they were counted
+COUNTING_STATIONS = [
+    ("Deutzer Brücke", 2009), ("Hohenzollernbrücke", 2009), ("Neumarkt", 2009), ("Zülpicher Straße", 2009),
+    ("Bonner Straße", 2011), ("Venloer Straße", 2014), ("A.-Schütte-Allee", 2016), ("Vorgebirgspark", 2016),
+    ("A.-Silbermann-Weg", 2016), ("Stadtwald", 2016), ("Niederländer Ufer", 2016), ("Vorgebirgswall", 2018),
+    ("Universitäts-straße", 2020), ("Rodenkirchener Brücke", 2021), ("Severinsbrücke", 2021),
+    ("Neusser Straße", 2021), ("Hohe Pforte", 2022)
+]
+WEATHER_STATIONS = [("10513", "Köln-Bonn Airport"), ("D2968", "Köln-Stammheim")]
+GERMAN_MONTHS = ["Januar", "Februar", "März", "April", "Mai", "Juni",
+                 "Juli", "August", "September", "Oktober", "November", "Dezember"]
+
+
+class SyntheticDataGenerator:
+    """
+    A class to generate synthetic raw files in the exact formats of the sources.
+
+    Mobilithek files follow the format of their year: up to 2015 Latin-1 with plain integer counts and a
+    trailing 'Jahressumme' row, 2016-2020 UTF-8 with BOM and from 2016 on counts with '.' as thousands separator
+    ("46.319"), 2021 and later Latin-1 again. Meteostat files are gzipped header-less CSVs, monthly ones cover
+    the full station history, daily and hourly ones a year before and after the years of bicycle traffic.
+    A `source_info.json` pointing at `base_url` is written next to the files.
+
+    The default size is today's data (17 counting stations, 2 weather stations, 2009-2022); `scale`
+    multiplies the number of counting and weather stations. The years are bounded by the declared
+    schemas of config/source_schema.py.
+
+    Attributes:
+        output_dir (str): The directory of the generated files.
+        first_year (int): The first year of bicycle traffic.
+        last_year (int): The last year of bicycle traffic.
+        counting_stations (int): The number of counting stations.
+        weather_stations (int): The number of weather stations.
+        weather_station_ids (list): The ids of the weather stations, today's ones and synthetic ones by default.
+        weather_granularity (str): The grain of the weather files, 'monthly', 'daily' or 'hourly'.
+        base_url (str): The URL under which the generated files will be served.
+        seed (int): The seed of the random values, the same arguments always generate the same files.
+
+    Methods:
+        generate() -> Dict: Generates all the files and returns the matching source information.
+        _counting_stations() -> List: Returns the (name, first year) of every counting station.
+        _write_mobilithek_file(year: int, stations: List, rng: random.Random) -> str: Writes the file of a year.
+        _write_meteostat_file(station_id: str, rng: random.Random, with_details: bool) -> str:
+            Writes the monthly file of a weather station.
+        _write_meteostat_time_file(station_id: str, rng: random.Random, with_details: bool) -> str:
+            Writes the daily or hourly file of a weather station.
+        _format_count(count: int, year: int) -> str: Formats a monthly count the way the year's file does.
+    """
+
+    def __init__(self, output_dir: str, scale: int = 1, first_year: int = 2009, last_year: int = 2022,
+                 counting_stations: int = None, weather_stations: int = None, weather_station_ids: List = None,
+                 weather_granularity: str = "monthly", base_url: str = "http://127.0.0.1:8765", seed: int = 0) -> None:
+        self.output_dir = output_dir
+        self.first_year = first_year
+        self.last_year = last_year
+        self.counting_stations = counting_stations or len(COUNTING_STATIONS) * scale
+        self.weather_stations = len(weather_station_ids) if weather_station_ids else (
+            weather_stations or len(WEATHER_STATIONS) * scale)
+        self.weather_station_ids = weather_station_ids
+        self.weather_granularity = weather_granularity
+        self.base_url = base_url.rstrip("/")
+        self.seed = seed
+
+    def generate(self) -> Dict:
+        """
+        Generates all the files and returns the matching source information.
+
+        Parameters:
+            None
+
+        Returns:
+            source_info (dict): The source information (same layout as config/source_info.json) of the generated files.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        rng = random.Random(self.seed)
+        stations = self._counting_stations()
+
+        data_urls = list()
+        for year in range(self.first_year, self.last_year + 1):
+            file_name = self._write_mobilithek_file(year, [name for name, since in stations if since <= year], rng)
+            data_urls.append({"year": str(year), "url": f"{self.base_url}/{file_name}", "data_type": "csv"})
+
+        weather_stations = list()
+        for index in range(self.weather_stations):
+            station_id, station_name = (WEATHER_STATIONS[index] if index < len(WEATHER_STATIONS)
+                                        else (f"S{index:04d}", f"Synthetic Station {index}"))
+            if self.weather_station_ids:
+                station_id, station_name = self.weather_station_ids[index], f"Synthetic Station {index}"
+            # like D2968, every second station only reports temperature and precipitation
+            if self.weather_granularity == "monthly":
+                self._write_meteostat_file(station_id, rng, with_details=index % 2 == 0)
+            else:
+                self._write_meteostat_time_file(station_id, rng, with_details=index % 2 == 0)
+            weather_stations.append({"station_id": station_id, "station_name": station_name})
+
+        source_info = {"data_sources": [
+            {"source_name": "Mobilithek", "source_address": "https://mobilithek.info/",
+             "data_details": "Synthetic bicycle traffic", "data_urls": data_urls},
+            {"source_name": "Meteostat", "source_address": "https://meteostat.net/en/",
+             "data_details": "Synthetic weather and climate data",
+             "api_endpoint": f"{self.base_url}/{{station}}.csv.gz",
+             "stations": weather_stations, "data_type": "gzip",
+             "year_window": [self.first_year, self.last_year], "granularity": self.weather_granularity}
+        ]}
+
+        with open(os.path.join(self.output_dir, "source_info.json"), 'w', encoding='utf-8') as file:
+            json.dump(source_info, file, indent=4, ensure_ascii=False)
+
+        return source_info
+
+    def _counting_stations(self) -> List:
+        """
+        Returns the counting stations, today's ones first and further synthetic ones spread over the years.
+
+        Parameters:
+            None
+
+        Returns:
+            stations (list): A list of (station name, first counted year) tuples.
+        """
+        stations = [(name, max(since, self.first_year)) for name, since in COUNTING_STATIONS[:self.counting_stations]]
+        years = self.last_year - self.first_year + 1
+
+        for index in range(len(stations), self.counting_stations):
+            stations.append((f"Zählstelle {index + 1}", self.first_year + index % years))
+
+        return stations
+
+    def _write_mobilithek_file(self, year: int, stations: List, rng: random.Random) -> str:
+        """
+        Writes the bicycle traffic file of a year.
+
+        Parameters:
+            year (int): The year of the file.
+            stations (list): The names of the counting stations counted in the year.
+            rng (random.Random): The random generator.
+
+        Returns:
+            file_name (str): The name of the written file.
+        """
+        lines = [";".join(["Monat"] + stations)]
+
+        yearly_totals = [0] * len(stations)
+        for month_index, month in enumerate(GERMAN_MONTHS):
+            # more cycling in summer than in winter
+            season_factor = 1.0 - 0.5 * abs(month_index - 6) / 6
+            counts = list()
+            for station_index in range(len(stations)):
+                if rng.random() < 0.02:
+                    counts.append(rng.choice(["", "-"]))
+                    continue
+                count = int(rng.uniform(5000, 150000) * season_factor)
+                yearly_totals[station_index] += count
+                counts.append(self._format_count(count, year))
+
+            label = month if year < 2016 else f"{month} {year}"
+            lines.append(";".join([label] + counts))
+
+        if year < 2016:
+            lines.append(";".join(["Jahressumme"] + [str(total) for total in yearly_totals]))
+
+        file_name = f"mobilithek_bicycle_traffic_{year}.csv"
+        content = "\n".join(lines) + "\n"
+        with open(os.path.join(self.output_dir, file_name), 'wb') as file:
+            if 2016 <= year <= 2020:
+                file.write(content.encode("utf-8-sig"))
+            else:
+                file.write(content.encode("latin-1"))
+
+        return file_name
+
+    def _write_meteostat_file(self, station_id: str, rng: random.Random, with_details: bool) -> str:
+        """
+        Writes the monthly weather file of a station (year, month, tavg, tmin, tmax, prcp, wspd, pres, tsun).
+
+        Parameters:
+            station_id (str): The id of the weather station.
+            rng (random.Random): The random generator.
+            with_details (bool): Whether the station reports wind speed, pressure and sunshine.
+
+        Returns:
+            file_name (str): The name of the written file.
+        """
+        lines = list()
+
+        for year in range(1957, self.last_year + 2):
+            for month in range(1, 13):
+                tavg = 10.0 - 9.0 * abs(month - 7) / 6 + rng.gauss(0, 2)
+                values = [f"{tavg:.1f}", f"{tavg - rng.uniform(3, 7):.1f}", f"{tavg + rng.uniform(3, 7):.1f}",
+                          f"{rng.uniform(4, 200):.1f}"]
+                if with_details:
+                    values += [f"{rng.uniform(8, 20):.1f}", f"{rng.uniform(1004, 1030):.1f}", f"{rng.randint(9, 310) * 60}"]
+                else:
+                    values += ["", "", ""]
+                if rng.random() < 0.01:
+                    values = [""] * len(values)
+                lines.append(",".join([str(year), str(month)] + values))
+
+        file_name = f"{station_id}.csv.gz"
+        with gzip.open(os.path.join(self.output_dir, file_name), 'wt', encoding='utf-8') as file:
+            file.write("\n".join(lines) + "\n")
+
+        return file_name
+
+    def _write_meteostat_time_file(self, station_id: str, rng: random.Random, with_details: bool) -> str:
+        """
+        Writes the daily (date, tavg, tmin, tmax, prcp, snow, wdir, wspd, wpgt, pres, tsun) or hourly (date, hour,
+        temp, dwpt, rhum, prcp, snow, wdir, wspd, wpgt, pres, tsun, coco) weather file of a station.
+
+        Parameters:
+            station_id (str): The id of the weather station.
+            rng (random.Random): The random generator.
+            with_details (bool): Whether the station reports wind, pressure and sunshine.
+
+        Returns:
+            file_name (str): The name of the written file.
+        """
+        lines = list()
+        hours = range(24) if self.weather_granularity == "hourly" else [None]
+        day = datetime.date(self.first_year - 1, 1, 1)
+
+        while day.year <= self.last_year + 1:
+            for hour in hours:
+                temp = 10.0 - 9.0 * abs(day.month - 7) / 6 + rng.gauss(0, 3)
+                prcp = f"{rng.uniform(0.1, 20):.1f}" if rng.random() < 0.3 else "0.0"
+                if hour is None:
+                    values = [f"{temp:.1f}", f"{temp - rng.uniform(2, 6):.1f}", f"{temp + rng.uniform(2, 6):.1f}", prcp, ""]
+                else:
+                    values = [f"{temp:.1f}", f"{temp - rng.uniform(1, 5):.1f}", str(rng.randint(40, 100)), prcp, ""]
+                if with_details:
+                    values += [str(rng.randint(0, 359)), f"{rng.uniform(5, 25):.1f}", f"{rng.uniform(20, 60):.1f}",
+                               f"{rng.uniform(1004, 1030):.1f}", str(rng.randint(0, 900 if hour is None else 60))]
+                else:
+                    values += ["", "", "", "", ""]
+                if hour is not None:
+                    values.append(str(rng.randint(1, 8)) if with_details else "")
+                if rng.random() < 0.01:
+                    values = [""] * len(values)
+                time_fields = [day.isoformat()] if hour is None else [day.isoformat(), str(hour)]
+                lines.append(",".join(time_fields + values))
+            day += datetime.timedelta(days=1)
+
+        file_name = f"{station_id}.csv.gz"
+        with gzip.open(os.path.join(self.output_dir, file_name), 'wt', encoding='utf-8') as file:
+            file.write("\n".join(lines) + "\n")
+
+        return file_name
+
+    def _format_count(self, count: int, year: int) -> str:
+        """
+        Formats a monthly count the way the file of the year does.
+
+        Parameters:
+            count (int): The monthly count.
+            year (int): The year of the file.
+
+        Returns:
+            count (str): A plain integer up to 2015, with '.' as thousands separator from 2016 on ("46.319", "463").
+        """
+        if year < 2016:
+            return str(count)
+
+        return f"{count:,}".replace(",", ".")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic Mobilithek and Meteostat raw files.")
+    parser.add_argument("--output-dir", required=True, help="directory of the generated files")
+    parser.add_argument("--scale", type=int, default=1, help="multiplier of the counting and weather stations")
+    parser.add_argument("--first-year", type=int, default=2009, help="first year of bicycle traffic")
+    parser.add_argument("--last-year", type=int, default=2022, help="last year of bicycle traffic")
+    parser.add_argument("--counting-stations", type=int, default=None, help="number of counting stations")
+    parser.add_argument("--weather-stations", type=int, default=None, help="number of weather stations")
+    parser.add_argument("--weather-granularity", default="monthly", choices=["monthly", "daily", "hourly"],
+                        help="grain of the weather files")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8765", help="URL the files will be served from")
+    args = parser.parse_args()
+
+    generator = SyntheticDataGenerator(args.output_dir, scale=args.scale, first_year=args.first_year,
+                                       last_year=args.last_year, counting_stations=args.counting_stations,
+                                       weather_stations=args.weather_stations,
+                                       weather_granularity=args.weather_granularity, base_url=args.base_url)
+    generator.generate()
+    print(f"Succeed: Synthetic raw files written to {args.output_dir}")
@@ -0,0 +1,247 @@
+"""
+Script Name: etl_benchmark.py
+Script Description: This script times the extract, transform and load stages on synthetic data of increasing size
+Usage: python -m benchmarks.etl_benchmark [--scales 1 10 100] [--repeat N] [--work-dir DIR] [--results FILE]
+       (run from the project directory)
+"""
+
+
+# Python imports
+from datetime import datetime
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from typing import Dict, List
+import os, sys, json, shutil, tempfile, argparse, threading, subprocess
+
+# Third party imports
+
+# Self imports
+from benchmarks.data_generator import SyntheticDataGenerator
+
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ["extract", "transform", "load"]
+
+
+class QuietRequestHandler(SimpleHTTPRequestHandler):
+    """
+    A class to serve the generated files without logging every request.
+    """
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class ETLBenchmark:
+    """
+    A class to benchmark the ETL stages on synthetic data at several multiples of today's data size.
+
+    For every scale the synthetic raw files are generated and served on localhost, and the unmodified
+    pipeline (main.py) runs in a separate process inside a fresh working directory, so every run starts
+    without downloaded files, raw cache or database. The stage timings are taken from the run report of
+    the pipeline instrumentation. Results are appended to a JSON lines file together with the current git
+    commit, so runs of different commits can be compared.
+
+    Attributes:
+        scales (list): The multiples of today's data size, e.g. [1, 10, 100].
+        repeat (int): The number of pipeline runs per scale (the fastest run of each stage is kept).
+        work_dir (str): The directory of the generated data and the working directories of the runs.
+        results_path (str): The JSON lines file the results are appended to.
+        results (list): A list of dictionaries with the timings of each scale and stage.
+
+    Methods:
+        run() -> List: Runs the pipeline at every scale and records the results.
+        report() -> None: Prints the results next to those of the previously benchmarked commit.
+        _run_scale(scale: int) -> List: Generates, serves and benchmarks the data of a scale.
+        _run_pipeline(run_dir: str) -> Dict: Runs the pipeline once and returns its run report.
+        _serve(directory: str) -> ThreadingHTTPServer: Serves a directory on a free localhost port.
+        _git_commit() -> str: Returns the current git commit.
+        _load_results() -> List: Reads the recorded results.
+    """
+
+    def __init__(self, scales: List = None, repeat: int = 1, work_dir: str = None,
+                 results_path: str = os.path.join(PROJECT_DIR, "benchmarks", "results", "etl_benchmark.jsonl")) -> None:
+        self.scales = scales or [1, 10, 100]
+        self.repeat = repeat
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix="etl_benchmark_")
+        self.results_path = results_path
+        self.results = list()
+
+    def run(self) -> List:
+        """
+        Runs the pipeline at every scale and appends the results to the results file.
+
+        Parameters:
+            None
+
+        Returns:
+            results (list): A list of dictionaries with the commit, scale, stage, wall/CPU seconds, bytes and rows.
+        """
+        commit = self._git_commit()
+        recorded_at = datetime.now().isoformat(timespec='seconds')
+
+        for scale in self.scales:
+            for result in self._run_scale(scale):
+                self.results.append({"commit": commit, "recorded_at": recorded_at, "scale": scale, **result})
+
+        os.makedirs(os.path.dirname(self.results_path), exist_ok=True)
+        with open(self.results_path, 'a') as file:
+            for result in self.results:
+                file.write(json.dumps(result) + "\n")
+
+        return self.results
+
+    def report(self) -> None:
+        """
+        Prints the results next to those of the previously benchmarked commit.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        commit = self.results[0]["commit"] if self.results else None
+        previous = dict()
+        for result in self._load_results():
+            if result["commit"] != commit:
+                previous[(result["scale"], result["stage"])] = result
+
+        print(f"{'scale':>6}  {'stage':<10}{'wall s':>10}{'cpu s':>10}{'MB in':>10}{'MB out':>10}{'rows':>12}"
+              f"{'previous s':>12}{'change':>9}")
+        for result in self.results:
+            before = previous.get((result["scale"], result["stage"]))
+            change = (f"{(result['wall_seconds'] / before['wall_seconds'] - 1) * 100:+8.1f}%"
+                      if before and before["wall_seconds"] else f"{'-':>9}")
+            print(f"{result['scale']:>5}x  {result['stage']:<10}{result['wall_seconds']:>10.3f}"
+                  f"{result['cpu_seconds']:>10.3f}{(result['bytes_downloaded'] + result['bytes_read']) / 1e6:>10.2f}"
+                  f"{result['bytes_written'] / 1e6:>10.2f}{result['rows']:>12}"
+                  f"{(before['wall_seconds'] if before else float('nan')):>12.3f}{change}")
+
+    def _run_scale(self, scale: int) -> List:
+        """
+        Generates, serves and benchmarks the data of a scale.
+
+        Parameters:
+            scale (int): The multiple of today's data size.
+
+        Returns:
+            results (list): The fastest wall time of every stage over the runs, with its CPU time, bytes and rows.
+        """
+        served_dir = os.path.join(self.work_dir, f"scale_{scale}", "served")
+        run_dir = os.path.join(self.work_dir, f"scale_{scale}", "run")
+        server = self._serve(served_dir)
+
+        try:
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+            source_info = SyntheticDataGenerator(served_dir, scale=scale, base_url=base_url).generate()
+            print(f"Succeed: {scale}x synthetic data generated in {served_dir}")
+
+            best = dict()
+            for _ in range(self.repeat):
+                shutil.rmtree(run_dir, ignore_errors=True)
+                os.makedirs(os.path.join(run_dir, "config"))
+                os.makedirs(os.path.join(run_dir, "data", "raw"))
+                with open(os.path.join(run_dir, "config", "source_info.json"), 'w', encoding='utf-8') as file:
+                    json.dump(source_info, file, ensure_ascii=False)
+
+                report = self._run_pipeline(run_dir)
+                for stage_span in report["spans"]["children"]:
+                    if stage_span["name"] in STAGES and (stage_span["name"] not in best or
+                                                         stage_span["wall_seconds"] < best[stage_span["name"]]["wall_seconds"]):
+                        best[stage_span["name"]] = stage_span
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        return [{"stage": stage, "wall_seconds": best[stage]["wall_seconds"], "cpu_seconds": best[stage]["cpu_seconds"],
+                 "bytes_downloaded": best[stage]["bytes_downloaded"], "bytes_read": best[stage]["bytes_read"],
+                 "bytes_written": best[stage]["bytes_written"], "rows": best[stage]["rows"]}
+                for stage in STAGES if stage in best]
+
+    def _run_pipeline(self, run_dir: str) -> Dict:
+        """
+        Runs the pipeline once in its own process and working directory.
+
+        Parameters:
+            run_dir (str): The working directory of the run, with the source information in config/.
+
+        Returns:
+            report (dict): The run report written by the pipeline instrumentation.
+        """
+        completed = subprocess.run([sys.executable, os.path.join(PROJECT_DIR, "main.py")], cwd=run_dir,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        report_dir = os.path.join(run_dir, "data", "run_reports")
+
+        if completed.returncode != 0 or not os.path.isdir(report_dir) or not os.listdir(report_dir):
+            print(completed.stdout[-2000:])
+            print(f"Error: The pipeline run in {run_dir} failed")
+            sys.exit(1)
+
+        with open(os.path.join(report_dir, sorted(os.listdir(report_dir))[-1]), 'r') as file:
+            return json.load(file)
+
+    def _serve(self, directory: str) -> ThreadingHTTPServer:
+        """
+        Serves a directory on a free localhost port in a background thread.
+
+        Parameters:
+            directory (str): The directory to serve.
+
+        Returns:
+            server (ThreadingHTTPServer): The running server.
+        """
+        os.makedirs(directory, exist_ok=True)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietRequestHandler, directory=directory))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        return server
+
+    def _git_commit(self) -> str:
+        """
+        Returns the current git commit (with a '+dirty' suffix for uncommitted changes).
+
+        Parameters:
+            None
+
+        Returns:
+            commit (str): The abbreviated commit hash, 'unknown' outside of a git checkout.
+        """
+        try:
+            commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True,
+                                    text=True, check=True).stdout.strip()
+            dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_DIR,
+                                   capture_output=True, text=True, check=True).stdout.strip()
+            return commit + ("+dirty" if dirty else "")
+        except (OSError, subprocess.CalledProcessError):
+            return "unknown"
+
+    def _load_results(self) -> List:
+        """
+        Reads the recorded results.
+
+        Parameters:
+            None
+
+        Returns:
+            results (list): The recorded results in the order they were recorded, empty without results file.
+        """
+        if not os.path.exists(self.results_path):
+            return list()
+
+        with open(self.results_path, 'r') as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the ETL stages on synthetic data at several scales")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="multiples of today's data size")
+    parser.add_argument("--repeat", type=int, default=1, help="pipeline runs per scale (the fastest is kept)")
+    parser.add_argument("--work-dir", default=None, help="directory of the generated data (temporary by default)")
+    parser.add_argument("--results", default=None, help="JSON lines file the results are appended to")
+    args = parser.parse_args()
+
+    etl_benchmark = ETLBenchmark(scales=args.scales, repeat=args.repeat, work_dir=args.work_dir,
+                                 **({"results_path": args.results} if args.results else {}))
+    etl_benchmark.run()
+    etl_benchmark.report()
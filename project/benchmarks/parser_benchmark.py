@@ -0,0 +1,159 @@
+"""
+Script Name: parser_benchmark.py
+Script Description: This script measures the parse throughput of every pandas CSV parser engine on the raw files
+Usage: python -m benchmarks.parser_benchmark [--raw-dir DIR] [--repeat N] (run from the project directory)
+"""
+
+
+# Python imports
+from typing import Dict, List, Tuple
+import os, time, argparse
+
+# Third party imports
+import pandas as pd
+
+# Self imports
+from config.config_var import *
+from etl.transform.data_transformer import DataTransformer
+
+
+ENGINES = ["c", "python", "pyarrow"]
+
+
+class ParserBenchmark:
+    """
+    A class to benchmark the CSV parser engines on the downloaded raw files.
+
+    Every file is parsed with the declared schema of its source, once per engine and repetition,
+    without the fallback of the transformer so that a failing engine is reported as such.
+
+    Attributes:
+        raw_dir (str): The directory containing the raw files.
+        repeat (int): The number of timed parses of each file per engine (the best one is kept).
+        results (list): A list of dictionaries with the throughput of each source and engine.
+
+    Methods:
+        run() -> List: Parses every raw file with every engine and aggregates the throughput per source.
+        report() -> None: Prints the throughput table.
+        _list_raw_files() -> List: Returns the (source, schema, file path) of every raw file.
+        _time_parse(file_path: str, read_options: Dict) -> Tuple: Returns the best parse time and row count of a file.
+    """
+
+    def __init__(self, raw_dir: str = DOWNLOADED_RAW_FILE_PATH, repeat: int = 3) -> None:
+        self.raw_dir = raw_dir
+        self.repeat = repeat
+        self.results = list()
+        self._transformer = DataTransformer()
+
+    def run(self) -> List:
+        """
+        Parses every raw file with every engine and aggregates the throughput per source.
+
+        Parameters:
+            None
+
+        Returns:
+            results (list): A list of dictionaries with the source, engine, bytes, rows, seconds and MB/s.
+        """
+        totals = dict()
+
+        for source, schema, file_path in self._list_raw_files():
+            read_options = self._transformer._get_read_options(schema)
+
+            for engine in ENGINES:
+                total = totals.setdefault((source, engine), {"bytes": 0, "rows": 0, "seconds": 0.0, "error": None})
+
+                if not self._transformer._is_engine_available(engine):
+                    total["error"] = "not installed"
+                    continue
+
+                try:
+                    read_options["engine"] = engine
+                    seconds, rows = self._time_parse(file_path, read_options)
+                except Exception as e:
+                    total["error"] = f"failed: {str(e)[:60]}"
+                    continue
+
+                total["bytes"] += os.path.getsize(file_path)
+                total["rows"] += rows
+                total["seconds"] += seconds
+
+        self.results = [
+            {"source": source, "engine": engine, **total,
+             "mb_per_sec": total["bytes"] / 1e6 / total["seconds"] if total["seconds"] else None}
+            for (source, engine), total in totals.items()
+        ]
+        return self.results
+
+    def report(self) -> None:
+        """
+        Prints the throughput table.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        print(f"{'source':<12}{'engine':<10}{'files MB':>10}{'rows':>12}{'seconds':>10}{'MB/s':>10}  note")
+        for result in self.results:
+            mb_per_sec = f"{result['mb_per_sec']:.2f}" if result["mb_per_sec"] is not None else "-"
+            print(f"{result['source']:<12}{result['engine']:<10}{result['bytes'] / 1e6:>10.2f}{result['rows']:>12}"
+                  f"{result['seconds']:>10.4f}{mb_per_sec:>10}  {result['error'] or ''}")
+
+    def _list_raw_files(self) -> List:
+        """
+        Returns the (source, schema, file path) of every raw file of the known sources.
+
+        Parameters:
+            None
+
+        Returns:
+            raw_files (list): The raw files with the schema they are parsed with.
+        """
+        raw_files = list()
+
+        for file_name in sorted(os.listdir(self.raw_dir)):
+            file_path = os.path.join(self.raw_dir, file_name)
+
+            if file_name.startswith("mobilithek_") and file_name.endswith(".csv"):
+                year = int(file_name.split("_")[-1].split(".")[0])
+                raw_files.append(("Mobilithek", self._transformer._get_schema("Mobilithek", year), file_path))
+            elif file_name.startswith("meteostat_") and file_name.endswith(".csv.gz"):
+                raw_files.append(("Meteostat", self._transformer._get_schema("Meteostat"), file_path))
+
+        return raw_files
+
+    def _time_parse(self, file_path: str, read_options: Dict) -> Tuple:
+        """
+        Returns the best parse time of a file over `repeat` runs.
+
+        Parameters:
+            file_path (str): The path of the raw file.
+            read_options (dict): The keyword arguments of pd.read_csv.
+
+        Returns:
+            timing (tuple): The best parse time in seconds and the number of parsed rows.
+        """
+        best_seconds, rows = None, 0
+
+        for _ in range(self.repeat):
+            started_at = time.perf_counter()
+            data_df = pd.read_csv(file_path, **read_options)
+            seconds = time.perf_counter() - started_at
+
+            best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+            rows = len(data_df)
+
+        return best_seconds, rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parse throughput of the pandas CSV engines on the raw files")
+    parser.add_argument("--raw-dir", default=DOWNLOADED_RAW_FILE_PATH, help="directory of the downloaded raw files")
+    parser.add_argument("--repeat", type=int, default=3, help="timed parses per file and engine")
+    args = parser.parse_args()
+
+    parser_benchmark = ParserBenchmark(raw_dir=args.raw_dir, repeat=args.repeat)
+    parser_benchmark.run()
+    parser_benchmark.report()
@@ -1,7 +1,120 @@
-import os
-
-BASE_DIR = os.getcwd()
-SOURCE_INFO_PATH = os.path.join(BASE_DIR, "config", "source_info.json")
-DOWNLOADED_RAW_FILE_PATH = os.path.join(BASE_DIR, "data", "raw")
-DB_PATH = "fau_data_engineering_ss23.sqlite"
-# DB_PATH = os.path.join(BASE_DIR, "data", "processed", "fau_data_engineering_ss23.sqlite")
\ No newline at end of file
+import os
+
+BASE_DIR = os.getcwd()
+SOURCE_INFO_PATH = os.path.join(BASE_DIR, "config", "source_info.json")
+DOWNLOADED_RAW_FILE_PATH = os.path.join(BASE_DIR, "data", "raw")
+DB_PATH = "fau_data_engineering_ss23.sqlite"
+# DB_PATH = os.path.join(BASE_DIR, "data", "processed", "fau_data_engineering_ss23.sqlite")
+
+# extraction concurrency (EXTRACT_MAX_WORKERS = 1 downloads the files one by one)
+EXTRACT_MAX_WORKERS = 8
+EXTRACT_MAX_PER_HOST = 4
+
+# persistent raw-file cache, revalidated with conditional requests (see etl/extract/raw_cache.py)
+RAW_CACHE_ENABLED = True
+RAW_CACHE_PATH = os.path.join(BASE_DIR, "data", "raw_cache")
+RAW_CACHE_MAX_BYTES = 512 * 1024 * 1024
+RAW_CACHE_LOCK_TIMEOUT = 30.0  # seconds after which the index lock of a crashed process is broken
+
+# streamed downloads: chunk size in bytes and seconds between two progress lines
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_PROGRESS_INTERVAL = 5.0
+
+# shared HTTP session of the extractor (see etl/extract/http_session.py)
+HTTP_POOL_SIZE = 8
+HTTP_CONNECT_TIMEOUT = 10.0
+HTTP_READ_TIMEOUT = 60.0
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_BASE = 0.5
+HTTP_BACKOFF_MAX = 30.0
+HTTP_RETRY_STATUS_CODES = (408, 425, 429, 500, 502, 503, 504)
+HTTP_HEDGE_AFTER = None  # seconds without response before a duplicate request is sent, None disables hedging
+
+# per-file transformation in a process pool (TRANSFORM_PARALLEL = False forces serial execution for debugging)
+TRANSFORM_PARALLEL = True
+TRANSFORM_MAX_WORKERS = os.cpu_count() or 1
+# start method of the worker processes: the pools are created while other threads download (streaming, task graph),
+# a forked worker could inherit their held locks, "spawn" is used where forkserver is unavailable (Windows)
+TRANSFORM_START_METHOD = "forkserver"
+
+# compact transformed frames: smallest integer types, integer month keys and float32 where it is lossless
+TRANSFORM_COMPACT_DTYPES = False
+COMPACT_MAX_DECIMALS = 2  # float32 is used if rounding to at most this many decimals restores the float64 values
+
+# years of the Meteostat rows ("year_window" of the source in source_info.json overrides it), the gzip files are
+# decoded in blocks and the rows outside the window are dropped before they are parsed
+METEOSTAT_YEAR_WINDOW = (2009, 2022)
+READ_BLOCK_SIZE = 1024 * 1024  # bytes
+
+# grain of the Meteostat files ("granularity" of the source in source_info.json overrides it, "resample" resamples
+# the rows to a coarser grain while reading), the rows are keyed by integers: YYYYMM, YYYYMMDD or YYYYMMDDHH
+METEOSTAT_GRANULARITY = "monthly"
+TIME_KEY_SCALES = {"monthly": 100, "daily": 100 ** 2, "hourly": 100 ** 3}  # time key // scale = year
+
+# chunked mode: files are read, cleaned and loaded chunk by chunk, a chunk holds at most the memory budget
+TRANSFORM_MEMORY_BUDGET = 64 * 1024 ** 2  # bytes
+TRANSFORM_BYTES_PER_VALUE = 64  # estimated memory of a parsed value, including its row in the database inserts
+
+# incremental load: only the partitions (years, stations) whose raw file changed are transformed and upserted
+LOAD_INCREMENTAL = False
+
+# CSV parser engine used when the engine declared in source_schema.py is unavailable or fails
+PARSER_FALLBACK_ENGINE = "c"
+
+# bulk SQLite load: pragma profile applied while loading and rows per executemany batch
+LOAD_BULK = True
+LOAD_BATCH_SIZE = 10000
+LOAD_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # with WAL a power loss may lose the last commit but never corrupts the database
+    "cache_size": -65536,  # 64 MiB
+    "temp_store": "MEMORY"
+}
+
+# additional sinks of the load stage next to the SQLite database, e.g. ["columnar"]
+LOAD_SINKS = []
+COLUMNAR_SINK_PATH = os.path.join(BASE_DIR, "data", "processed", "columnar")
+COLUMNAR_SINK_FORMAT = "parquet"  # or "feather"
+COLUMNAR_SINK_COMPRESSION = "zstd"
+
+# store the data in long format fact tables (month, station, metric) with the wide tables as views
+LOAD_NORMALIZED = False
+
+# precomputed bicycle x weather month table and rollups, built like the analysis of report.ipynb (an added load
+# step, enabled with DataLoader(analytics=True) or python main.py run --analytics)
+LOAD_ANALYTICS = False
+ANALYTICS_TRAFFIC_STATIONS = ["Deutzer Brücke", "Hohenzollernbrücke", "Neumarkt", "Zülpicher Straße"]
+ANALYTICS_EXCLUDED_WEATHER_COLUMNS = ["wspd_D2968", "pres_D2968", "tsun_D2968"]  # mostly missing
+ANALYTICS_TEMPERATURE_BUCKET = 5.0  # °C
+ANALYTICS_PRECIPITATION_BUCKET = 25.0  # mm
+
+# run instrumentation: nested pipeline/stage/file spans written as a JSON run report
+INSTRUMENTATION_ENABLED = True
+INSTRUMENTATION_TRACE_MEMORY = False  # tracemalloc slows down allocations
+INSTRUMENTATION_PROFILE_STAGES = False  # cProfile statistics per stage next to the report
+INSTRUMENTATION_REPORT_PATH = os.path.join(BASE_DIR, "data", "run_reports")
+
+# mirror all the downloads go to instead of the sources, e.g. the local fixture server of the tests
+EXTRACT_MIRROR_URL = os.environ.get("ETL_MIRROR_URL")
+
+# streaming mode: files are transformed while downloads are in flight and loaded partition by partition
+PIPELINE_STREAMING = False
+STREAM_QUEUE_SIZE = 4  # landed files waiting for the transformer, a full queue holds the downloads back
+STREAM_POLL_INTERVAL = 0.05  # seconds
+
+# task graph: every source is its own extract -> transform -> load branch, the analysis tables follow the loads
+PIPELINE_TASK_GRAPH = False
+PIPELINE_MAX_PARALLEL_TASKS = 4
+
+# chunked mode: the extracted files are transformed and loaded chunk by chunk within TRANSFORM_MEMORY_BUDGET
+PIPELINE_CHUNKED = False
+
+# stage checkpoints (extracted file manifest, transformed frames in Feather format), reruns resume from them
+CHECKPOINT_ENABLED = True
+CHECKPOINT_PATH = os.path.join(BASE_DIR, "data", "checkpoints")
+CHECKPOINT_COMPRESSION = "lz4"  # or "zstd", "uncompressed"
+
+# multi-city runs: every city runs its pipeline in a worker process with its outputs in CITY_OUTPUT_PATH/<city>,
+# the raw cache is shared by all of them
+CITY_OUTPUT_PATH = os.path.join(BASE_DIR, "data", "cities")
+CITY_MAX_WORKERS = 4
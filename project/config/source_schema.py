@@ -0,0 +1,175 @@
+# Declared parse schemas of the raw files, one entry per source and range of years (both ends included).
+# The transformer applies them at parse time, so every file is read once straight into its final dtypes.
+#
+# Mobilithek files have the month in the first column and one column per counting station. The station
+# columns change over the years, so their dtype is given as "value_dtype" for every column but the first.
+# The counts are parsed straight into nullable integers ("Int64", a missing count is <NA>). From 2016 on,
+# counts are published with '.' as thousands separator ("46.319", "463"), which only the Python parser
+# applies to nullable integers, the files of a year have a dozen rows.
+#
+# "engine" selects the pandas parser of the source: the multithreaded Arrow reader ("pyarrow") pays off for
+# the large Meteostat files, the yearly Mobilithek files are too small for its start-up cost. A file falls
+# back to PARSER_FALLBACK_ENGINE when the engine is not installed or fails to parse it.
+#
+# "rows_sorted" declares that the rows of a file are in chronological order (the Meteostat bulk files), the
+# rows outside the year window are then skipped block by block and decoding stops after the window.
+#
+# Meteostat publishes the bulk files in several grains, one entry per "granularity" (the 'granularity' of the
+# source information selects it). "time_columns" are the columns the integer time key of a row is built from,
+# "aggregations" tell how every value column is resampled to a coarser grain (columns without one, like the
+# wind direction, are dropped then) and "resampled_names" renames columns whose meaning changes (the hourly
+# temperature averaged over a day or month is 'tavg').
+
+SOURCE_SCHEMAS = {
+    "Mobilithek": [
+        {
+            "years": (2009, 2015),
+            "sep": ";",
+            "encoding": "unicode_escape",
+            "date_dtype": "object",
+            "value_dtype": "Int64",
+            "na_values": ["", "-"],
+            "thousands": None,
+            "decimal": ".",
+            "engine": "c",
+            "drop_rows": ["Jahressumme"]
+        },
+        {
+            "years": (2016, 2020),
+            "sep": ";",
+            "encoding": "utf-8-sig",
+            "date_dtype": "object",
+            "value_dtype": "Int64",
+            "na_values": ["", "-"],
+            "thousands": ".",
+            "decimal": ",",
+            "engine": "python",
+            "drop_rows": []
+        },
+        {
+            "years": (2021, 2022),
+            "sep": ";",
+            "encoding": "unicode_escape",
+            "date_dtype": "object",
+            "value_dtype": "Int64",
+            "na_values": ["", "-"],
+            "thousands": ".",
+            "decimal": ",",
+            "engine": "python",
+            "drop_rows": []
+        }
+    ],
+    "Meteostat": [
+        {
+            "years": (None, None),
+            "granularity": "monthly",
+            "sep": ",",
+            "header": None,
+            "compression": "gzip",
+            "names": ["year", "month", "tavg", "tmin", "tmax", "prcp", "wspd", "pres", "tsun"],
+            "usecols": None,  # all the columns are used (the Arrow reader cannot select named columns without header)
+            "dtype": {
+                "year": "int64",
+                "month": "int64",
+                "tavg": "float64",
+                "tmin": "float64",
+                "tmax": "float64",
+                "prcp": "float64",
+                "wspd": "float64",
+                "pres": "float64",
+                "tsun": "float64"
+            },
+            "na_values": [""],
+            "thousands": None,
+            "decimal": ".",
+            "engine": "pyarrow",
+            "rows_sorted": True,
+            "time_columns": ["year", "month"],
+            "aggregations": {},
+            "resampled_names": {}
+        },
+        {
+            "years": (None, None),
+            "granularity": "daily",
+            "sep": ",",
+            "header": None,
+            "compression": "gzip",
+            "names": ["date", "tavg", "tmin", "tmax", "prcp", "snow", "wdir", "wspd", "wpgt", "pres", "tsun"],
+            "usecols": None,
+            "dtype": {
+                "date": "object",
+                "tavg": "float64",
+                "tmin": "float64",
+                "tmax": "float64",
+                "prcp": "float64",
+                "snow": "float64",
+                "wdir": "float64",
+                "wspd": "float64",
+                "wpgt": "float64",
+                "pres": "float64",
+                "tsun": "float64"
+            },
+            "na_values": [""],
+            "thousands": None,
+            "decimal": ".",
+            "engine": "pyarrow",
+            "rows_sorted": True,
+            "time_columns": ["date"],
+            "aggregations": {
+                "tavg": "mean",
+                "tmin": "min",
+                "tmax": "max",
+                "prcp": "sum",
+                "snow": "max",
+                "wspd": "mean",
+                "wpgt": "max",
+                "pres": "mean",
+                "tsun": "sum"
+            },
+            "resampled_names": {}
+        },
+        {
+            "years": (None, None),
+            "granularity": "hourly",
+            "sep": ",",
+            "header": None,
+            "compression": "gzip",
+            "names": ["date", "hour", "temp", "dwpt", "rhum", "prcp", "snow", "wdir", "wspd", "wpgt", "pres",
+                      "tsun", "coco"],
+            "usecols": None,
+            "dtype": {
+                "date": "object",
+                "hour": "int64",
+                "temp": "float64",
+                "dwpt": "float64",
+                "rhum": "float64",
+                "prcp": "float64",
+                "snow": "float64",
+                "wdir": "float64",
+                "wspd": "float64",
+                "wpgt": "float64",
+                "pres": "float64",
+                "tsun": "float64",
+                "coco": "float64"
+            },
+            "na_values": [""],
+            "thousands": None,
+            "decimal": ".",
+            "engine": "pyarrow",
+            "rows_sorted": True,
+            "time_columns": ["date", "hour"],
+            "aggregations": {
+                "temp": "mean",
+                "dwpt": "mean",
+                "rhum": "mean",
+                "prcp": "sum",
+                "snow": "max",
+                "wspd": "mean",
+                "wpgt": "max",
+                "pres": "mean",
+                "tsun": "sum"
+            },
+            "resampled_names": {"temp": "tavg"}
+        }
+    ]
+}
@@ -1,101 +1,454 @@
-# Python imports
-import os, sys
-
-# Third party imports
-import requests
-
-# Self imports
-from config.config_var import *
-
-
-class DataExtractor:
-    """
-    A class to represent the data extractor of an ETL pipeline.
-
-    Attributes:
-        source_info (dict): A dictionary containing the necessary source URL and other information.
-        extracted_data (dict): A dictionary containing information of extracted data
-    
-    Methods:
-        extract() ->  None: Extracts data from multiple sources.
-        _download_data(url: str, output_path: str) -> None: Downloads data from the specified URL and saves it to the output path.
-    """
-
-    def __init__(self) -> None:
-        self.source_info = None
-        self.extracted_data = dict()
-
-    def extract(self) -> None:
-        """
-        Extracts data from multiple sources.
-
-        Parameters:
-            None
-
-        Returns:
-            None
-        """
-        for source in self.source_info["data_sources"]:
-
-            if source["source_name"] not in self.extracted_data:
-                self.extracted_data[source["source_name"]] = list()
-
-            # download data from source 1: Mobilithek
-            if source["source_name"] == "Mobilithek":
-                data_urls = source["data_urls"]
-
-                for url_dict in data_urls:
-                    downloaded_file_name = "{}_bicycle_traffic_{}.csv".format(
-                        source["source_name"].lower(), url_dict["year"])
-                    
-                    downloaded_file_path = os.path.join(DOWNLOADED_RAW_FILE_PATH, downloaded_file_name)
-                    url = url_dict["url"]
-                    self._download_data(url, downloaded_file_path)
-
-                    if os.path.exists(downloaded_file_path):
-                        self.extracted_data[source["source_name"]].append((url_dict["year"], downloaded_file_name))
-            
-            # download data from source 2: Meteostat
-            elif source["source_name"] == "Meteostat":
-                api_endpoint = source["api_endpoint"]
-
-                for station_dict in source["stations"]:
-                    downloaded_file_name = "{}_weather_data_{}_{}.csv.gz".format(
-                        source["source_name"].lower(), station_dict["station_id"], station_dict["station_name"])
-                    
-                    downloaded_file_path = os.path.join(DOWNLOADED_RAW_FILE_PATH, downloaded_file_name)
-                    url = api_endpoint.replace("{station}", station_dict["station_id"])
-                    self._download_data(url, downloaded_file_path)
-
-                    if os.path.exists(downloaded_file_path):
-                        self.extracted_data[source["source_name"]].append(
-                            (station_dict["station_id"], station_dict["station_name"], downloaded_file_name))
-
-    def _download_data(self, url: str, output_path: str) -> None:
-        """
-        Downloads data from the specified URL and saves it to the output path.
-
-        Parameters:
-            url (str): The URL from which to download the data.
-            output_path (str): The path where the downloaded data will be saved.
-        
-        Returns:
-            None
-        """
-        try:
-            response = requests.get(url)
-            response.raise_for_status()  # Raises an exception if the request was unsuccessful
-
-            with open(output_path, 'wb') as file:
-                file.write(response.content)
-
-            print(f"Succeed: Data downloaded successfully and saved as {output_path.split(os.sep)[-1]}")
-        except requests.exceptions.ConnectionError as e:
-            print(f"Error: Failed to download data from URL due to Connection error.")
-            sys.exit(1)
-        except requests.exceptions.HTTPError as e:
-            print(f"Error: Failed to download data from URL due to HTTP error. {str(e)}")
-            sys.exit(1)
-        except Exception as e:
-            print(f"Error: An unexpected error occurred. {str(e)}")
-            sys.exit(1)
+# Python imports
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import urlparse
+import os, time, threading
+
+# Third party imports
+import requests
+
+# Self imports
+from config.config_var import *
+from etl.extract.http_session import HttpSession
+from etl.extract.raw_cache import RawCache
+from utils.service_factory import HelperService
+
+
+class DataExtractor:
+    """
+    A class to represent the data extractor of an ETL pipeline.
+
+    Attributes:
+        source_info (dict): A dictionary containing the necessary source URL and other information.
+        extracted_data (dict): A dictionary containing information of extracted data
+        max_workers (int): The number of files downloaded concurrently (1 downloads them one by one).
+        max_per_host (int): The maximum number of concurrent requests sent to the same host.
+        raw_cache (RawCache): The persistent cache of the downloaded raw files, None if caching is disabled.
+        http_session (HttpSession): The pooled HTTP session with timeouts, retries and hedging used for all the downloads.
+        download_results (dict): A dictionary containing the result (status, size, rate or error) of each download by URL.
+        mirror_url (str): The base URL of a mirror (e.g. the local fixture server) all the downloads go to, None for the sources.
+        raw_dir (str): The directory the files are downloaded to.
+    
+    Methods:
+        extract(source_names: List) ->  None: Extracts data from multiple sources.
+        extract_stream(source_names: List) -> Iterator[Tuple]: Extracts data from multiple sources, yielding every file
+            as soon as it landed.
+        get_partition_hashes(source_names: List) -> Dict: Returns the content hash of every extracted file by source and partition.
+        _plan_downloads(source_names: List) -> List[Tuple]: Builds the ordered list of files to download from the sources.
+        _run_download_task(download_task: Tuple) -> None: Downloads a single planned file within its host limit and records its result.
+        _is_downloaded(download_task: Tuple) -> bool: Checks whether a planned file was downloaded.
+        _get_host_semaphore(url: str) -> threading.BoundedSemaphore: Returns the concurrency limiter of a host.
+        _get_mirror_url(url: str) -> str: Maps a source URL to its location on the mirror.
+        _download_data(url: str, output_path: str) -> Dict: Downloads data from the specified URL and saves it to the output path.
+        _download_attempt(url: str, output_path: str, revalidate: bool) -> Dict: Makes a single attempt to download data.
+        _get_resume_headers(part_path: str) -> Dict: Returns the Range/If-Range headers to resume a partial download.
+        _stream_to_file(response: requests.Response, part_path: str) -> Dict: Streams a response into the partial file.
+        _remove_partial_download(part_path: str) -> None: Removes a partial download and its recorded validator.
+        _format_rate(bytes_per_sec: float) -> str: Formats a transfer rate for the log output.
+    """
+
+    def __init__(self, max_workers: int = EXTRACT_MAX_WORKERS, max_per_host: int = EXTRACT_MAX_PER_HOST,
+                 use_raw_cache: bool = RAW_CACHE_ENABLED, http_session: HttpSession = None,
+                 mirror_url: str = EXTRACT_MIRROR_URL, raw_cache: RawCache = None,
+                 raw_dir: str = DOWNLOADED_RAW_FILE_PATH) -> None:
+        self.source_info = None
+        self.extracted_data = dict()
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.raw_cache = (raw_cache if raw_cache is not None else RawCache()) if use_raw_cache else None
+        self.http_session = http_session if http_session is not None else HttpSession(pool_size=max(max_workers, 1))
+        self.download_results = dict()
+        self.mirror_url = mirror_url.rstrip("/") if mirror_url else None
+        self.raw_dir = raw_dir
+        self._host_semaphores = dict()
+        self._host_semaphores_lock = threading.Lock()
+
+    def extract(self, source_names: List = None) -> None:
+        """
+        Extracts data from multiple sources.
+
+        Downloads run on a pool of `max_workers` threads with at most `max_per_host` requests
+        in flight per host, while `extracted_data` keeps the order of `source_info`.
+
+        Parameters:
+            source_names (list, optional): The sources to extract, all the sources of `source_info` by default.
+
+        Returns:
+            None
+        """
+        for _ in self.extract_stream(source_names):
+            pass
+
+    def extract_stream(self, source_names: List = None) -> Iterator[Tuple]:
+        """
+        Extracts data from multiple sources, yielding every file as soon as it landed.
+
+        The files arrive in the order the downloads complete, each with its position in the download plan,
+        so a consumer can restore the order of `source_info`. `extracted_data` is complete (in that order)
+        once the generator is exhausted.
+
+        Parameters:
+            source_names (list, optional): The sources to extract, all the sources of `source_info` by default.
+
+        Returns:
+            files (Iterator[Tuple]): The (plan position, source name, extracted file info) of every downloaded file.
+        """
+        download_tasks = self._plan_downloads(source_names)
+
+        if self.max_workers > 1 and len(download_tasks) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(download_tasks))) as executor:
+                futures = {executor.submit(self._run_download_task, download_task): task_index
+                           for task_index, download_task in enumerate(download_tasks)}
+
+                for future in as_completed(futures):
+                    future.result()
+                    download_task = download_tasks[futures[future]]
+                    if self._is_downloaded(download_task):
+                        yield futures[future], download_task[0], download_task[1]
+        else:
+            for task_index, download_task in enumerate(download_tasks):
+                self._run_download_task(download_task)
+                if self._is_downloaded(download_task):
+                    yield task_index, download_task[0], download_task[1]
+
+        # collect the downloaded files in the planned order, not in the order of completion
+        for download_task in download_tasks:
+            if self._is_downloaded(download_task):
+                self.extracted_data[download_task[0]].append(download_task[1])
+
+        failed_results = [self.download_results[url] for _, _, url, _ in download_tasks
+                          if self.download_results[url]["status"] == "failed"]
+        if failed_results:
+            print(f"Error: {len(failed_results)} file(s) could not be downloaded and are skipped: "
+                  f"{', '.join(result['file_name'] for result in failed_results)}")
+
+    def get_partition_hashes(self, source_names: List = None) -> Dict:
+        """
+        Returns the content hash of every extracted file, keyed by source and partition (year or station id).
+
+        Parameters:
+            source_names (list, optional): The sources to hash, all the extracted sources by default.
+
+        Returns:
+            partition_hashes (dict): A dictionary of {source name: {partition: SHA-256 of the raw file}}.
+        """
+        helper_service = HelperService()
+        partition_hashes = dict()
+
+        for source_name in (list(self.extracted_data) if source_names is None else source_names):
+            partition_hashes[source_name] = {
+                file_info[0]: helper_service.file_sha256(os.path.join(self.raw_dir, file_info[-1]))
+                for file_info in self.extracted_data.get(source_name, list())
+            }
+
+        return partition_hashes
+
+    def _plan_downloads(self, source_names: List = None) -> List[Tuple]:
+        """
+        Builds the ordered list of files to download from the sources.
+
+        Parameters:
+            source_names (list, optional): The sources to plan, all the sources of `source_info` by default.
+
+        Returns:
+            download_tasks (list): A list of (source name, extracted file info, url, output path) tuples.
+        """
+        download_tasks = list()
+
+        for source in self.source_info["data_sources"]:
+
+            if source_names is not None and source["source_name"] not in source_names:
+                continue
+
+            if source["source_name"] not in self.extracted_data:
+                self.extracted_data[source["source_name"]] = list()
+
+            # download data from source 1: Mobilithek
+            if source["source_name"] == "Mobilithek":
+                data_urls = source["data_urls"]
+
+                for url_dict in data_urls:
+                    downloaded_file_name = "{}_bicycle_traffic_{}.csv".format(
+                        source["source_name"].lower(), url_dict["year"])
+                    
+                    downloaded_file_path = os.path.join(self.raw_dir, downloaded_file_name)
+                    download_tasks.append((source["source_name"], (url_dict["year"], downloaded_file_name),
+                                           self._get_mirror_url(url_dict["url"]), downloaded_file_path))
+            
+            # download data from source 2: Meteostat
+            elif source["source_name"] == "Meteostat":
+                # the bulk files of every grain share the endpoint, e.g. 'v2/{granularity}/{station}.csv.gz'
+                api_endpoint = source["api_endpoint"].replace("{granularity}",
+                                                              source.get("granularity", METEOSTAT_GRANULARITY))
+
+                for station_dict in source["stations"]:
+                    downloaded_file_name = "{}_weather_data_{}_{}.csv.gz".format(
+                        source["source_name"].lower(), station_dict["station_id"], station_dict["station_name"])
+                    
+                    downloaded_file_path = os.path.join(self.raw_dir, downloaded_file_name)
+                    url = self._get_mirror_url(api_endpoint.replace("{station}", station_dict["station_id"]))
+                    download_tasks.append((source["source_name"],
+                                           (station_dict["station_id"], station_dict["station_name"], downloaded_file_name),
+                                           url, downloaded_file_path))
+
+        return download_tasks
+
+    def _run_download_task(self, download_task: Tuple) -> None:
+        """
+        Downloads a single planned file while holding the concurrency slot of its host.
+
+        Parameters:
+            download_task (tuple): A (source name, extracted file info, url, output path) tuple.
+
+        Returns:
+            None
+        """
+        _, _, url, downloaded_file_path = download_task
+
+        with self._get_host_semaphore(url):
+            started_at = time.perf_counter()
+            result = self._download_data(url, downloaded_file_path)
+            result["wall_seconds"] = time.perf_counter() - started_at
+            self.download_results[url] = result
+
+    def _is_downloaded(self, download_task: Tuple) -> bool:
+        """
+        Checks whether a planned file was downloaded (or reused from the raw cache).
+
+        Parameters:
+            download_task (tuple): A (source name, extracted file info, url, output path) tuple.
+
+        Returns:
+            downloaded (bool): True if the file is available for the transformation.
+        """
+        _, _, url, downloaded_file_path = download_task
+
+        return self.download_results[url]["status"] != "failed" and os.path.exists(downloaded_file_path)
+
+    def _get_host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        """
+        Returns the semaphore limiting the number of concurrent requests to the host of an URL.
+
+        Parameters:
+            url (str): The URL which is going to be requested.
+
+        Returns:
+            semaphore (threading.BoundedSemaphore): The semaphore shared by all the URLs of the same host.
+        """
+        host = urlparse(url).netloc
+
+        with self._host_semaphores_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(max(1, self.max_per_host))
+
+            return self._host_semaphores[host]
+
+    def _get_mirror_url(self, url: str) -> str:
+        """
+        Maps a source URL to its location on the mirror, `<mirror>/replay/<scheme>/<host>/<path>`.
+
+        Parameters:
+            url (str): The URL of the source.
+
+        Returns:
+            url (str): The URL on the mirror, the source URL itself without mirror.
+        """
+        if self.mirror_url is None:
+            return url
+
+        parsed_url = urlparse(url)
+        return (f"{self.mirror_url}/replay/{parsed_url.scheme}/{parsed_url.netloc}{parsed_url.path}"
+                + (f"?{parsed_url.query}" if parsed_url.query else ""))
+
+    def _download_data(self, url: str, output_path: str) -> Dict:
+        """
+        Downloads data from the specified URL and saves it to the output path.
+
+        Transient failures are retried by the HTTP session with backoff, and every retry resumes the
+        partial file left by the failed attempt. A download that still fails is reported in the
+        returned result instead of stopping the pipeline.
+
+        Parameters:
+            url (str): The URL from which to download the data.
+            output_path (str): The path where the downloaded data will be saved.
+        
+        Returns:
+            result (dict): The result of the download, with the status 'downloaded', 'not_modified' or 'failed'.
+        """
+        file_name = output_path.split(os.sep)[-1]
+        attempts = 0
+
+        def attempt_download() -> Dict:
+            nonlocal attempts
+            attempts += 1
+            return self._download_attempt(url, output_path)
+
+        try:
+            result = self.http_session.retry(attempt_download, description=f"Download of {file_name}")
+            result.update({"url": url, "file_name": file_name, "attempts": attempts})
+            return result
+        except requests.exceptions.ConnectionError as e:
+            print(f"Error: Failed to download {file_name} from URL due to Connection error.")
+            error = f"Connection error: {str(e)}"
+        except requests.exceptions.Timeout as e:
+            print(f"Error: Failed to download {file_name} from URL due to Timeout.")
+            error = f"Timeout: {str(e)}"
+        except requests.exceptions.HTTPError as e:
+            print(f"Error: Failed to download {file_name} from URL due to HTTP error. {str(e)}")
+            error = f"HTTP error: {str(e)}"
+        except Exception as e:
+            print(f"Error: An unexpected error occurred while downloading {file_name}. {str(e)}")
+            error = str(e)
+
+        return {"url": url, "file_name": file_name, "status": "failed", "attempts": attempts, "error": error}
+
+    def _download_attempt(self, url: str, output_path: str, revalidate: bool = True) -> Dict:
+        """
+        Makes a single attempt to download data from the specified URL to the output path.
+
+        The response is streamed in chunks into `<output_path>.part`, which is renamed to the output path
+        once complete, so memory stays flat regardless of the file size and a failed download never leaves
+        a truncated output file behind. A leftover `.part` file is resumed with an HTTP Range request.
+
+        Parameters:
+            url (str): The URL from which to download the data.
+            output_path (str): The path where the downloaded data will be saved.
+            revalidate (bool, optional): Whether a cached copy is revalidated with a conditional request.
+
+        Returns:
+            result (dict): The status of the attempt together with its transfer statistics.
+        """
+        part_path = output_path + ".part"
+
+        # revalidate a cached copy with a conditional request, a 304 response means it is still current
+        use_cache = self.raw_cache is not None and revalidate
+        headers = self.raw_cache.get_validators(url) if use_cache else dict()
+        headers.update(self._get_resume_headers(part_path))
+
+        with self.http_session.get(url, headers=headers) as response:
+            if response.status_code == 304 and use_cache and self.raw_cache.materialize(url, output_path):
+                self._remove_partial_download(part_path)
+                print(f"Succeed: Data not modified, reused cached copy as {output_path.split(os.sep)[-1]}")
+                return {"status": "not_modified", "bytes": os.path.getsize(output_path)}
+
+            # the cached copy vanished or the partial file cannot be resumed, download from scratch
+            if response.status_code in (304, 416):
+                self._remove_partial_download(part_path)
+                return self._download_attempt(url, output_path, revalidate=False)
+
+            response.raise_for_status()  # Raises an exception if the request was unsuccessful
+            result = self._stream_to_file(response, part_path)
+
+        # the complete file replaces the output path atomically
+        os.replace(part_path, output_path)
+        self._remove_partial_download(part_path)
+
+        if self.raw_cache is not None:
+            self.raw_cache.store(url, output_path,
+                                 etag=response.headers.get("ETag"),
+                                 last_modified=response.headers.get("Last-Modified"))
+
+        print(f"Succeed: Data downloaded successfully and saved as {output_path.split(os.sep)[-1]} "
+              f"({self._format_rate(result['bytes_per_sec'])})")
+        return result
+
+    def _get_resume_headers(self, part_path: str) -> Dict:
+        """
+        Returns the Range/If-Range headers to resume a partial download.
+
+        A partial download is only resumed if the validator (ETag or Last-Modified) of the response that
+        produced it was recorded, so the server sends the remaining bytes only if the file is unchanged.
+
+        Parameters:
+            part_path (str): The path of the partial download.
+
+        Returns:
+            headers (dict): The resume headers, empty if there is nothing (safe) to resume.
+        """
+        validator_path = part_path + ".validator"
+
+        if not os.path.exists(part_path) or not os.path.exists(validator_path):
+            return dict()
+
+        with open(validator_path, 'r') as file:
+            validator = file.read().strip()
+
+        resume_from = os.path.getsize(part_path)
+        if not validator or resume_from == 0:
+            return dict()
+
+        return {"Range": f"bytes={resume_from}-", "If-Range": validator}
+
+    def _stream_to_file(self, response: requests.Response, part_path: str) -> Dict:
+        """
+        Streams a response body in chunks into the partial download file.
+
+        A 206 response is appended to the existing partial file, any other response starts it from scratch.
+        The running transfer rate is printed every DOWNLOAD_PROGRESS_INTERVAL seconds.
+
+        Parameters:
+            response (requests.Response): The streamed response.
+            part_path (str): The path of the partial download.
+
+        Returns:
+            result (dict): The status and the transfer statistics (size, duration, rate) of the download.
+        """
+        resumed_from = os.path.getsize(part_path) if response.status_code == 206 else 0
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+        # remember the validator of the partial file so that an interrupted download can be resumed
+        with open(part_path + ".validator", 'w') as file:
+            file.write(validator or "")
+
+        downloaded_bytes = 0
+        started_at = last_report_at = time.perf_counter()
+
+        with open(part_path, 'ab' if resumed_from else 'wb') as file:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                file.write(chunk)
+                downloaded_bytes += len(chunk)
+
+                if time.perf_counter() - last_report_at >= DOWNLOAD_PROGRESS_INTERVAL:
+                    last_report_at = time.perf_counter()
+                    print(f"Progress: {part_path.split(os.sep)[-1][:-len('.part')]} "
+                          f"{resumed_from + downloaded_bytes} bytes received "
+                          f"({self._format_rate(downloaded_bytes / (last_report_at - started_at))})")
+
+        elapsed = max(time.perf_counter() - started_at, 1e-9)
+        return {
+            "status": "downloaded",
+            "bytes": resumed_from + downloaded_bytes,
+            "downloaded_bytes": downloaded_bytes,
+            "resumed_from": resumed_from,
+            "seconds": elapsed,
+            "bytes_per_sec": downloaded_bytes / elapsed
+        }
+
+    def _remove_partial_download(self, part_path: str) -> None:
+        """
+        Removes a partial download and its recorded validator (if they exist).
+
+        Parameters:
+            part_path (str): The path of the partial download.
+
+        Returns:
+            None
+        """
+        for path in (part_path, part_path + ".validator"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _format_rate(self, bytes_per_sec: float) -> str:
+        """
+        Formats a transfer rate for the log output.
+
+        Parameters:
+            bytes_per_sec (float): The transfer rate in bytes per second.
+
+        Returns:
+            rate (str): The human readable transfer rate.
+        """
+        for unit in ["B/s", "KB/s", "MB/s"]:
+            if bytes_per_sec < 1024 or unit == "MB/s":
+                return f"{bytes_per_sec:.1f} {unit}"
+            bytes_per_sec /= 1024
@@ -0,0 +1,209 @@
+# Python imports
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict
+import time, random
+
+# Third party imports
+import requests
+from requests.adapters import HTTPAdapter
+
+# Self imports
+from config.config_var import *
+
+
+class HttpSession:
+    """
+    A class to represent the shared HTTP layer of the data extractor.
+
+    All requests go through one keep-alive `requests.Session` whose connection pool is sized for the
+    concurrent downloads, with connect/read deadlines on every request. Transient failures are retried
+    with jittered exponential backoff, and a request that has not answered within `hedge_after` seconds
+    gets a duplicate (hedged) request, the first response wins.
+
+    Attributes:
+        session (requests.Session): The keep-alive session shared by all the downloads.
+        timeout (tuple): The (connect, read) timeout in seconds of every request.
+        max_retries (int): The number of retries of a failed operation before giving up.
+        backoff_base (float): The base delay in seconds of the exponential backoff.
+        backoff_max (float): The maximum delay in seconds between two attempts.
+        hedge_after (float): The seconds after which a hedged duplicate request is sent, None disables hedging.
+
+    Methods:
+        get(url: str, headers: Dict) -> requests.Response: Sends a streamed GET request, hedged if enabled.
+        retry(operation: Callable, description: str) -> Any: Runs an operation, retrying transient failures.
+        close() -> None: Closes the pooled connections.
+        _send(url: str, headers: Dict) -> requests.Response: Sends a single streamed GET request.
+        _hedged_send(url: str, headers: Dict) -> requests.Response: Sends a GET request with a hedged duplicate.
+        _is_retryable(error: Exception) -> bool: Checks whether a failure is worth another attempt.
+        _backoff_delay(attempt: int, error: Exception) -> float: Returns the jittered delay before the next attempt.
+        _close_response(future: Future) -> None: Closes the response of a request that lost the hedge.
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE,
+                 connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                 read_timeout: float = HTTP_READ_TIMEOUT,
+                 max_retries: int = HTTP_MAX_RETRIES,
+                 backoff_base: float = HTTP_BACKOFF_BASE,
+                 backoff_max: float = HTTP_BACKOFF_MAX,
+                 hedge_after: float = HTTP_HEDGE_AFTER) -> None:
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self._hedge_executor = ThreadPoolExecutor(max_workers=2 * pool_size) if hedge_after is not None else None
+
+    def get(self, url: str, headers: Dict = None) -> requests.Response:
+        """
+        Sends a streamed GET request, hedged if enabled.
+
+        Parameters:
+            url (str): The requested URL.
+            headers (dict, optional): The additional request headers.
+
+        Returns:
+            response (requests.Response): The streamed response, the caller must close it.
+        """
+        if self._hedge_executor is None:
+            return self._send(url, headers)
+
+        return self._hedged_send(url, headers)
+
+    def retry(self, operation: Callable, description: str = "request") -> Any:
+        """
+        Runs an operation, retrying transient failures with jittered exponential backoff.
+
+        Parameters:
+            operation (callable): The operation to run, called without arguments.
+            description (str, optional): The name of the operation used in the log output.
+
+        Returns:
+            result (any): The result of the first successful attempt, the last error is raised otherwise.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return operation()
+            except Exception as e:
+                if attempt == self.max_retries or not self._is_retryable(e):
+                    raise
+
+                delay = self._backoff_delay(attempt, e)
+                print(f"Retry: {description} failed ({type(e).__name__}), "
+                      f"attempt {attempt + 2}/{self.max_retries + 1} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def close(self) -> None:
+        """
+        Closes the pooled connections.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+        self.session.close()
+
+    def _send(self, url: str, headers: Dict = None) -> requests.Response:
+        """
+        Sends a single streamed GET request.
+
+        Parameters:
+            url (str): The requested URL.
+            headers (dict, optional): The additional request headers.
+
+        Returns:
+            response (requests.Response): The streamed response.
+        """
+        return self.session.get(url, headers=headers, stream=True, timeout=self.timeout)
+
+    def _hedged_send(self, url: str, headers: Dict = None) -> requests.Response:
+        """
+        Sends a GET request and a duplicate of it if no response arrived within `hedge_after` seconds.
+
+        Parameters:
+            url (str): The requested URL.
+            headers (dict, optional): The additional request headers.
+
+        Returns:
+            response (requests.Response): The first successful response, the other one is closed.
+        """
+        primary = self._hedge_executor.submit(self._send, url, headers)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        print(f"Hedge: no response after {self.hedge_after}s, sending a duplicate request to {url}")
+        pending = {primary, self._hedge_executor.submit(self._send, url, headers)}
+        last_error = None
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is not None:
+                    last_error = future.exception()
+                    continue
+
+                for other in pending:
+                    other.add_done_callback(self._close_response)
+                return future.result()
+
+        raise last_error
+
+    def _is_retryable(self, error: Exception) -> bool:
+        """
+        Checks whether a failure is worth another attempt.
+
+        Parameters:
+            error (Exception): The error raised by the failed attempt.
+
+        Returns:
+            retryable (bool): True for timeouts, connection errors, broken transfers and retryable HTTP statuses.
+        """
+        if isinstance(error, requests.exceptions.HTTPError):
+            return error.response is not None and error.response.status_code in HTTP_RETRY_STATUS_CODES
+
+        return isinstance(error, (requests.exceptions.ConnectionError,
+                                  requests.exceptions.Timeout,
+                                  requests.exceptions.ChunkedEncodingError))
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """
+        Returns the jittered delay before the next attempt ("full jitter" exponential backoff).
+
+        Parameters:
+            attempt (int): The zero-based number of the failed attempt.
+            error (Exception): The error raised by the failed attempt, its Retry-After header is honoured.
+
+        Returns:
+            delay (float): The delay in seconds.
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, min(self.backoff_max, float(retry_after)))
+
+        return delay
+
+    def _close_response(self, future: Future) -> None:
+        """
+        Closes the response of a request that lost the hedge.
+
+        Parameters:
+            future (Future): The future of the losing request.
+
+        Returns:
+            None
+        """
+        if future.exception() is None:
+            future.result().close()
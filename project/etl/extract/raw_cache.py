@@ -0,0 +1,312 @@
+# Python imports
+from contextlib import contextmanager
+from typing import Dict, Iterator, Union
+import os, sys, json, time, shutil, threading
+
+# Third party imports
+
+# Self imports
+from config.config_var import *
+from utils.service_factory import HelperService
+
+
+class RawCache:
+    """
+    A class to represent a persistent, content-addressed cache of the downloaded raw files.
+
+    Every file is stored once under `objects/<sha256 of content>` and an index maps each source URL to
+    its content hash together with the HTTP validators (ETag/Last-Modified) of the cached response, so
+    that unchanged files can be revalidated with a conditional GET instead of downloaded again.
+
+    The cache can be shared by several processes (e.g. the cities of a multi-city run): the index is
+    re-read from the disk and updated under a lock file, and an URL missing in the index of a process
+    is looked up again in the index on the disk.
+
+    Attributes:
+        cache_dir (str): The directory where the cache index and the cached objects are stored.
+        max_bytes (int): The maximum total size of the cached objects before eviction starts.
+        index (dict): A dictionary mapping each cached URL to its cache entry.
+
+    Methods:
+        get_validators(url: str) -> Dict: Returns the conditional request headers for a cached URL.
+        get_entry(url: str) -> Dict/None: Returns the cache entry of an URL.
+        store(url: str, file_path: str, etag: str, last_modified: str) -> str: Adds a downloaded file to the cache.
+        materialize(url: str, output_path: str) -> bool: Places the cached copy of an URL at the output path.
+        evict(keep_url: str) -> None: Evicts the least recently used objects until the cache fits in max_bytes.
+        clear() -> int: Deletes all the cached objects and index entries.
+        _object_path(sha256: str) -> str: Returns the path of a cached object.
+        _link_or_copy(src_path: str, dst_path: str) -> None: Hard links a file, copies it if linking fails.
+        _update_index() -> Iterator[Dict]: Locks the index of all the processes and re-reads it for an update.
+        _load_index() -> Dict: Loads the cache index from the disk.
+        _save_index() -> None: Saves the cache index to the disk.
+    """
+
+    def __init__(self, cache_dir: str = RAW_CACHE_PATH, max_bytes: int = RAW_CACHE_MAX_BYTES) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(self.cache_dir, "objects"), exist_ok=True)
+        self.index = self._load_index()
+
+    def get_validators(self, url: str) -> Dict:
+        """
+        Returns the conditional request headers for a cached URL.
+
+        Parameters:
+            url (str): The URL which is going to be requested.
+
+        Returns:
+            headers (dict): The If-None-Match/If-Modified-Since headers, empty if the URL is not cached.
+        """
+        entry = self.get_entry(url)
+        headers = dict()
+
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
+
+    def get_entry(self, url: str) -> Union[Dict, None]:
+        """
+        Returns the cache entry of an URL.
+
+        Parameters:
+            url (str): The URL of the cached file.
+
+        Returns:
+            entry (dict/none): The cache entry, or None if the URL is not cached or its object is missing.
+        """
+        with self._lock:
+            if url not in self.index:
+                # another process may have cached it meanwhile
+                self.index = self._load_index()
+            entry = self.index.get(url)
+
+            if entry is None or not os.path.exists(self._object_path(entry["sha256"])):
+                return None
+
+            return dict(entry)
+
+    def store(self, url: str, file_path: str, etag: str = None, last_modified: str = None) -> str:
+        """
+        Adds a downloaded file to the cache.
+
+        Parameters:
+            url (str): The URL from which the file was downloaded.
+            file_path (str): The path of the downloaded file.
+            etag (str, optional): The ETag header of the response.
+            last_modified (str, optional): The Last-Modified header of the response.
+
+        Returns:
+            sha256 (str): The content hash under which the file is cached.
+        """
+        sha256 = HelperService().file_sha256(file_path)
+        object_path = self._object_path(sha256)
+
+        with self._update_index():
+            if not os.path.exists(object_path):
+                self._link_or_copy(file_path, object_path)
+
+            self.index[url] = {
+                "sha256": sha256,
+                "size": os.path.getsize(object_path),
+                "etag": etag,
+                "last_modified": last_modified,
+                "last_used": time.time()
+            }
+            self._save_index()
+
+        self.evict(keep_url=url)
+        return sha256
+
+    def materialize(self, url: str, output_path: str) -> bool:
+        """
+        Places the cached copy of an URL at the output path.
+
+        Parameters:
+            url (str): The URL of the cached file.
+            output_path (str): The path where the cached file should be available.
+
+        Returns:
+            materialized (bool): True if the cached copy was placed at the output path, False otherwise.
+        """
+        entry = self.get_entry(url)
+
+        if entry is None:
+            return False
+
+        with self._update_index():
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
+            self._link_or_copy(self._object_path(entry["sha256"]), output_path)
+            if url in self.index:
+                self.index[url]["last_used"] = time.time()
+                self._save_index()
+
+        return True
+
+    def evict(self, keep_url: str = None) -> None:
+        """
+        Evicts the least recently used objects until the cache fits in max_bytes.
+
+        Parameters:
+            keep_url (str, optional): An URL whose object must not be evicted, e.g. the one just stored.
+
+        Returns:
+            None
+        """
+        with self._update_index():
+            objects = dict()
+            for url, entry in self.index.items():
+                objects.setdefault(entry["sha256"], {"size": entry["size"], "last_used": 0.0, "urls": list()})
+                objects[entry["sha256"]]["last_used"] = max(objects[entry["sha256"]]["last_used"], entry["last_used"])
+                objects[entry["sha256"]]["urls"].append(url)
+
+            total_bytes = sum(obj["size"] for obj in objects.values())
+            protected = self.index[keep_url]["sha256"] if keep_url in self.index else None
+
+            for sha256, obj in sorted(objects.items(), key=lambda item: item[1]["last_used"]):
+                if total_bytes <= self.max_bytes:
+                    break
+                if sha256 == protected:
+                    continue
+
+                if os.path.exists(self._object_path(sha256)):
+                    os.remove(self._object_path(sha256))
+                for url in obj["urls"]:
+                    del self.index[url]
+                total_bytes -= obj["size"]
+                print(f"Succeed: Cached object {sha256[:12]} evicted from the raw cache")
+
+            self._save_index()
+
+    def clear(self) -> int:
+        """
+        Deletes all the cached objects and index entries, the next runs download every file again.
+
+        Parameters:
+            None
+
+        Returns:
+            deleted (int): The number of deleted objects.
+        """
+        with self._update_index():
+            object_dir = os.path.join(self.cache_dir, "objects")
+            object_names = os.listdir(object_dir)
+
+            for object_name in object_names:
+                os.remove(os.path.join(object_dir, object_name))
+            self.index.clear()
+            self._save_index()
+
+        return len(object_names)
+
+    def _object_path(self, sha256: str) -> str:
+        """
+        Returns the path of a cached object.
+
+        Parameters:
+            sha256 (str): The content hash of the object.
+
+        Returns:
+            object_path (str): The path of the object inside the cache directory.
+        """
+        return os.path.join(self.cache_dir, "objects", sha256)
+
+    def _link_or_copy(self, src_path: str, dst_path: str) -> None:
+        """
+        Hard links a file, copies it if linking fails (e.g. across file systems).
+
+        Parameters:
+            src_path (str): The path of the existing file.
+            dst_path (str): The path of the new file.
+
+        Returns:
+            None
+        """
+        try:
+            os.link(src_path, dst_path)
+        except OSError:
+            shutil.copyfile(src_path, dst_path)
+
+    @contextmanager
+    def _update_index(self) -> Iterator[Dict]:
+        """
+        Locks the index for the threads of this process and, with a lock file, for the other processes,
+        and re-reads it from the disk, so an update does not overwrite the entries of other processes.
+        A lock file older than RAW_CACHE_LOCK_TIMEOUT is left behind by a crashed process and is broken.
+
+        Parameters:
+            None
+
+        Returns:
+            index (Iterator[Dict]): The current cache index, saved by the caller.
+        """
+        lock_path = os.path.join(self.cache_dir, "index.lock")
+
+        with self._lock:
+            while True:
+                try:
+                    lock_fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                    break
+                except FileExistsError:
+                    try:
+                        if time.time() - os.path.getmtime(lock_path) > RAW_CACHE_LOCK_TIMEOUT:
+                            os.remove(lock_path)
+                    except OSError:
+                        pass
+                    time.sleep(0.01)
+
+            try:
+                self.index = self._load_index()
+                yield self.index
+            finally:
+                os.close(lock_fd)
+                os.remove(lock_path)
+
+    def _load_index(self) -> Dict:
+        """
+        Loads the cache index from the disk.
+
+        Parameters:
+            None
+
+        Returns:
+            index (dict): The cache index, empty if there is no (readable) index yet.
+        """
+        index_path = os.path.join(self.cache_dir, "index.json")
+
+        if not os.path.exists(index_path):
+            return dict()
+
+        try:
+            with open(index_path, 'r') as file:
+                return json.load(file)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Error: Raw cache index is unreadable and is rebuilt from scratch. {str(e)}")
+            return dict()
+
+    def _save_index(self) -> None:
+        """
+        Saves the cache index to the disk (the caller must hold the index lock, see _update_index).
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        index_path = os.path.join(self.cache_dir, "index.json")
+
+        try:
+            with open(index_path + ".tmp", 'w') as file:
+                json.dump(self.index, file, indent=2)
+            os.replace(index_path + ".tmp", index_path)
+        except OSError as e:
+            print(f"Error: Issue occurred while saving the raw cache index: {str(e)}")
+            sys.exit(1)
@@ -0,0 +1,182 @@
+# Python imports
+from typing import List
+import sqlite3
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Self imports
+from config.config_var import *
+from utils.service_factory import HelperService
+
+
+class AnalyticsWriter:
+    """
+    A class to represent the precomputed analysis tables of the data loader.
+
+    The bicycle traffic and the weather data are joined once per load into a month table, prepared the way
+    report.ipynb prepares them (total traffic of ANALYTICS_TRAFFIC_STATIONS, weather parameters averaged over
+    the stations after a forward linear interpolation), and rolled up per season, year, counting station,
+    temperature bucket and precipitation bucket. Every table has its grouping key as primary key, so the
+    analysis queries are index lookups instead of joins over the wide tables.
+
+    Tables:
+        bicycle_weather_month: The joined month table, keyed by the integer month (YYYYMM).
+        bicycle_weather_by_season, bicycle_weather_by_year: The rollups per season and per year.
+        bicycle_weather_by_temperature, bicycle_weather_by_precipitation: The rollups per bucket (lower bound).
+        bicycle_traffic_by_station: The bicycle traffic per counting station and year.
+
+    Methods:
+        write(conn: sqlite3.Connection, bicycle_table: str, weather_table: str) -> List: Builds all the analysis tables.
+        _build_month_table(bicycle_df: pd.DataFrame, weather_df: pd.DataFrame) -> pd.DataFrame: Joins the month table.
+        _rollup(month_df: pd.DataFrame, key_column: str) -> pd.DataFrame: Aggregates the month table by a key.
+        _rollup_stations(bicycle_df: pd.DataFrame) -> pd.DataFrame: Aggregates the bicycle traffic per station and year.
+        _write_table(conn: sqlite3.Connection, table_name: str, data_df: pd.DataFrame, key_columns: List) -> None:
+            Replaces a table with the rows of a frame.
+    """
+
+    SEASONS = {12: "Winter", 1: "Winter", 2: "Winter", 3: "Spring", 4: "Spring", 5: "Spring",
+               6: "Summer", 7: "Summer", 8: "Summer", 9: "Autumn", 10: "Autumn", 11: "Autumn"}
+    WEATHER_METRICS = ["tavg", "tmin", "tmax", "prcp", "wspd", "pres", "tsun"]
+
+    def write(self, conn: sqlite3.Connection, bicycle_table: str, weather_table: str) -> List:
+        """
+        Builds all the analysis tables from the loaded (wide) tables.
+
+        They are read back from the database, so in incremental mode the tables cover the unchanged partitions too.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            bicycle_table (str): The name of the wide bicycle traffic table (or view).
+            weather_table (str): The name of the wide weather table (or view).
+
+        Returns:
+            table_names (list): The names of the written tables, empty if one of the sources is not loaded.
+        """
+        existing_tables = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+        if bicycle_table not in existing_tables or weather_table not in existing_tables:
+            return list()
+
+        bicycle_df = pd.read_sql_query(f'SELECT * FROM "{bicycle_table}"', conn)
+        weather_df = pd.read_sql_query(f'SELECT * FROM "{weather_table}"', conn)
+        month_df = self._build_month_table(bicycle_df, weather_df)
+
+        tables = {
+            "bicycle_weather_month": (month_df, ["month"]),
+            "bicycle_weather_by_season": (self._rollup(month_df, "season"), ["season"]),
+            "bicycle_weather_by_year": (self._rollup(month_df, "year"), ["year"]),
+            "bicycle_weather_by_temperature": (self._rollup(month_df, "tavg_bucket"), ["tavg_bucket"]),
+            "bicycle_weather_by_precipitation": (self._rollup(month_df, "prcp_bucket"), ["prcp_bucket"]),
+            "bicycle_traffic_by_station": (self._rollup_stations(bicycle_df), ["station_name", "year"])
+        }
+        for table_name, (data_df, key_columns) in tables.items():
+            self._write_table(conn, table_name, data_df, key_columns)
+
+        return list(tables.keys())
+
+    def _build_month_table(self, bicycle_df: pd.DataFrame, weather_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Joins the bicycle traffic and the weather data on the month.
+
+        Parameters:
+            bicycle_df (pd.DataFrame): The wide bicycle traffic data ('Date' and one column per counting station).
+            weather_df (pd.DataFrame): The wide weather data ('date' and one 'metric_station' column per parameter).
+
+        Returns:
+            month_df (pd.DataFrame): The month table with its calendar, weather, traffic and bucket columns.
+        """
+        traffic_stations = [station for station in ANALYTICS_TRAFFIC_STATIONS if station in bicycle_df.columns]
+        traffic_df = pd.DataFrame({"date": bicycle_df['Date'],
+                                   "total_traffic": bicycle_df[traffic_stations].sum(axis=1).astype("int64")})
+
+        weather_columns = [column for column in weather_df.columns[1:] if column not in ANALYTICS_EXCLUDED_WEATHER_COLUMNS]
+        weather_values = weather_df[weather_columns].astype("float64")
+        weather_values = weather_values.interpolate(method='linear', limit_direction='forward')
+
+        metrics_df = pd.DataFrame({"date": weather_df['date']})
+        for metric in self.WEATHER_METRICS:
+            metric_columns = [column for column in weather_columns if column.rsplit("_", 1)[0] == metric]
+            metrics_df[metric] = weather_values[metric_columns].mean(axis=1) if metric_columns else np.nan
+
+        month_df = pd.merge(metrics_df, traffic_df, on="date")
+
+        dates = pd.to_datetime(month_df['date'], format="%B-%Y")
+        month_df.insert(0, "month", dates.dt.year * 100 + dates.dt.month)
+        month_df.insert(2, "year", dates.dt.year)
+        month_df.insert(3, "month_of_year", dates.dt.month)
+        month_df.insert(4, "season", dates.dt.month.map(self.SEASONS))
+        month_df["tavg_bucket"] = np.floor(month_df['tavg'] / ANALYTICS_TEMPERATURE_BUCKET) * ANALYTICS_TEMPERATURE_BUCKET
+        month_df["prcp_bucket"] = np.floor(month_df['prcp'] / ANALYTICS_PRECIPITATION_BUCKET) * ANALYTICS_PRECIPITATION_BUCKET
+
+        return month_df.sort_values("month").reset_index(drop=True)
+
+    def _rollup(self, month_df: pd.DataFrame, key_column: str) -> pd.DataFrame:
+        """
+        Aggregates the month table by a key.
+
+        Parameters:
+            month_df (pd.DataFrame): The month table.
+            key_column (str): The grouping column, e.g. 'season' or 'tavg_bucket'.
+
+        Returns:
+            rollup_df (pd.DataFrame): The number of months, the traffic total/mean/min/max and the weather means per key.
+        """
+        grouped = month_df.dropna(subset=[key_column]).groupby(key_column, sort=True)
+
+        rollup_df = grouped.agg(months=("month", "size"),
+                                total_traffic_sum=("total_traffic", "sum"),
+                                total_traffic_mean=("total_traffic", "mean"),
+                                total_traffic_min=("total_traffic", "min"),
+                                total_traffic_max=("total_traffic", "max"),
+                                **{metric + "_mean": (metric, "mean") for metric in self.WEATHER_METRICS})
+
+        return rollup_df.reset_index()
+
+    def _rollup_stations(self, bicycle_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Aggregates the bicycle traffic per counting station and year (0 counts are months without counting).
+
+        Parameters:
+            bicycle_df (pd.DataFrame): The wide bicycle traffic data.
+
+        Returns:
+            rollup_df (pd.DataFrame): The traffic total, the counted months and the mean of the counted months.
+        """
+        station_df = bicycle_df.melt(id_vars="Date", var_name="station_name", value_name="traffic")
+        station_df["year"] = station_df['Date'].str[-4:].astype("int64")
+        station_df["counted"] = station_df['traffic'] != 0
+
+        rollup_df = station_df.groupby(["station_name", "year"], sort=True).agg(
+            traffic_sum=("traffic", "sum"), counted_months=("counted", "sum")).reset_index()
+        rollup_df["traffic_mean"] = rollup_df['traffic_sum'] / rollup_df['counted_months'].where(
+            rollup_df['counted_months'] > 0)
+
+        return rollup_df
+
+    def _write_table(self, conn: sqlite3.Connection, table_name: str, data_df: pd.DataFrame, key_columns: List) -> None:
+        """
+        Replaces a table with the rows of a frame, its key columns become the primary key.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            table_name (str): The name of the table.
+            data_df (pd.DataFrame): The rows of the table, missing values become NULL.
+            key_columns (list): The primary key columns.
+
+        Returns:
+            None
+        """
+        column_types = {column: "INTEGER" if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)
+                        else "REAL" if pd.api.types.is_float_dtype(dtype) else "TEXT"
+                        for column, dtype in data_df.dtypes.items()}
+
+        conn.execute(f'DROP TABLE IF EXISTS {table_name}')
+        conn.execute(f'CREATE TABLE {table_name} '
+                     f'({", ".join(column + " " + column_type for column, column_type in column_types.items())}, '
+                     f'PRIMARY KEY ({", ".join(key_columns)}))')
+
+        statement = f'INSERT INTO {table_name} VALUES ({", ".join("?" for _ in data_df.columns)})'
+        for batch in HelperService().get_row_batches(data_df, LOAD_BATCH_SIZE):
+            conn.executemany(statement, batch)
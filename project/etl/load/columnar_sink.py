@@ -0,0 +1,171 @@
+# Python imports
+from typing import Dict, List
+import os, sys, shutil, importlib.util
+
+# Third party imports
+import pandas as pd
+
+# Self imports
+from config.config_var import *
+from etl.load.data_sink import DataSink
+
+
+class ColumnarSink(DataSink):
+    """
+    A class to represent a columnar (Parquet/Feather) sink with Hive-style partitions.
+
+    Mobilithek is partitioned by year (`mobilithek_bicycle_traffic/year=2009/`) and Meteostat by weather
+    station (`meteostat_weather_data/station=10513/` with the parameters tavg, tmin, ... as columns), so
+    readers can prune partitions and read only the columns they need. Parquet files are written with
+    compression and column statistics. pyarrow is an optional dependency of this sink.
+
+    Attributes:
+        root_dir (str): The directory of the partitioned datasets.
+        file_format (str): The file format of the partitions, 'parquet' or 'feather'.
+        compression (str): The compression codec of the partitions (e.g. 'zstd', 'snappy').
+
+    Methods:
+        write(transformed_data: Dict, replace_all: bool) -> None: Writes transformed data as partitioned datasets.
+        read(source: str, columns: List, filters: List) -> pd.DataFrame: Reads a dataset, pruning partitions and columns.
+        _split_partitions(source: str, source_merged_df: pd.DataFrame) -> Dict: Splits a frame into its partitions.
+        _write_partition(partition_dir: str, data_df: pd.DataFrame) -> None: Writes a single partition.
+        _get_dataset_name(source: str) -> str: Returns the dataset directory name of a source.
+    """
+
+    name = "columnar"
+
+    def __init__(self, root_dir: str = COLUMNAR_SINK_PATH,
+                 file_format: str = COLUMNAR_SINK_FORMAT,
+                 compression: str = COLUMNAR_SINK_COMPRESSION) -> None:
+        self.root_dir = root_dir
+        self.file_format = file_format
+        self.compression = compression
+
+    def write(self, transformed_data: Dict, replace_all: bool = True) -> None:
+        """
+        Writes transformed data as partitioned datasets.
+
+        Parameters:
+            transformed_data (dict): A dict that contains transformed data by source.
+            replace_all (bool, optional): Whether the whole dataset is replaced, or only the given partitions.
+
+        Returns:
+            None
+        """
+        if importlib.util.find_spec("pyarrow") is None:
+            print(f"Error: pyarrow is not installed, the {self.file_format} sink is skipped")
+            return
+
+        for source, source_merged_df in transformed_data.items():
+            dataset_dir = os.path.join(self.root_dir, self._get_dataset_name(source))
+
+            if replace_all and os.path.exists(dataset_dir):
+                shutil.rmtree(dataset_dir)
+
+            partitions = self._split_partitions(source, source_merged_df)
+            for partition_name, partition_df in partitions.items():
+                self._write_partition(os.path.join(dataset_dir, partition_name), partition_df)
+
+            print(f"Succeed: {source} data source written to {len(partitions)} {self.file_format} partition(s)")
+
+    def read(self, source: str, columns: List = None, filters: List = None) -> pd.DataFrame:
+        """
+        Reads a dataset, pruning partitions and columns.
+
+        Parameters:
+            source (str): The name of the source.
+            columns (list, optional): The columns to read, all of them by default.
+            filters (list, optional): The pyarrow filters, e.g. [("year", ">=", 2015)] or [("station", "=", "10513")].
+
+        Returns:
+            data_df (pd.DataFrame): The selected data with the partition column.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        # station ids are strings even if all of them happen to be numeric
+        partition_field = pa.field("year", pa.int32()) if source == "Mobilithek" else pa.field("station", pa.string())
+        dataset = ds.dataset(os.path.join(self.root_dir, self._get_dataset_name(source)),
+                             format=self.file_format if self.file_format == "parquet" else "ipc",
+                             partitioning=ds.partitioning(pa.schema([partition_field]), flavor="hive"))
+        expression = pq.filters_to_expression(filters) if filters else None
+
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+    def _split_partitions(self, source: str, source_merged_df: pd.DataFrame) -> Dict:
+        """
+        Splits a transformed frame into its partitions.
+
+        Parameters:
+            source (str): The name of the source.
+            source_merged_df (pd.DataFrame): The transformed data of the source.
+
+        Returns:
+            partitions (dict): A dictionary of {partition directory name: partition frame}.
+        """
+        partitions = dict()
+
+        if source == "Mobilithek":
+            years = source_merged_df['Date'].str[-4:]
+            for year, year_df in source_merged_df.groupby(years, sort=False):
+                partitions[f"year={year}"] = year_df.reset_index(drop=True)
+        elif source == "Meteostat":
+            station_columns = dict()
+            for column in source_merged_df.columns[1:]:
+                parameter, station_id = column.rsplit("_", 1)
+                station_columns.setdefault(station_id, dict())[column] = parameter
+
+            for station_id, columns in station_columns.items():
+                station_df = source_merged_df[['date'] + list(columns)].rename(columns=columns)
+                partitions[f"station={station_id}"] = station_df.reset_index(drop=True)
+
+        return partitions
+
+    def _write_partition(self, partition_dir: str, data_df: pd.DataFrame) -> None:
+        """
+        Writes a single partition, replacing its previous content.
+
+        Parameters:
+            partition_dir (str): The Hive-style directory of the partition.
+            data_df (pd.DataFrame): The data of the partition, without the partition column.
+
+        Returns:
+            None
+        """
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+
+        try:
+            if os.path.exists(partition_dir):
+                shutil.rmtree(partition_dir)
+            os.makedirs(partition_dir)
+
+            table = pa.Table.from_pandas(data_df, preserve_index=False)
+            if self.file_format == "parquet":
+                pq.write_table(table, os.path.join(partition_dir, "part-0.parquet"),
+                               compression=self.compression, write_statistics=True)
+            else:
+                feather.write_feather(table, os.path.join(partition_dir, "part-0.feather"),
+                                      compression=self.compression)
+        except Exception as e:
+            print(f"Error: Failed writing the partition '{partition_dir}'- {str(e)}")
+            sys.exit(1)
+
+    def _get_dataset_name(self, source: str) -> str:
+        """
+        Returns the dataset directory name of a source (the same as its table name).
+
+        Parameters:
+            source (str): The name of the source.
+
+        Returns:
+            dataset_name (str): The name of the dataset directory.
+        """
+        if source == "Mobilithek":
+            dataset_name = source.lower() + "_bicycle_traffic"
+        elif source == "Meteostat":
+            dataset_name = source.lower() + "_weather_data"
+
+        return dataset_name
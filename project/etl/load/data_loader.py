@@ -1,54 +1,764 @@
-# Python imports
-import sqlite3
-import sys
-
-# Third party imports
-
-# Self imports
-from config.config_var import *
-
-
-class DataLoader:
-    """
-    A class to represent the data loader of an ETL pipeline.
-
-    Attributes:
-        transformed_data (dict): A dict that contains transformed data.
-    
-    Methods:
-        load() -> None: Loads transformed data into database.
-    """
-
-    def __init__(self) -> None:
-        self.transformed_data = None
-
-    def load(self) -> None:
-        """
-        Loads transformed data into database.
-
-        Parameters:
-            None
-        
-        Returns:
-            None
-        """
-        try:
-            # connect to the database
-            conn = sqlite3.connect(DB_PATH)
-            print(f"Succeed: Database created successfully")
-
-            # insert data into the database
-            for source, source_merged_df in self.transformed_data.items():
-                if source == "Mobilithek":
-                    table_name = source.lower() + "_bicycle_traffic"
-                elif source == "Meteostat":
-                    table_name = source.lower() + "_weather_data"
-                
-                source_merged_df.to_sql(table_name, conn, if_exists='replace', index=False)
-                print(f"Succeed: {source} data source inserted into the database successfully")
-            
-            # close the connection
-            conn.close()
-        except sqlite3.Error as e:
-            print(f"Error: An error occurred during table population: {str(e)}")
-            sys.exit(1)
+# Python imports
+from typing import Dict, Iterator, List, Tuple
+from datetime import datetime
+import sqlite3
+import sys, time, threading
+
+# Third party imports
+import pandas as pd
+
+# Self imports
+from config.config_var import *
+from utils.service_factory import HelperService
+from etl.load.data_sink import DataSink
+from etl.load.normalized_writer import NormalizedWriter
+from etl.load.analytics_writer import AnalyticsWriter
+from etl.transform.frame_compactor import FrameCompactor
+
+
+class DataLoader:
+    """
+    A class to represent the data loader of an ETL pipeline.
+
+    Attributes:
+        transformed_data (dict): A dict that contains transformed data.
+        incremental (bool): Whether only the changed partitions are upserted instead of replacing the tables.
+        bulk (bool): Whether the tables are filled by the bulk fast path (pragma profile, typed tables, batched inserts).
+        normalized (bool): Whether the data is stored in long format fact tables with wide compatibility views.
+        analytics (bool): Whether the joined bicycle x weather month table and its rollups are rebuilt after loading.
+        partition_hashes (dict): The content hash of every extracted partition by source, recorded after loading.
+        changed_partitions (dict): The partitions by source that changed since the last load (incremental mode).
+        load_stats (dict): The number of loaded rows, the duration and the rows per second of each source.
+        sinks (list): The additional sinks written after the database, e.g. the columnar sink.
+        db_path (str): The path of the SQLite database.
+
+    Methods:
+        load(source_names: List) -> None: Loads transformed data into database and the additional sinks.
+        write_analytics() -> None: Rebuilds the analysis tables after the sources were loaded separately.
+        load_stream(partitions: Iterator[Tuple]) -> None: Loads transformed partitions (or chunks of them) into database
+            as they arrive.
+        get_changed_partitions(extracted_data: Dict) -> Dict: Keeps only the partitions changed since the last load.
+        get_loaded_hashes() -> Dict: Reads the partition hashes of the last load whose tables still exist.
+        _create_sinks(sink_names: List) -> List: Creates the additional sinks named in LOAD_SINKS.
+        _write_sinks(source_names: List) -> None: Writes transformed data to the additional sinks.
+        _select_sources(source_names: List) -> Dict: Returns the transformed data of the given sources in the current schema.
+        _get_table_name(source: str) -> str: Returns the table name of a source.
+        _apply_pragmas(conn: sqlite3.Connection) -> None: Applies the LOAD_PRAGMAS profile to the connection.
+        _load_normalized(conn: sqlite3.Connection, source: str, source_merged_df: pd.DataFrame) -> int:
+            Writes a source to the normalized tables and recreates its compatibility view.
+        _load_partition(conn: sqlite3.Connection, source: str, data_df: pd.DataFrame, replace: bool,
+                        clear_partition: bool) -> int: Writes a single transformed partition (or chunk) of a source.
+        _check_monthly(data_df: pd.DataFrame, output: str) -> None: Stops the load if the rows of a frame are not monthly.
+        _drop_view(conn: sqlite3.Connection, table_name: str) -> None: Drops the compatibility view of a wide table.
+        _write_analytics(conn: sqlite3.Connection, sources: List) -> None: Rebuilds the precomputed analysis tables.
+        _bulk_load(conn: sqlite3.Connection, source: str, source_merged_df: pd.DataFrame) -> None:
+            Recreates the table of a source and fills it with batched inserts.
+        _create_table(conn: sqlite3.Connection, table_name: str, data_df: pd.DataFrame) -> None: Creates a typed table.
+        _insert_rows(conn: sqlite3.Connection, table_name: str, data_df: pd.DataFrame, upsert_key: str) -> None:
+            Inserts (or upserts) the rows of a frame in batches.
+        _create_key_index(conn: sqlite3.Connection, table_name: str, key_column: str) -> None: Creates the date key index.
+        _record_load_stats(source: str, rows: int, seconds: float) -> None: Records the load throughput of a source.
+        _format_load_stats(source: str) -> str: Formats the load throughput of a source.
+        _upsert_data(conn: sqlite3.Connection, source: str, source_merged_df: pd.DataFrame, clear_partitions: bool) -> None:
+            Upserts the rows of the changed partitions of a source.
+        _store_keys(conn: sqlite3.Connection, keys: List) -> None: Stores the row keys in a temporary table.
+        _quote(identifier: str) -> str: Quotes a table or column name for SQLite.
+        _save_partition_state(conn: sqlite3.Connection, sources: List) -> None: Records the loaded partition hashes.
+        _load_partition_state(conn: sqlite3.Connection) -> Dict: Reads the partition hashes of the last load.
+    """
+
+    def __init__(self, incremental: bool = LOAD_INCREMENTAL, bulk: bool = LOAD_BULK,
+                 normalized: bool = LOAD_NORMALIZED, analytics: bool = LOAD_ANALYTICS,
+                 sinks: List[DataSink] = None, db_path: str = DB_PATH) -> None:
+        self.transformed_data = None
+        self.incremental = incremental
+        self.bulk = bulk
+        self.normalized = normalized
+        self.analytics = analytics
+        self.partition_hashes = dict()
+        self.changed_partitions = dict()
+        self.load_stats = dict()
+        self.sinks = sinks if sinks is not None else self._create_sinks(LOAD_SINKS)
+        self.db_path = db_path
+        self._database_lock = threading.Lock()
+
+    def load(self, source_names: List = None) -> None:
+        """
+        Loads transformed data into database.
+
+        In incremental mode the rows of the changed partitions are upserted, in bulk mode every table is
+        recreated with a typed CREATE TABLE and filled with batched inserts under the LOAD_PRAGMAS profile.
+        In normalized mode the data goes to long format fact tables instead of the wide tables, which become
+        views (only the changed partitions are replaced in incremental mode). All of them run with the
+        partition state update in a single transaction. Otherwise every table is replaced with
+        DataFrame.to_sql. The analysis tables are rebuilt in the same transaction, the additional sinks are
+        written once the database is committed.
+
+        Sources can be loaded separately (also concurrently, SQLite has a single writer, so the loads take
+        turns). The analysis tables are only rebuilt by a load of all the sources then, the caller rebuilds
+        them with `write_analytics` once every source is loaded.
+
+        Parameters:
+            source_names (list, optional): The sources to load, all the sources of `transformed_data` by default.
+
+        Returns:
+            None
+        """
+        transformed_data = self._select_sources(source_names)
+
+        self._database_lock.acquire()
+        try:
+            # connect to the database
+            conn = sqlite3.connect(self.db_path)
+            print(f"Succeed: Database created successfully")
+
+            if self.incremental or self.bulk or self.normalized:
+                conn.isolation_level = None
+                if self.bulk:
+                    self._apply_pragmas(conn)
+
+                conn.execute("BEGIN")
+                try:
+                    for source, source_merged_df in transformed_data.items():
+                        started_at = time.perf_counter()
+                        rows = len(source_merged_df)
+
+                        if self.normalized:
+                            rows = self._load_normalized(conn, source, source_merged_df)
+                            action = "written to the normalized tables successfully"
+                        elif self.incremental:
+                            self._upsert_data(conn, source, source_merged_df)
+                            action = "upserted into the database successfully (partitions: {})".format(
+                                ', '.join(self.changed_partitions.get(source, [])) or 'all')
+                        else:
+                            self._bulk_load(conn, source, source_merged_df)
+                            action = "inserted into the database successfully"
+
+                        self._record_load_stats(source, rows, time.perf_counter() - started_at)
+                        print(f"Succeed: {source} data source {action} {self._format_load_stats(source)}")
+                    if source_names is None:
+                        self._write_analytics(conn)
+                    self._save_partition_state(conn, list(transformed_data.keys()))
+                    conn.execute("COMMIT")
+                except BaseException:
+                    # also on sys.exit, a stopped load must not keep the write transaction open
+                    conn.execute("ROLLBACK")
+                    raise
+
+                if self.incremental and not transformed_data:
+                    print(f"Succeed: No partition changed since the last load, nothing to upsert")
+            else:
+                # insert data into the database
+                for source, source_merged_df in transformed_data.items():
+                    table_name = self._get_table_name(source)
+                    started_at = time.perf_counter()
+
+                    self._drop_view(conn, table_name)
+                    source_merged_df.to_sql(table_name, conn, if_exists='replace', index=False)
+                    self._record_load_stats(source, len(source_merged_df), time.perf_counter() - started_at)
+                    print(f"Succeed: {source} data source inserted into the database successfully "
+                          f"{self._format_load_stats(source)}")
+
+                if source_names is None:
+                    self._write_analytics(conn)
+                self._save_partition_state(conn, list(transformed_data.keys()))
+                conn.commit()
+
+            # close the connection
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Error: An error occurred during table population: {str(e)}")
+            sys.exit(1)
+        finally:
+            self._database_lock.release()
+
+        self._write_sinks(source_names)
+
+    def load_stream(self, partitions: Iterator[Tuple]) -> None:
+        """
+        Loads transformed partitions (Mobilithek years, Meteostat stations) into database as they arrive.
+
+        Every partition is upserted into the table of its source (or written to the normalized tables) as
+        soon as the transformer yields it, the first partition of a source replaces the table unless in
+        incremental mode. A partition may arrive in chunks (chunked mode): its first chunk clears the rows of
+        the partition loaded before, the following chunks are appended. The tables hold the same rows as after
+        `load`, in the order the partitions arrived. Everything runs in a single transaction with the analysis
+        tables and the partition state, the additional sinks are written from `transformed_data` once the
+        stream ended (chunks are not kept, so the sinks are skipped in chunked mode).
+
+        Parameters:
+            partitions (Iterator[Tuple]): The (source name, extracted file info, transformed data) of every partition
+                or chunk, the chunks of a partition one after the other.
+
+        Returns:
+            None
+        """
+        loaded_sources, loaded_partitions = dict(), set()
+
+        try:
+            # connect to the database
+            conn = sqlite3.connect(self.db_path)
+            print(f"Succeed: Database created successfully")
+
+            conn.isolation_level = None
+            if self.bulk:
+                self._apply_pragmas(conn)
+
+            conn.execute("BEGIN")
+            try:
+                for source, file_info, data_df in partitions:
+                    started_at = time.perf_counter()
+                    rows = self._load_partition(conn, source, data_df,
+                                                replace=source not in loaded_sources and not self.incremental,
+                                                clear_partition=(source, file_info[0]) not in loaded_partitions)
+                    loaded_partitions.add((source, file_info[0]))
+
+                    source_rows, source_seconds = loaded_sources.get(source, (0, 0.0))
+                    loaded_sources[source] = (source_rows + rows, source_seconds + time.perf_counter() - started_at)
+                    print(f"Succeed: {source} partition {file_info[0]} loaded into the database ({rows} rows)")
+
+                for source, (rows, seconds) in loaded_sources.items():
+                    if self.normalized:
+                        NormalizedWriter().create_view(conn, source, self._get_table_name(source))
+                    self._record_load_stats(source, rows, seconds)
+                    print(f"Succeed: {source} data source streamed into the database successfully "
+                          f"{self._format_load_stats(source)}")
+                self._write_analytics(conn, list(loaded_sources.keys()))
+                self._save_partition_state(conn, list(loaded_sources.keys()))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+            if self.incremental and not loaded_sources:
+                print(f"Succeed: No partition changed since the last load, nothing to upsert")
+
+            # close the connection
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Error: An error occurred during table population: {str(e)}")
+            sys.exit(1)
+
+        if self.sinks and loaded_sources and not self.transformed_data:
+            print(f"Error: The loaded chunks are not kept in memory, the additional sinks are skipped")
+        self._write_sinks()
+
+    def write_analytics(self) -> None:
+        """
+        Rebuilds the analysis tables in a transaction of their own, after the sources were loaded separately.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        self._database_lock.acquire()
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.isolation_level = None
+
+            conn.execute("BEGIN")
+            try:
+                self._write_analytics(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Error: An error occurred while rebuilding the analysis tables: {str(e)}")
+            sys.exit(1)
+        finally:
+            self._database_lock.release()
+
+    def get_changed_partitions(self, extracted_data: Dict) -> Dict:
+        """
+        Keeps only the partitions (years, stations) whose raw file changed since the last load.
+
+        Parameters:
+            extracted_data (dict): A dictionary containing information of extracted data.
+
+        Returns:
+            changed_data (dict): The extracted data restricted to the changed partitions.
+        """
+        loaded_hashes = self.get_loaded_hashes()
+        changed_data = dict()
+
+        for source, files_list in extracted_data.items():
+            source_hashes = self.partition_hashes.get(source, dict())
+            source_loaded_hashes = loaded_hashes.get(source, dict())
+
+            changed_data[source] = [
+                file_info for file_info in files_list
+                if source_hashes.get(file_info[0]) is None
+                or source_hashes.get(file_info[0]) != source_loaded_hashes.get(file_info[0])
+            ]
+            self.changed_partitions[source] = [file_info[0] for file_info in changed_data[source]]
+            print(f"Succeed: {len(changed_data[source])} of {len(files_list)} {source} partition(s) changed "
+                  f"since the last load")
+
+        return changed_data
+
+    def get_loaded_hashes(self) -> Dict:
+        """
+        Reads the partition hashes recorded by the last load, for the sources whose table still exists.
+
+        Parameters:
+            None
+
+        Returns:
+            loaded_hashes (dict): A dictionary of {source name: {partition: SHA-256}}, without the sources to load again.
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            loaded_hashes = self._load_partition_state(conn)
+            # in normalized mode the wide tables are views and the facts are what has to exist
+            existing_tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Error: An error occurred while reading the partition state: {str(e)}")
+            sys.exit(1)
+
+        # without its table every partition of the source has to be loaded again
+        return {source: source_hashes for source, source_hashes in loaded_hashes.items()
+                if (NormalizedWriter().get_fact_table_name(source) if self.normalized
+                    else self._get_table_name(source)) in existing_tables}
+
+    def _create_sinks(self, sink_names: List) -> List:
+        """
+        Creates the additional sinks named in LOAD_SINKS.
+
+        Parameters:
+            sink_names (list): The names of the sinks, e.g. ["columnar"].
+
+        Returns:
+            sinks (list): The created sinks.
+        """
+        sinks = list()
+
+        for sink_name in sink_names:
+            if sink_name == "columnar":
+                from etl.load.columnar_sink import ColumnarSink
+                sinks.append(ColumnarSink())
+            else:
+                print(f"Error: Unknown load sink '{sink_name}'")
+                sys.exit(1)
+
+        return sinks
+
+    def _write_sinks(self, source_names: List = None) -> None:
+        """
+        Writes transformed data to the additional sinks, in incremental mode only the changed partitions are replaced.
+
+        Parameters:
+            source_names (list, optional): The sources to write, all the sources of `transformed_data` by default.
+
+        Returns:
+            None
+        """
+        transformed_data = self._select_sources(source_names)
+
+        for sink in self.sinks:
+            started_at = time.perf_counter()
+            sink.write(transformed_data, replace_all=not self.incremental)
+            print(f"Succeed: {sink.name} sink written in {time.perf_counter() - started_at:.2f}s")
+
+    def _select_sources(self, source_names: List = None) -> Dict:
+        """
+        Returns the transformed data of the given sources, compact frames restored to the current schema.
+
+        The sources are looked up by name instead of iterating `transformed_data`, which the transformer of
+        another branch may be extending at the same time.
+
+        Parameters:
+            source_names (list, optional): The sources to select, all the sources of `transformed_data` by default.
+
+        Returns:
+            transformed_data (dict): The transformed data of the sources which were transformed.
+        """
+        if source_names is None:
+            source_names = list(self.transformed_data)
+
+        frame_compactor = FrameCompactor()
+        return {source: frame_compactor.expand(self.transformed_data[source])
+                for source in source_names if source in self.transformed_data}
+
+    def _get_table_name(self, source: str) -> str:
+        """
+        Returns the table name of a source.
+
+        Parameters:
+            source (str): The name of the source.
+
+        Returns:
+            table_name (str): The name of the table holding the data of the source.
+        """
+        if source == "Mobilithek":
+            table_name = source.lower() + "_bicycle_traffic"
+        elif source == "Meteostat":
+            table_name = source.lower() + "_weather_data"
+
+        return table_name
+
+    def _apply_pragmas(self, conn: sqlite3.Connection) -> None:
+        """
+        Applies the LOAD_PRAGMAS profile (WAL journal, relaxed synchronous, large cache) to the connection.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection to the database, outside of a transaction.
+
+        Returns:
+            None
+        """
+        for pragma, value in LOAD_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+
+    def _load_normalized(self, conn: sqlite3.Connection, source: str, source_merged_df: pd.DataFrame) -> int:
+        """
+        Writes a source to the normalized tables and recreates its wide compatibility view.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            source (str): The name of the source.
+            source_merged_df (pd.DataFrame): The transformed data of the source (of its changed partitions if incremental).
+
+        Returns:
+            rows (int): The number of written fact rows.
+        """
+        self._check_monthly(source_merged_df, "normalized tables")
+        normalized_writer = NormalizedWriter()
+        table_name = self._get_table_name(source)
+
+        # the view takes the name of the wide table of a previous non normalized load
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone():
+            conn.execute(f'DROP TABLE {self._quote(table_name)}')
+        rows = normalized_writer.write(conn, source, source_merged_df, replace=not self.incremental)
+        normalized_writer.create_view(conn, source, table_name)
+
+        return rows
+
+    def _load_partition(self, conn: sqlite3.Connection, source: str, data_df: pd.DataFrame, replace: bool,
+                        clear_partition: bool = True) -> int:
+        """
+        Writes a single transformed partition (or chunk) of a source, upserted into its wide table or written to
+        the normalized tables.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            source (str): The name of the source.
+            data_df (pd.DataFrame): The transformed data of the partition.
+            replace (bool): Whether the data of the source loaded before is dropped first.
+            clear_partition (bool, optional): Whether the rows of the partition loaded before are cleared, False
+                for the following chunks of a partition.
+
+        Returns:
+            rows (int): The number of written rows (fact rows in normalized mode).
+        """
+        table_name = self._get_table_name(source)
+
+        if self.normalized:
+            self._check_monthly(data_df, "normalized tables")
+            # the view takes the name of the wide table of a previous non normalized load
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone():
+                conn.execute(f'DROP TABLE {self._quote(table_name)}')
+            return NormalizedWriter().write(conn, source, data_df, replace=replace, clear_partitions=clear_partition)
+
+        if replace:
+            self._drop_view(conn, table_name)
+            conn.execute(f'DROP TABLE IF EXISTS {self._quote(table_name)}')
+        self._upsert_data(conn, source, data_df, clear_partitions=clear_partition)
+
+        return len(data_df)
+
+    def _check_monthly(self, data_df: pd.DataFrame, output: str) -> None:
+        """
+        Stops the load if the rows of a frame are not monthly, the normalized and the analysis tables are keyed by
+        month (YYYYMM) and cannot hold daily or hourly weather (see the 'granularity' of Meteostat).
+
+        Parameters:
+            data_df (pd.DataFrame): The frame, its first column holds the time labels.
+            output (str): The name of the output keyed by month, for the error message.
+
+        Returns:
+            None
+        """
+        if len(data_df) and pd.isna(pd.to_datetime(data_df.iloc[:1, 0], format="%B-%Y", errors="coerce")).any():
+            print(f"Error: The {output} hold monthly data, got rows like '{data_df.iloc[0, 0]}', resample the "
+                  f"Meteostat data to monthly or load the wide tables")
+            sys.exit(1)
+
+    def _drop_view(self, conn: sqlite3.Connection, table_name: str) -> None:
+        """
+        Drops the compatibility view of a previous normalized load, the wide table takes its name again.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection to the database.
+            table_name (str): The name of the wide table.
+
+        Returns:
+            None
+        """
+        # DROP VIEW fails on a table of the same name
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = ?", (table_name,)).fetchone():
+            conn.execute(f'DROP VIEW {self._quote(table_name)}')
+
+    def _write_analytics(self, conn: sqlite3.Connection, sources: List = None) -> None:
+        """
+        Rebuilds the joined bicycle x weather month table and its rollups from the loaded tables.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection to the database.
+            sources (list, optional): The loaded sources, the sources of `transformed_data` by default.
+
+        Returns:
+            None
+        """
+        if not self.analytics or not (self.transformed_data if sources is None else sources):
+            return
+
+        # read back from the loaded table, in incremental mode the frames may not hold the weather
+        weather_table = self._get_table_name("Meteostat")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?",
+                        (weather_table,)).fetchone():
+            self._check_monthly(pd.read_sql_query(f'SELECT * FROM {self._quote(weather_table)} LIMIT 1', conn),
+                                "analysis tables")
+
+        started_at = time.perf_counter()
+        table_names = AnalyticsWriter().write(conn, self._get_table_name("Mobilithek"), weather_table)
+
+        if table_names:
+            print(f"Succeed: {len(table_names)} analysis tables rebuilt in {time.perf_counter() - started_at:.2f}s")
+
+    def _bulk_load(self, conn: sqlite3.Connection, source: str, source_merged_df: pd.DataFrame) -> None:
+        """
+        Recreates the table of a source and fills it with batched inserts, the index is built afterwards.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            source (str): The name of the source.
+            source_merged_df (pd.DataFrame): The transformed data of the source.
+
+        Returns:
+            None
+        """
+        table_name = self._get_table_name(source)
+
+        self._drop_view(conn, table_name)
+        conn.execute(f'DROP TABLE IF EXISTS {self._quote(table_name)}')
+        self._create_table(conn, table_name, source_merged_df)
+        self._insert_rows(conn, table_name, source_merged_df)
+        # building the index once after the inserts is cheaper than maintaining it row by row
+        self._create_key_index(conn, table_name, source_merged_df.columns[0])
+
+    def _create_table(self, conn: sqlite3.Connection, table_name: str, data_df: pd.DataFrame) -> None:
+        """
+        Creates a table with the SQLite column types of the frame dtypes (the types DataFrame.to_sql uses).
+
+        Parameters:
+            conn (sqlite3.Connection): The connection to the database.
+            table_name (str): The name of the new table.
+            data_df (pd.DataFrame): The frame whose columns become the table columns.
+
+        Returns:
+            None
+        """
+        column_types = {column: "INTEGER" if pd.api.types.is_integer_dtype(dtype)
+                        else "REAL" if pd.api.types.is_float_dtype(dtype) else "TEXT"
+                        for column, dtype in data_df.dtypes.items()}
+        conn.execute(f'CREATE TABLE {self._quote(table_name)} '
+                     f'({", ".join(self._quote(column) + " " + column_type for column, column_type in column_types.items())})')
+
+    def _insert_rows(self, conn: sqlite3.Connection, table_name: str, data_df: pd.DataFrame,
+                     upsert_key: str = None) -> None:
+        """
+        Inserts the rows of a frame with executemany in batches of LOAD_BATCH_SIZE rows.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            table_name (str): The name of the table.
+            data_df (pd.DataFrame): The rows to insert, missing values become NULL.
+            upsert_key (str, optional): The unique key column, existing rows with the same key are updated.
+
+        Returns:
+            None
+        """
+        columns = list(data_df.columns)
+        statement = (f'INSERT INTO {self._quote(table_name)} ({", ".join(self._quote(column) for column in columns)}) '
+                     f'VALUES ({", ".join("?" for _ in columns)})')
+
+        if upsert_key is not None:
+            value_columns = [column for column in columns if column != upsert_key]
+            statement += (f' ON CONFLICT({self._quote(upsert_key)}) DO UPDATE SET '
+                          f'{", ".join(self._quote(column) + " = excluded." + self._quote(column) for column in value_columns)}')
+
+        for batch in HelperService().get_row_batches(data_df, LOAD_BATCH_SIZE):
+            conn.executemany(statement, batch)
+
+    def _create_key_index(self, conn: sqlite3.Connection, table_name: str, key_column: str) -> None:
+        """
+        Creates the unique index of the date key of a table (used by the upserts and the date lookups).
+
+        Parameters:
+            conn (sqlite3.Connection): The connection to the database.
+            table_name (str): The name of the table.
+            key_column (str): The date key column.
+
+        Returns:
+            None
+        """
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {self._quote("ux_" + table_name + "_" + key_column)} '
+                     f'ON {self._quote(table_name)} ({self._quote(key_column)})')
+
+    def _record_load_stats(self, source: str, rows: int, seconds: float) -> None:
+        """
+        Records the number of loaded rows and the load throughput of a source.
+
+        Parameters:
+            source (str): The name of the source.
+            rows (int): The number of loaded rows.
+            seconds (float): The load duration in seconds.
+
+        Returns:
+            None
+        """
+        self.load_stats[source] = {"rows": rows, "seconds": seconds, "rows_per_sec": rows / max(seconds, 1e-9)}
+
+    def _format_load_stats(self, source: str) -> str:
+        """
+        Formats the load throughput of a source for the log output.
+
+        Parameters:
+            source (str): The name of the source.
+
+        Returns:
+            load_stats (str): The number of rows and the rows per second.
+        """
+        return "({} rows, {:.0f} rows/s)".format(self.load_stats[source]["rows"], self.load_stats[source]["rows_per_sec"])
+
+    def _upsert_data(self, conn: sqlite3.Connection, source: str, source_merged_df: pd.DataFrame,
+                     clear_partitions: bool = True) -> None:
+        """
+        Upserts the rows of the changed partitions of a source, keyed by its date column.
+
+        A Mobilithek partition is a year, i.e. a set of rows: rows of a changed year that are no longer in
+        the data are deleted and counting stations missing in the year are 0. A Meteostat partition is a
+        station, i.e. a set of columns: only the columns of the changed stations are updated.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            source (str): The name of the source.
+            source_merged_df (pd.DataFrame): The transformed data of the changed partitions.
+            clear_partitions (bool, optional): Whether the rows of the partitions missing in the frame are cleared,
+                False for the following chunks of a partition, which only add rows.
+
+        Returns:
+            None
+        """
+        table_name = self._get_table_name(source)
+        key_column = source_merged_df.columns[0]
+        self._drop_view(conn, table_name)
+        table_exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                    (table_name,)).fetchone() is not None
+
+        if not table_exists:
+            # created by hand, DataFrame.to_sql would commit the open transaction
+            self._create_table(conn, table_name, source_merged_df)
+        else:
+            table_columns = [row[1] for row in conn.execute(f'PRAGMA table_info({self._quote(table_name)})')]
+
+            # new counting stations or weather parameters become new columns
+            for column in source_merged_df.columns:
+                if column not in table_columns:
+                    column_type = "INTEGER DEFAULT 0" if source == "Mobilithek" else "REAL"
+                    conn.execute(f'ALTER TABLE {self._quote(table_name)} ADD COLUMN {self._quote(column)} {column_type}')
+                    table_columns.append(column)
+
+            keys = source_merged_df[key_column].tolist()
+            if clear_partitions:
+                self._store_keys(conn, keys)
+
+            if source == "Mobilithek":
+                source_merged_df = source_merged_df.reindex(columns=table_columns, fill_value=0)
+                if clear_partitions:
+                    years = sorted({key.split("-")[-1] for key in keys})
+                    conn.execute(f'DELETE FROM {self._quote(table_name)} '
+                                 f'WHERE substr({self._quote(key_column)}, -4) IN ({", ".join("?" for _ in years)}) '
+                                 f'AND {self._quote(key_column)} NOT IN (SELECT key FROM temp.etl_upsert_keys)', years)
+            elif source == "Meteostat" and clear_partitions:
+                value_columns = [column for column in source_merged_df.columns if column != key_column]
+                conn.execute(f'UPDATE {self._quote(table_name)} '
+                             f'SET {", ".join(self._quote(column) + " = NULL" for column in value_columns)} '
+                             f'WHERE {self._quote(key_column)} NOT IN (SELECT key FROM temp.etl_upsert_keys)')
+
+        self._create_key_index(conn, table_name, key_column)
+        self._insert_rows(conn, table_name, source_merged_df, upsert_key=key_column)
+
+    def _store_keys(self, conn: sqlite3.Connection, keys: List) -> None:
+        """
+        Stores the row keys of a frame in the temporary table etl_upsert_keys, so the upsert can compare
+        against them without binding one SQL variable per key (SQLite caps the variables, 32766 by default).
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            keys (list): The row keys of the frame.
+
+        Returns:
+            None
+        """
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS etl_upsert_keys (key PRIMARY KEY) WITHOUT ROWID')
+        conn.execute('DELETE FROM temp.etl_upsert_keys')
+        conn.executemany('INSERT OR IGNORE INTO temp.etl_upsert_keys VALUES (?)', ((key,) for key in keys))
+
+    def _quote(self, identifier: str) -> str:
+        """
+        Quotes a table or column name for SQLite (the station names contain spaces, dots and umlauts).
+
+        Parameters:
+            identifier (str): The table or column name.
+
+        Returns:
+            quoted_identifier (str): The identifier in double quotes.
+        """
+        return '"' + identifier.replace('"', '""') + '"'
+
+    def _save_partition_state(self, conn: sqlite3.Connection, sources: List) -> None:
+        """
+        Records the hashes of the loaded partitions, so the next incremental run can detect changes.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection to the database.
+            sources (list): The sources whose partitions were loaded.
+
+        Returns:
+            None
+        """
+        conn.execute('CREATE TABLE IF NOT EXISTS etl_partition_state '
+                     '(source TEXT, partition TEXT, sha256 TEXT, loaded_at TEXT, PRIMARY KEY (source, partition))')
+
+        loaded_at = datetime.now().isoformat(timespec='seconds')
+        for source in sources:
+            partitions = self.changed_partitions.get(source) if self.incremental else None
+            for partition, sha256 in self.partition_hashes.get(source, dict()).items():
+                if partitions is None or partition in partitions:
+                    conn.execute('INSERT OR REPLACE INTO etl_partition_state VALUES (?, ?, ?, ?)',
+                                 (source, partition, sha256, loaded_at))
+
+    def _load_partition_state(self, conn: sqlite3.Connection) -> Dict:
+        """
+        Reads the partition hashes recorded by the last load.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection to the database.
+
+        Returns:
+            loaded_hashes (dict): A dictionary of {source name: {partition: SHA-256}}, empty before the first load.
+        """
+        loaded_hashes = dict()
+
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'etl_partition_state'").fetchone():
+            for source, partition, sha256 in conn.execute('SELECT source, partition, sha256 FROM etl_partition_state'):
+                loaded_hashes.setdefault(source, dict())[partition] = sha256
+
+        return loaded_hashes
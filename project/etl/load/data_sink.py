@@ -0,0 +1,38 @@
+# Python imports
+from abc import ABC, abstractmethod
+from typing import Dict
+
+# Third party imports
+
+# Self imports
+
+
+class DataSink(ABC):
+    """
+    A class to represent an additional output of the load stage (the SQLite database is always written).
+
+    Sinks receive the same transformed data as the database. In incremental mode they only receive the
+    changed partitions and must replace exactly those, otherwise they replace all their output. A sink must
+    implement write, an incomplete sink cannot be created.
+
+    Attributes:
+        name (str): The name of the sink used in the log output.
+
+    Methods:
+        write(transformed_data: Dict, replace_all: bool) -> None: Writes transformed data to the sink.
+    """
+
+    name = "sink"
+
+    @abstractmethod
+    def write(self, transformed_data: Dict, replace_all: bool = True) -> None:
+        """
+        Writes transformed data to the sink.
+
+        Parameters:
+            transformed_data (dict): A dict that contains transformed data by source.
+            replace_all (bool, optional): Whether the whole previous output is replaced, or only the given partitions.
+
+        Returns:
+            None
+        """
@@ -0,0 +1,309 @@
+# Python imports
+from typing import Dict, List
+import sqlite3
+
+# Third party imports
+import pandas as pd
+
+# Self imports
+from config.config_var import *
+from utils.service_factory import HelperService
+
+
+class NormalizedWriter:
+    """
+    A class to represent the normalized (long format) output of the data loader.
+
+    The transformed wide frames are stored as fact tables keyed by an integer month (YYYYMM), the station
+    and, for the weather data, the metric, next to the dimension tables of the months, stations and metrics.
+    The fact tables are clustered on their key (WITHOUT ROWID) and have a covering index per station, so both
+    time range and station queries are index range scans. Views named like the wide tables rebuild the
+    wide layout for the existing queries.
+
+    Tables:
+        calendar_month (month, month_date, year, month_of_year, label): The month dimension, label is e.g. 'January-2009'.
+        mobilithek_station (station_id, station_name): The counting station dimension.
+        mobilithek_bicycle_counts (month, station_id, count): The monthly bicycle counts.
+        meteostat_station (station_id, position): The weather station dimension.
+        meteostat_metric (metric, position): The weather parameter dimension (tavg, tmin, ...).
+        meteostat_weather_values (month, station_id, metric, value): The monthly weather values, NULL if missing.
+
+    Methods:
+        write(conn: sqlite3.Connection, source: str, source_merged_df: pd.DataFrame, replace: bool,
+              clear_partitions: bool) -> int: Writes the facts and dimensions of a source.
+        create_view(conn: sqlite3.Connection, source: str, view_name: str) -> None: Creates the wide compatibility view.
+        get_fact_table_name(source: str) -> str: Returns the fact table name of a source.
+        _create_schema(conn: sqlite3.Connection, source: str) -> None: Creates the tables and indexes of a source.
+        _write_calendar(conn: sqlite3.Connection, labels: pd.Series) -> pd.Series: Adds the months of a frame.
+        _write_mobilithek(conn: sqlite3.Connection, source_merged_df: pd.DataFrame, months: pd.Series,
+                          clear_partitions: bool) -> int: Writes the bicycle counts.
+        _write_meteostat(conn: sqlite3.Connection, source_merged_df: pd.DataFrame, months: pd.Series,
+                         clear_partitions: bool) -> int: Writes the weather values.
+        _register_members(conn: sqlite3.Connection, table_name: str, key_column: str, order_column: str, members: List) -> Dict:
+            Adds the new members of a dimension.
+        _insert_rows(conn: sqlite3.Connection, table_name: str, data_df: pd.DataFrame) -> None: Inserts rows in batches.
+        _quote(identifier: str) -> str: Quotes a table or column name for SQLite.
+        _quote_literal(value: str) -> str: Quotes a string value for SQLite.
+    """
+
+    def write(self, conn: sqlite3.Connection, source: str, source_merged_df: pd.DataFrame, replace: bool = True,
+              clear_partitions: bool = True) -> int:
+        """
+        Writes the facts and dimensions of a source.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            source (str): The name of the source.
+            source_merged_df (pd.DataFrame): The transformed (wide) data of the source.
+            replace (bool, optional): Whether all the facts of the source are replaced, or only the partitions
+                (Mobilithek years, Meteostat stations) in the frame.
+            clear_partitions (bool, optional): Whether the facts of the partitions in the frame are deleted first,
+                False for the following chunks of a partition.
+
+        Returns:
+            rows (int): The number of written fact rows.
+        """
+        if replace:
+            for table_name in (["mobilithek_bicycle_counts", "mobilithek_station"] if source == "Mobilithek"
+                               else ["meteostat_weather_values", "meteostat_station", "meteostat_metric"]):
+                conn.execute(f'DROP TABLE IF EXISTS {self._quote(table_name)}')
+
+        self._create_schema(conn, source)
+        months = self._write_calendar(conn, source_merged_df.iloc[:, 0])
+
+        if source == "Mobilithek":
+            return self._write_mobilithek(conn, source_merged_df, months, clear_partitions)
+        elif source == "Meteostat":
+            return self._write_meteostat(conn, source_merged_df, months, clear_partitions)
+
+    def create_view(self, conn: sqlite3.Connection, source: str, view_name: str) -> None:
+        """
+        Creates the view rebuilding the wide table of a source from its facts, one column per station (and metric).
+
+        Parameters:
+            conn (sqlite3.Connection): The connection to the database.
+            source (str): The name of the source.
+            view_name (str): The name of the view, i.e. of the former wide table.
+
+        Returns:
+            None
+        """
+        if source == "Mobilithek":
+            stations = conn.execute('SELECT station_id, station_name FROM mobilithek_station ORDER BY station_id').fetchall()
+            columns = [f'COALESCE(MAX(CASE WHEN f.station_id = {int(station_id)} THEN f.count END), 0) '
+                       f'AS {self._quote(station_name)}' for station_id, station_name in stations]
+            select = (f'SELECT c.label AS "Date", {", ".join(columns)} '
+                      f'FROM mobilithek_bicycle_counts f JOIN calendar_month c ON c.month = f.month '
+                      f'GROUP BY f.month ORDER BY f.month')
+        elif source == "Meteostat":
+            stations = [row[0] for row in conn.execute('SELECT station_id FROM meteostat_station ORDER BY position')]
+            metrics = [row[0] for row in conn.execute('SELECT metric FROM meteostat_metric ORDER BY position')]
+            # the station ids and metrics come from the source information and the files, they are quoted as literals
+            columns = [f'MAX(CASE WHEN f.station_id = {self._quote_literal(station_id)} '
+                       f'AND f.metric = {self._quote_literal(metric)} THEN f.value END) '
+                       f'AS {self._quote(metric + "_" + station_id)}' for station_id in stations for metric in metrics]
+            select = (f'SELECT c.label AS "date", {", ".join(columns)} '
+                      f'FROM meteostat_weather_values f JOIN calendar_month c ON c.month = f.month '
+                      f'GROUP BY f.month ORDER BY f.month')
+
+        conn.execute(f'DROP VIEW IF EXISTS {self._quote(view_name)}')
+        conn.execute(f'CREATE VIEW {self._quote(view_name)} AS {select}')
+
+    def get_fact_table_name(self, source: str) -> str:
+        """
+        Returns the fact table name of a source.
+
+        Parameters:
+            source (str): The name of the source.
+
+        Returns:
+            table_name (str): The name of the fact table of the source.
+        """
+        if source == "Mobilithek":
+            table_name = "mobilithek_bicycle_counts"
+        elif source == "Meteostat":
+            table_name = "meteostat_weather_values"
+
+        return table_name
+
+    def _create_schema(self, conn: sqlite3.Connection, source: str) -> None:
+        """
+        Creates the missing tables and indexes of a source.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection to the database.
+            source (str): The name of the source.
+
+        Returns:
+            None
+        """
+        conn.execute('CREATE TABLE IF NOT EXISTS calendar_month (month INTEGER PRIMARY KEY, month_date TEXT NOT NULL, '
+                     'year INTEGER NOT NULL, month_of_year INTEGER NOT NULL, label TEXT NOT NULL UNIQUE)')
+
+        if source == "Mobilithek":
+            conn.execute('CREATE TABLE IF NOT EXISTS mobilithek_station '
+                         '(station_id INTEGER PRIMARY KEY, station_name TEXT NOT NULL UNIQUE)')
+            conn.execute('CREATE TABLE IF NOT EXISTS mobilithek_bicycle_counts (month INTEGER NOT NULL, '
+                         'station_id INTEGER NOT NULL, count INTEGER NOT NULL, '
+                         'PRIMARY KEY (month, station_id)) WITHOUT ROWID')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_mobilithek_bicycle_counts_station '
+                         'ON mobilithek_bicycle_counts (station_id, month, count)')
+        elif source == "Meteostat":
+            conn.execute('CREATE TABLE IF NOT EXISTS meteostat_station '
+                         '(station_id TEXT PRIMARY KEY, position INTEGER NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS meteostat_metric (metric TEXT PRIMARY KEY, position INTEGER NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS meteostat_weather_values (month INTEGER NOT NULL, '
+                         'station_id TEXT NOT NULL, metric TEXT NOT NULL, value REAL, '
+                         'PRIMARY KEY (month, station_id, metric)) WITHOUT ROWID')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_meteostat_weather_values_station '
+                         'ON meteostat_weather_values (station_id, metric, month, value)')
+
+    def _write_calendar(self, conn: sqlite3.Connection, labels: pd.Series) -> pd.Series:
+        """
+        Adds the months of a frame to the month dimension.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            labels (pd.Series): The month labels of the frame, e.g. 'January-2009'.
+
+        Returns:
+            months (pd.Series): The integer month keys (YYYYMM) of the labels.
+        """
+        dates = pd.to_datetime(labels, format="%B-%Y")
+        months = dates.dt.year * 100 + dates.dt.month
+
+        calendar_df = pd.DataFrame({"month": months, "month_date": dates.dt.strftime("%Y-%m-%d"),
+                                    "year": dates.dt.year, "month_of_year": dates.dt.month, "label": labels})
+        conn.executemany('INSERT OR IGNORE INTO calendar_month VALUES (?, ?, ?, ?, ?)',
+                         calendar_df.astype(object).itertuples(index=False, name=None))
+
+        return months
+
+    def _write_mobilithek(self, conn: sqlite3.Connection, source_merged_df: pd.DataFrame, months: pd.Series,
+                          clear_partitions: bool = True) -> int:
+        """
+        Writes the bicycle counts, replacing the years in the frame.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            source_merged_df (pd.DataFrame): The transformed Mobilithek data.
+            months (pd.Series): The integer month keys of the rows.
+            clear_partitions (bool, optional): Whether the facts of the partitions in the frame are deleted first.
+
+        Returns:
+            rows (int): The number of written fact rows.
+        """
+        station_ids = self._register_members(conn, "mobilithek_station", "station_name", "station_id",
+                                             list(source_merged_df.columns[1:]))
+
+        years = sorted({int(month) // 100 for month in months})
+        if clear_partitions:
+            conn.executemany('DELETE FROM mobilithek_bicycle_counts WHERE month BETWEEN ? AND ?',
+                             [(year * 100 + 1, year * 100 + 12) for year in years])
+
+        facts_df = source_merged_df.iloc[:, 1:].set_axis(months, axis=0).rename(columns=station_ids)
+        facts_df = facts_df.rename_axis(index="month", columns="station_id").stack().rename("count").reset_index()
+        self._insert_rows(conn, "mobilithek_bicycle_counts", facts_df)
+
+        return len(facts_df)
+
+    def _write_meteostat(self, conn: sqlite3.Connection, source_merged_df: pd.DataFrame, months: pd.Series,
+                         clear_partitions: bool = True) -> int:
+        """
+        Writes the weather values, replacing the stations in the frame.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            source_merged_df (pd.DataFrame): The transformed Meteostat data, columns are named 'metric_station'.
+            months (pd.Series): The integer month keys of the rows.
+            clear_partitions (bool, optional): Whether the facts of the partitions in the frame are deleted first.
+
+        Returns:
+            rows (int): The number of written fact rows.
+        """
+        value_columns = [tuple(column.rsplit("_", 1)) for column in source_merged_df.columns[1:]]
+        stations = list(dict.fromkeys(station_id for _, station_id in value_columns))
+
+        self._register_members(conn, "meteostat_metric", "metric", "position",
+                               list(dict.fromkeys(metric for metric, _ in value_columns)))
+        self._register_members(conn, "meteostat_station", "station_id", "position", stations)
+
+        if clear_partitions:
+            conn.executemany('DELETE FROM meteostat_weather_values WHERE station_id = ?', [(station,) for station in stations])
+
+        facts_df = source_merged_df.iloc[:, 1:].set_axis(months, axis=0)
+        facts_df.columns = pd.MultiIndex.from_tuples([(station_id, metric) for metric, station_id in value_columns],
+                                                     names=["station_id", "metric"])
+        # missing values are kept as NULL facts, so the view rebuilds exactly the rows of the wide table
+        facts_df = facts_df.rename_axis(index="month").stack(["station_id", "metric"], dropna=False).rename("value")
+        facts_df = facts_df.reset_index()
+        self._insert_rows(conn, "meteostat_weather_values", facts_df)
+
+        return len(facts_df)
+
+    def _register_members(self, conn: sqlite3.Connection, table_name: str, key_column: str,
+                          order_column: str, members: List) -> Dict:
+        """
+        Adds the new members of a dimension, numbered after the existing ones in order of appearance.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            table_name (str): The name of the dimension table.
+            key_column (str): The column holding the member.
+            order_column (str): The integer column numbering the members (the id or the position).
+            members (list): The members found in the data.
+
+        Returns:
+            member_numbers (dict): A dictionary of {member: number} of all the members of the dimension.
+        """
+        member_numbers = dict(conn.execute(f'SELECT {key_column}, {order_column} FROM {table_name}').fetchall())
+        next_number = max(member_numbers.values(), default=0) + 1
+
+        for member in members:
+            if member not in member_numbers:
+                conn.execute(f'INSERT INTO {table_name} ({key_column}, {order_column}) VALUES (?, ?)', (member, next_number))
+                member_numbers[member] = next_number
+                next_number += 1
+
+        return member_numbers
+
+    def _insert_rows(self, conn: sqlite3.Connection, table_name: str, data_df: pd.DataFrame) -> None:
+        """
+        Inserts the rows of a frame with executemany in batches of LOAD_BATCH_SIZE rows.
+
+        Parameters:
+            conn (sqlite3.Connection): The connection with an open transaction.
+            table_name (str): The name of the table.
+            data_df (pd.DataFrame): The rows to insert, missing values become NULL.
+
+        Returns:
+            None
+        """
+        statement = f'INSERT INTO {table_name} ({", ".join(data_df.columns)}) VALUES ({", ".join("?" for _ in data_df.columns)})'
+
+        for batch in HelperService().get_row_batches(data_df, LOAD_BATCH_SIZE):
+            conn.executemany(statement, batch)
+
+    def _quote(self, identifier: str) -> str:
+        """
+        Quotes a table or column name for SQLite (the station names contain spaces, dots and umlauts).
+
+        Parameters:
+            identifier (str): The table or column name.
+
+        Returns:
+            quoted_identifier (str): The identifier in double quotes.
+        """
+        return '"' + identifier.replace('"', '""') + '"'
+
+    def _quote_literal(self, value: str) -> str:
+        """
+        Quotes a string value for SQLite, for the SQL of the views, which cannot have bound parameters.
+
+        Parameters:
+            value (str): The string value.
+
+        Returns:
+            quoted_value (str): The value in single quotes, embedded single quotes doubled.
+        """
+        return "'" + str(value).replace("'", "''") + "'"
@@ -1,167 +1,883 @@
-# Python imports
-from typing import List
-import os, sys, calendar
-
-# Third party imports
-import pandas as pd
-
-# Self imports
-from config.config_var import *
-
-
-class DataTransformer:
-    """
-    A class to represent the data transformer of an ETL pipeline.
-
-    Attributes:
-        extracted_data (dict): A dictionary containing information of extracted data
-        transformed_data (dict): A dict that contains transformed data.
-    
-    Methods:
-        transform() -> None: Transforms the extracted data by applying necessary transformations.
-        _read_data(file_path: str, sep: str, compression: str, encoding: str) -> pd.DataFrame:
-            Reads a file into a pandas DataFrame.
-        _delete_file(file_path: str) -> None: Delete a file from the directory.
-    """
-
-    def __init__(self) -> None:
-        self.extracted_data = None
-        self.transformed_data = dict()
-
-    def transform(self) -> None:
-        """
-        Transforms the extracted data by applying necessary transformations.
-
-        Parameters:
-            None
-
-        Returns:
-            None
-        """
-        for source, files_list in self.extracted_data.items():
-            # read, transformed and merge data of source 1: Mobilithek
-            if source == "Mobilithek":
-                temp_df_list = []
-
-                # read and transformed data of source 1: Mobilithek
-                for year, file_name in files_list:
-                    file_path = os.path.join(DOWNLOADED_RAW_FILE_PATH, file_name)
-
-                    if int(year) >= 2016 and int(year)<=2022:
-                        if int(year) >= 2016 and int(year)<=2020:
-                            data_df = self._read_data(file_path=file_path, sep=';', encoding='utf-8-sig')
-                        else:
-                            data_df = self._read_data(file_path=file_path, sep=';', encoding='unicode_escape')
-                        
-                        data_df.rename(columns={data_df.columns[0]: 'Date'}, inplace=True)
-                        data_df.fillna(0, inplace=True)
-                        data_df['Date'] = data_df['Date'].replace(
-                            data_df['Date'].unique(),
-                            [month+"-"+year for month in calendar.month_name[1:]])
-                        data_df[data_df.columns[1:]] = data_df[data_df.columns[1:]] * 1000
-                        data_df = data_df.astype({col:'int64' for col in data_df.columns[1:]})
-                    else:
-                        data_df = self._read_data(file_path=file_path, sep=';', encoding='unicode_escape')
-
-                        data_df.rename(columns={data_df.columns[0]: 'Date'}, inplace=True)
-                        data_df.drop(data_df[data_df['Date'] == 'Jahressumme'].index, inplace=True)
-                        data_df.fillna(0, inplace=True)
-                        data_df = data_df.astype({col:'int64' for col in data_df.columns[1:]})
-                        data_df['Date'] = data_df['Date'].replace(
-                            data_df['Date'].unique(),
-                            [month+"-"+year for month in calendar.month_name[1:]])
-                    
-                    print(f"Succeed: Transformation of {file_name} to dataframe is successfully done")
-                    temp_df_list.append(data_df)
-                    self._delete_file(file_path)
-                
-                # merge data of source 1: Mobilithek
-                merged_df = pd.concat([data_df for data_df in temp_df_list], axis=0, ignore_index=True)
-                merged_df.fillna(0, inplace=True)
-                merged_df = merged_df.astype({col:'int64' for col in merged_df.columns[1:]})
-                # merged_df.to_csv(source+'.csv', index=False, encoding='utf-8-sig')
-                print(f"Succeed: Extracted data from {source} are successfully transformed and merged")
-            
-            # read, transformed and merge data of source 2: Meteostat
-            elif source == "Meteostat":
-                temp_df_list = []
-                parameters = ["year", "month", "tavg", "tmin", "tmax", "prcp", "wspd", "pres", "tsun"]
-
-                # read and transformed data of source 2: Meteostat
-                for station_id, _, file_name in files_list:
-                    file_path = os.path.join(DOWNLOADED_RAW_FILE_PATH, file_name)
-                    data_df = self._read_data(file_path=file_path, header=None, names=parameters, compression='gzip')
-                    
-                    data_df = data_df.loc[(data_df['year'] >= 2009) & (data_df['year'] <= 2022)]
-                    data_df['month'] = data_df['month'].replace(
-                            [num for num in range(1, 13)],
-                            [month for month in calendar.month_name[1:]])
-                    data_df['date'] = data_df['month'] + "-" + data_df['year'].astype(str)
-                    data_df.drop(['month', 'year'], inplace=True, axis=1)
-                    data_df = data_df[['date'] + [col for col in data_df.columns if col != 'date']]
-                    data_df.rename(columns={col:col+"_"+station_id for col in data_df.columns if col != 'date'}, inplace=True)
-                    # data_df.fillna(0, inplace=True)
-                    data_df = data_df.reset_index(drop=True)
-
-                    print(f"Succeed: Transformation of {file_name} to dataframe is successfully done")
-                    temp_df_list.append(data_df)
-                    self._delete_file(file_path)
-                
-                # merge data of source 2: Meteostat
-                merged_df = pd.merge(temp_df_list[0], temp_df_list[1], on='date', how='outer')
-                # merged_df.fillna(0, inplace=True)
-                # merged_df.to_csv(source+'.csv', index=False)
-                print(f"Succeed: Extracted data from {source} are successfully transformed and merged")
-            
-            self.transformed_data[source] = merged_df
-
-    def _read_data(self, file_path: str, sep: str = ",",
-                   header: int = 0,
-                   names: List = None,
-                   compression: str = None,
-                   encoding: str = 'utf-8') -> pd.DataFrame:
-        """
-        Reads a file into a pandas DataFrame.
-
-        Parameters:
-            file_path (str): The path to the desired file.
-            sep (str, optional): The seperator for the desired file.
-            header (int, optional): 
-            compression (str, optional): The type of compression used on the file (e.g., 'gzip', 'zip').
-            encoding (str, optional): The encoding of the desired file. Defaults to 'utf-8'.
-
-        Returns:
-            data_df (pd.DataFrame): The contents of the file as a pandas DataFrame.
-        """
-        try:
-            data_df = pd.read_csv(file_path, sep=sep,
-                                  header=header, names=names,
-                                  compression=compression, encoding=encoding)
-            print(f"Succeed: '{file_path.split(os.sep)[-1]}' is successfully loaded")
-            return data_df
-        except FileNotFoundError:
-            print(f"Error: File not found- '{file_path}'")
-            sys.exit(1)
-        except Exception as e:
-            print(f"Error: Failed reading the file- {str(e)}")
-            sys.exit(1)
-    
-    def _delete_file(self, file_path: str) -> None:
-        """
-        Delete a file from the directory.
-
-        Parameters:
-            file_path (str): The desired file path.
-
-        Returns:
-            None
-        """
-        try:
-            os.remove(file_path)
-            print(f"Succeed: File '{file_path.split(os.sep)[-1]}' deleted successfully.")
-        except OSError as e:
-            print(f"Error: Issue occurred while deleting the file: {str(e)}")
-            sys.exit(1)
-        except Exception as e:
-            print(f"Error: Failed deleting the file- {str(e)}")
-            sys.exit(1)
+# Python imports
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Tuple
+import os, sys, time, queue, calendar, multiprocessing, importlib.util
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Self imports
+from config.config_var import *
+from config.source_schema import SOURCE_SCHEMAS
+from etl.transform.frame_compactor import FrameCompactor
+from etl.transform.station_merger import StationMerger
+from etl.transform.year_window_reader import YearWindowReader
+
+
+class DataTransformer:
+    """
+    A class to represent the data transformer of an ETL pipeline.
+
+    Attributes:
+        extracted_data (dict): A dictionary containing information of extracted data
+        source_info (dict): The source information, the Meteostat rows are read within its 'year_window' and in its
+            'granularity', resampled to its 'resample' grain.
+        transformed_data (dict): A dict that contains transformed data.
+        delete_raw_files (bool): Whether the raw files are deleted after transformation (kept while the raw cache retains them).
+        parallel (bool): Whether the files are transformed in a process pool (False forces serial execution for debugging).
+        max_workers (int): The number of worker processes used in parallel mode.
+        file_stats (list): The wall/CPU time, bytes read and rows of every transformed file, in task order.
+        compact (bool): Whether the merged frames are kept in the compact representation (see frame_compactor.py).
+        memory_stats (dict): The memory in bytes of every merged frame before and after compaction, by source.
+        memory_budget (int): The memory in bytes a chunk of a file may take in chunked mode.
+        raw_dir (str): The directory of the extracted files.
+    
+    Methods:
+        transform(source_names: List) -> None: Transforms the extracted data by applying necessary transformations.
+        transform_stream(file_queue: queue.Queue) -> Iterator[Tuple]: Transforms the files of a queue as they arrive.
+        transform_chunks(source_names: List) -> Iterator[Tuple]: Transforms the files chunk by chunk within the memory budget.
+        get_year_window(source: str) -> Tuple: Returns the first and last year of the rows of a source.
+        get_granularity(source: str) -> Tuple: Returns the grain of the files of a source and its resampled grain.
+        _get_source_entry(source: str) -> Dict: Returns the entry of a source in the source information.
+        _merge_sources(task_results: List) -> None: Merges the transformed frames per source.
+        _create_process_pool(max_workers: int) -> ProcessPoolExecutor: Creates a process pool whose workers are not forked.
+        _run_file_tasks(file_tasks: List) -> List: Transforms and measures the files, in a process pool in parallel mode.
+        _run_file_task(source: str, file_info: Tuple) -> Tuple: Transforms a single file and measures it.
+        _transform_file(source: str, file_info: Tuple) -> pd.DataFrame: Reads and transforms a single extracted file.
+        _transform_file_chunks(source: str, file_info: Tuple) -> Iterator[pd.DataFrame]: Reads and transforms a
+            single extracted file chunk by chunk.
+        _transform_mobilithek_file(year: str, file_path: str) -> pd.DataFrame: Transforms the bicycle traffic of a year.
+        _transform_meteostat_file(station_id: str, file_path: str) -> pd.DataFrame: Transforms the weather of a station.
+        _transform_meteostat_chunks(station_id: str, file_path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+            Transforms the weather of a station chunk by chunk, resampled on the fly.
+        _clean_mobilithek(year: str, data_df: pd.DataFrame, schema: Dict, first_month: int) -> pd.DataFrame:
+            Cleans the parsed rows of a bicycle traffic file.
+        _clean_meteostat(station_id: str, data_df: pd.DataFrame, time_keys: np.ndarray, schema: Dict) -> pd.DataFrame:
+            Cleans the parsed rows of a weather file.
+        _resample_meteostat(station_id: str, data_df: pd.DataFrame, period_keys: np.ndarray, schema: Dict,
+                            resample: str) -> pd.DataFrame: Resamples the parsed rows of a weather file.
+        _label_meteostat(station_id: str, value_df: pd.DataFrame, labels: np.ndarray) -> pd.DataFrame:
+            Suffixes the weather parameters with the station and puts the time labels in front.
+        _get_time_keys(data_df: pd.DataFrame, granularity: str) -> np.ndarray: Builds the integer time keys of rows.
+        _get_time_labels(data_df: pd.DataFrame, time_keys: np.ndarray, granularity: str) -> np.ndarray:
+            Returns the time labels of rows.
+        _format_time_labels(time_keys: np.ndarray, granularity: str) -> np.ndarray: Formats time keys as labels.
+        _get_chunk_rows(file_path: str, read_options: Dict) -> int: Returns the rows of a chunk within the memory budget.
+        _get_schema(source: str, year: int, granularity: str) -> Dict: Returns the declared parse schema of a source.
+        _get_read_options(schema: Dict) -> Dict: Converts a declared schema into the keyword arguments of _read_data.
+        _merge_mobilithek(temp_df_list: List) -> pd.DataFrame: Merges the yearly bicycle traffic frames.
+        _merge_meteostat(temp_df_list: List) -> pd.DataFrame: Merges the weather frames of the stations.
+        _read_data(file_path: str, sep: str, header: int, names: List, usecols: List, dtype: Dict, na_values: List,
+                   thousands: str, decimal: str, compression: str, encoding: str, engine: str, chunksize: int,
+                   year_window: Tuple, rows_sorted: bool) -> pd.DataFrame:
+            Reads a file into a pandas DataFrame (or an iterator of chunks).
+        _is_engine_available(engine: str) -> bool: Checks whether a pandas CSV parser engine can be used.
+        _delete_file(file_path: str) -> None: Delete a file from the directory.
+    """
+
+    def __init__(self, delete_raw_files: bool = not RAW_CACHE_ENABLED,
+                 parallel: bool = TRANSFORM_PARALLEL, max_workers: int = TRANSFORM_MAX_WORKERS,
+                 compact: bool = TRANSFORM_COMPACT_DTYPES, memory_budget: int = TRANSFORM_MEMORY_BUDGET,
+                 raw_dir: str = DOWNLOADED_RAW_FILE_PATH) -> None:
+        self.extracted_data = None
+        self.source_info = None
+        self.transformed_data = dict()
+        self.delete_raw_files = delete_raw_files
+        self.parallel = parallel
+        self.max_workers = max_workers
+        self.file_stats = list()
+        self.compact = compact
+        self.memory_stats = dict()
+        self.memory_budget = memory_budget
+        self.raw_dir = raw_dir
+
+    def __getstate__(self) -> Dict:
+        """
+        Returns the state sent to the worker processes, without the data they do not need.
+
+        Parameters:
+            None
+
+        Returns:
+            state (dict): The attributes of the transformer, the extracted and transformed data left empty.
+        """
+        return {**self.__dict__, "extracted_data": None, "transformed_data": dict(), "file_stats": list()}
+
+    def transform(self, source_names: List = None) -> None:
+        """
+        Transforms the extracted data by applying necessary transformations.
+
+        Every file is read and cleaned independently, in a process pool when `parallel` is set,
+        and the cleaned frames are merged per source in the order of `extracted_data`. Sources can be
+        transformed separately (also concurrently), the file statistics of the other sources are kept then.
+
+        Parameters:
+            source_names (list, optional): The sources to transform, all the sources of `extracted_data` by default.
+
+        Returns:
+            None
+        """
+        file_tasks = [(source, file_info) for source in (self.extracted_data if source_names is None else source_names)
+                      for file_info in self.extracted_data.get(source, list())]
+
+        task_results = self._run_file_tasks(file_tasks)
+
+        if source_names is None:
+            self.file_stats = [file_stats for _, file_stats in task_results]
+        else:
+            self.file_stats.extend(file_stats for _, file_stats in task_results)
+        self._merge_sources([(source, data_df) for (source, _), (data_df, _) in zip(file_tasks, task_results)])
+
+    def transform_stream(self, file_queue: queue.Queue) -> Iterator[Tuple]:
+        """
+        Transforms the files of a queue as they arrive, while the extractor is still downloading.
+
+        The queue holds (plan position, source name, extracted file info) items and ends with None. In
+        parallel mode at most `max_workers` files are in the process pool, every transformed file is yielded
+        as soon as it is done. Once the queue ended, the frames are merged per source in the planned order,
+        so `transformed_data` and `file_stats` are the same as after `transform`.
+
+        Parameters:
+            file_queue (queue.Queue): The queue of the landed files.
+
+        Returns:
+            partitions (Iterator[Tuple]): The (source name, extracted file info, transformed data) of every file.
+        """
+        task_results = dict()
+
+        if self.parallel and self.max_workers > 1:
+            with self._create_process_pool(self.max_workers) as executor:
+                pending = dict()
+                queue_ended = False
+
+                while not queue_ended or pending:
+                    # take the landed files, without blocking while transformations are running
+                    while not queue_ended and len(pending) < self.max_workers:
+                        try:
+                            item = file_queue.get(timeout=STREAM_POLL_INTERVAL) if pending else file_queue.get()
+                        except queue.Empty:
+                            break
+                        if item is None:
+                            queue_ended = True
+                        else:
+                            pending[executor.submit(self._run_file_task, *item[1:])] = item
+
+                    done, _ = wait(pending, timeout=STREAM_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        task_index, source, file_info = pending.pop(future)
+                        task_results[task_index] = (source, *future.result())
+                        yield source, file_info, task_results[task_index][1]
+        else:
+            for task_index, source, file_info in iter(file_queue.get, None):
+                task_results[task_index] = (source, *self._run_file_task(source, file_info))
+                yield source, file_info, task_results[task_index][1]
+
+        ordered_results = [task_results[task_index] for task_index in sorted(task_results)]
+        self.file_stats = [file_stats for _, _, file_stats in ordered_results]
+        self._merge_sources([(source, data_df) for source, data_df, _ in ordered_results])
+
+    def transform_chunks(self, source_names: List = None) -> Iterator[Tuple]:
+        """
+        Transforms the extracted files chunk by chunk, for loading every chunk as soon as it is cleaned.
+
+        Every file is read in chunks of at most `memory_budget` bytes of parsed values and every chunk is
+        cleaned and yielded on its own. Nothing is merged or kept, `transformed_data` stays empty, so the peak
+        memory is the one of a chunk whatever the number of years, stations or rows. The files are transformed
+        one after the other in this process, the file statistics only measure the time spent transforming.
+
+        Parameters:
+            source_names (list, optional): The sources to transform, all the sources of `extracted_data` by default.
+
+        Returns:
+            chunks (Iterator[Tuple]): The (source name, extracted file info, transformed chunk) of every chunk, in file order.
+        """
+        if source_names is None:
+            self.file_stats = list()
+
+        for source in (self.extracted_data if source_names is None else source_names):
+            for file_info in self.extracted_data.get(source, list()):
+                file_path = os.path.join(self.raw_dir, file_info[-1])
+                file_stats = {"source": source, "file_name": file_info[-1], "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                              "bytes_read": os.path.getsize(file_path) if os.path.exists(file_path) else 0, "rows": 0}
+                chunks = self._transform_file_chunks(source, file_info)
+
+                while True:
+                    # the time the consumer takes to load a chunk is not part of the transformation
+                    started_at, cpu_started_at = time.perf_counter(), time.process_time()
+                    data_df = next(chunks, None)
+                    file_stats["wall_seconds"] += time.perf_counter() - started_at
+                    file_stats["cpu_seconds"] += time.process_time() - cpu_started_at
+
+                    if data_df is None:
+                        break
+                    file_stats["rows"] += len(data_df)
+                    yield source, file_info, data_df
+
+                self.file_stats.append(file_stats)
+
+    def get_year_window(self, source: str) -> Tuple:
+        """
+        Returns the first and last year of the rows of a source, its 'year_window' in the source information.
+
+        Parameters:
+            source (str): The name of the source.
+
+        Returns:
+            year_window (tuple/none): The first and last year, by default METEOSTAT_YEAR_WINDOW for Meteostat and None
+                (all the rows) for the other sources.
+        """
+        source_entry = self._get_source_entry(source)
+        if "year_window" in source_entry:
+            return tuple(source_entry["year_window"])
+
+        return tuple(METEOSTAT_YEAR_WINDOW) if source == "Meteostat" else None
+
+    def get_granularity(self, source: str) -> Tuple:
+        """
+        Returns the grain of the files of a source and the coarser grain they are resampled to, the 'granularity'
+        and 'resample' of the source in the source information.
+
+        Parameters:
+            source (str): The name of the source.
+
+        Returns:
+            granularity (tuple): The grain of the files ('monthly', 'daily' or 'hourly') and the resampled grain or None,
+                by default METEOSTAT_GRANULARITY for Meteostat and monthly (its only grain) for Mobilithek.
+        """
+        if source != "Meteostat":
+            return "monthly", None
+
+        source_entry = self._get_source_entry(source)
+        granularity = source_entry.get("granularity", METEOSTAT_GRANULARITY)
+        resample = source_entry.get("resample")
+
+        if granularity not in TIME_KEY_SCALES:
+            print(f"Error: Unknown granularity '{granularity}' of {source}, expected one of {list(TIME_KEY_SCALES)}")
+            sys.exit(1)
+        # coarser grains have smaller time keys
+        if resample is not None and not TIME_KEY_SCALES.get(resample, TIME_KEY_SCALES[granularity]) < TIME_KEY_SCALES[granularity]:
+            print(f"Error: {granularity.capitalize()} {source} data cannot be resampled to '{resample}', "
+                  f"only to a coarser grain")
+            sys.exit(1)
+
+        return granularity, resample
+
+    def _get_source_entry(self, source: str) -> Dict:
+        """
+        Returns the entry of a source in the source information.
+
+        Parameters:
+            source (str): The name of the source.
+
+        Returns:
+            source_entry (dict): The entry of the source, empty without source information.
+        """
+        for source_entry in (self.source_info or dict()).get("data_sources", list()):
+            if source_entry["source_name"] == source:
+                return source_entry
+
+        return dict()
+
+    def _merge_sources(self, task_results: List) -> None:
+        """
+        Merges the transformed frames per source into `transformed_data`, in the order of the sources.
+        In compact mode the merged frames are compacted and their memory before and after is reported.
+
+        Parameters:
+            task_results (list): The (source name, transformed data) of every file, in the planned order.
+
+        Returns:
+            None
+        """
+        for source in dict.fromkeys(source for source, _ in task_results):
+            temp_df_list = [data_df for task_source, data_df in task_results if task_source == source]
+
+            # merge data of source 1: Mobilithek
+            if source == "Mobilithek":
+                merged_df = self._merge_mobilithek(temp_df_list)
+            # merge data of source 2: Meteostat
+            elif source == "Meteostat":
+                merged_df = self._merge_meteostat(temp_df_list)
+
+            print(f"Succeed: Extracted data from {source} are successfully transformed and merged")
+
+            if self.compact:
+                frame_compactor = FrameCompactor()
+                bytes_before = frame_compactor.memory_usage(merged_df)
+                merged_df = frame_compactor.compact(merged_df)
+                bytes_after = frame_compactor.memory_usage(merged_df)
+                self.memory_stats[source] = {"bytes_before": bytes_before, "bytes_after": bytes_after}
+                print(f"Succeed: Transformed data of {source} compacted from {bytes_before / 1024:.1f} KiB "
+                      f"to {bytes_after / 1024:.1f} KiB ({1 - bytes_after / max(bytes_before, 1):.0%} less)")
+
+            self.transformed_data[source] = merged_df
+
+    def _create_process_pool(self, max_workers: int) -> ProcessPoolExecutor:
+        """
+        Creates a process pool whose workers are started with TRANSFORM_START_METHOD instead of being forked,
+        since the pool is created while download threads may hold locks (sessions, raw cache) a fork would copy.
+
+        Parameters:
+            max_workers (int): The number of worker processes.
+
+        Returns:
+            executor (ProcessPoolExecutor): The process pool.
+        """
+        start_method = TRANSFORM_START_METHOD
+        if start_method not in multiprocessing.get_all_start_methods():
+            start_method = "spawn"
+
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(start_method))
+
+    def _run_file_tasks(self, file_tasks: List) -> List:
+        """
+        Transforms and measures the files, in a process pool when `parallel` is set. The task graph runs it
+        from a scheduler thread while other branches download, so the pool does not fork (see _create_process_pool).
+
+        Parameters:
+            file_tasks (list): The (source name, extracted file info) of every file.
+
+        Returns:
+            task_results (list): The (transformed data, file statistics) of every file, in task order.
+        """
+        if self.parallel and self.max_workers > 1 and len(file_tasks) > 1:
+            with self._create_process_pool(min(self.max_workers, len(file_tasks))) as executor:
+                return list(executor.map(self._run_file_task, *zip(*file_tasks)))
+
+        return [self._run_file_task(source, file_info) for source, file_info in file_tasks]
+
+    def _run_file_task(self, source: str, file_info: Tuple) -> Tuple:
+        """
+        Transforms a single file and measures it, the CPU time is the one of the (worker) process running it.
+
+        Parameters:
+            source (str): The name of the source the file belongs to.
+            file_info (tuple): The entry of the file in `extracted_data`.
+
+        Returns:
+            task_result (tuple): The transformed data and a dict of the file name, wall/CPU seconds, bytes read and rows.
+        """
+        file_path = os.path.join(self.raw_dir, file_info[-1])
+        bytes_read = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        started_at, cpu_started_at = time.perf_counter(), time.process_time()
+
+        data_df = self._transform_file(source, file_info)
+
+        return data_df, {"source": source, "file_name": file_info[-1],
+                         "wall_seconds": time.perf_counter() - started_at,
+                         "cpu_seconds": time.process_time() - cpu_started_at,
+                         "bytes_read": bytes_read, "rows": len(data_df)}
+
+    def _transform_file(self, source: str, file_info: Tuple) -> pd.DataFrame:
+        """
+        Reads and transforms a single extracted file (runs in a worker process in parallel mode).
+
+        Parameters:
+            source (str): The name of the source the file belongs to.
+            file_info (tuple): The entry of the file in `extracted_data`.
+
+        Returns:
+            data_df (pd.DataFrame): The transformed data of the file.
+        """
+        file_name = file_info[-1]
+        file_path = os.path.join(self.raw_dir, file_name)
+
+        # read and transformed data of source 1: Mobilithek
+        if source == "Mobilithek":
+            data_df = self._transform_mobilithek_file(file_info[0], file_path)
+        # read and transformed data of source 2: Meteostat
+        elif source == "Meteostat":
+            data_df = self._transform_meteostat_file(file_info[0], file_path)
+
+        print(f"Succeed: Transformation of {file_name} to dataframe is successfully done")
+        if self.delete_raw_files:
+            self._delete_file(file_path)
+
+        return data_df
+
+    def _transform_file_chunks(self, source: str, file_info: Tuple) -> Iterator[pd.DataFrame]:
+        """
+        Reads and transforms a single extracted file chunk by chunk, chunks without rows left are skipped.
+
+        Parameters:
+            source (str): The name of the source the file belongs to.
+            file_info (tuple): The entry of the file in `extracted_data`.
+
+        Returns:
+            chunks (Iterator[pd.DataFrame]): The transformed chunks of the file.
+        """
+        file_name = file_info[-1]
+        file_path = os.path.join(self.raw_dir, file_name)
+
+        # read and clean data of source 1: Mobilithek
+        if source == "Mobilithek":
+            schema = self._get_schema(source, int(file_info[0]))
+            read_options = self._get_read_options(schema)
+            # the month labels are positional, the rows of a chunk continue the months of the previous chunks
+            first_month = 1
+
+            for data_df in self._read_data(file_path=file_path, chunksize=self._get_chunk_rows(file_path, read_options),
+                                           **read_options):
+                data_df = self._clean_mobilithek(file_info[0], data_df, schema, first_month)
+                first_month += data_df['Date'].nunique()
+                if len(data_df):
+                    yield data_df
+        # read and clean data of source 2: Meteostat
+        elif source == "Meteostat":
+            schema = self._get_schema(source, None, self.get_granularity(source)[0])
+            chunk_rows = self._get_chunk_rows(file_path, self._get_read_options(schema))
+
+            for data_df in self._transform_meteostat_chunks(file_info[0], file_path, chunk_rows):
+                if len(data_df):
+                    yield data_df
+
+        print(f"Succeed: Transformation of {file_name} to dataframe chunks is successfully done")
+        if self.delete_raw_files:
+            self._delete_file(file_path)
+
+    def _transform_mobilithek_file(self, year: str, file_path: str) -> pd.DataFrame:
+        """
+        Reads and transforms the bicycle traffic file of a single year.
+
+        The file is parsed with the declared schema of its year range, so the counts arrive as integers
+        (thousands separators included), only the missing counts are filled.
+
+        Parameters:
+            year (str): The year of the file.
+            file_path (str): The path to the downloaded file.
+
+        Returns:
+            data_df (pd.DataFrame): The monthly counts of the year with a 'Date' column like 'January-2009'.
+        """
+        schema = self._get_schema("Mobilithek", int(year))
+        data_df = self._read_data(file_path=file_path, **self._get_read_options(schema))
+
+        return self._clean_mobilithek(year, data_df, schema)
+
+    def _transform_meteostat_file(self, station_id: str, file_path: str) -> pd.DataFrame:
+        """
+        Reads and transforms the weather file of a single station, only the rows of its year window are parsed.
+        Monthly files are parsed at once, daily and hourly files in chunks within the memory budget, so the full
+        history of a station is never parsed at once.
+
+        Parameters:
+            station_id (str): The id of the weather station.
+            file_path (str): The path to the downloaded file.
+
+        Returns:
+            data_df (pd.DataFrame): The weather of the station with a 'date' column and '<param>_<station>' columns.
+        """
+        granularity, _ = self.get_granularity("Meteostat")
+        chunk_rows = None
+        if granularity != "monthly":
+            schema = self._get_schema("Meteostat", None, granularity)
+            chunk_rows = self._get_chunk_rows(file_path, self._get_read_options(schema))
+
+        chunks = list(self._transform_meteostat_chunks(station_id, file_path, chunk_rows))
+
+        return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+    def _transform_meteostat_chunks(self, station_id: str, file_path: str,
+                                    chunksize: int = None) -> Iterator[pd.DataFrame]:
+        """
+        Reads and transforms the weather file of a single station chunk by chunk, in the grain of the source.
+
+        The time of every row is turned into an integer key (YYYYMM, YYYYMMDD or YYYYMMDDHH) in one vectorized
+        pass, the year window and the resampling are integer arithmetic on the keys. When the rows are resampled
+        to a coarser grain, the last period of a chunk may go on in the next chunk (the rows are in chronological
+        order), its rows are carried over and only complete periods are aggregated.
+
+        Parameters:
+            station_id (str): The id of the weather station.
+            file_path (str): The path to the downloaded file.
+            chunksize (int, optional): The rows of a chunk, None to read the file at once.
+
+        Returns:
+            chunks (Iterator[pd.DataFrame]): The transformed chunks with a 'date' column and '<param>_<station>' columns.
+        """
+        granularity, resample = self.get_granularity("Meteostat")
+        schema = self._get_schema("Meteostat", None, granularity)
+        first_year, last_year = self.get_year_window("Meteostat")
+        data = self._read_data(file_path=file_path, chunksize=chunksize, year_window=(first_year, last_year),
+                               **self._get_read_options(schema))
+        carried_rows = None
+
+        for data_df in (data if chunksize else [data]):
+            time_keys = self._get_time_keys(data_df, granularity)
+            # the reader already dropped the rows of other years, unless a line had an unexpected format
+            years = time_keys // TIME_KEY_SCALES[granularity]
+            in_window = (years >= first_year) & (years <= last_year)
+            data_df, time_keys = data_df[in_window], time_keys[in_window]
+
+            if resample is None:
+                yield self._clean_meteostat(station_id, data_df, time_keys, schema)
+                continue
+
+            period_keys = time_keys // (TIME_KEY_SCALES[granularity] // TIME_KEY_SCALES[resample])
+            if carried_rows is not None:
+                data_df = pd.concat([carried_rows[0], data_df])
+                period_keys = np.concatenate([carried_rows[1], period_keys])
+
+            complete = period_keys != (period_keys[-1] if len(period_keys) else -1)
+            carried_rows = (data_df[~complete], period_keys[~complete])
+            yield self._resample_meteostat(station_id, data_df[complete], period_keys[complete], schema, resample)
+
+        if carried_rows is not None and len(carried_rows[1]):
+            yield self._resample_meteostat(station_id, *carried_rows, schema, resample)
+
+    def _clean_mobilithek(self, year: str, data_df: pd.DataFrame, schema: Dict, first_month: int = 1) -> pd.DataFrame:
+        """
+        Cleans the parsed rows of a bicycle traffic file, the whole file or a chunk of it.
+
+        The rows are the months of the year in order, the summary rows of the schema are dropped.
+
+        Parameters:
+            year (str): The year of the file.
+            data_df (pd.DataFrame): The parsed rows.
+            schema (dict): The declared schema of the year.
+            first_month (int, optional): The month of the first row, after the rows of the previous chunks.
+
+        Returns:
+            data_df (pd.DataFrame): The monthly counts with a 'Date' column like 'January-2009'.
+        """
+        dates = data_df[data_df.columns[0]]
+        if schema["drop_rows"]:
+            data_df = data_df[~dates.isin(schema["drop_rows"])]
+            dates = dates[data_df.index]
+
+        # the counts are parsed as integers, a missing count is 0 like in the months a station did not exist
+        counts = data_df[data_df.columns[1:]].fillna(0).to_numpy(dtype='int64')
+        data_df = pd.DataFrame(counts, columns=data_df.columns[1:])
+        unique_dates = dates.unique()
+        data_df.insert(0, 'Date', dates.replace(
+            unique_dates,
+            [month+"-"+year for month in calendar.month_name[first_month:first_month + len(unique_dates)]]).to_numpy())
+
+        return data_df
+
+    def _clean_meteostat(self, station_id: str, data_df: pd.DataFrame, time_keys: np.ndarray, schema: Dict) -> pd.DataFrame:
+        """
+        Cleans the parsed rows of a weather file within the year window, the whole file or a chunk of it.
+
+        Parameters:
+            station_id (str): The id of the weather station.
+            data_df (pd.DataFrame): The parsed rows.
+            time_keys (np.ndarray): The integer time keys of the rows.
+            schema (dict): The declared schema of the grain of the file.
+
+        Returns:
+            data_df (pd.DataFrame): The weather of the station with a 'date' column and '<param>_<station>' columns.
+        """
+        labels = self._get_time_labels(data_df, time_keys, schema["granularity"])
+
+        return self._label_meteostat(station_id, data_df.drop(columns=schema["time_columns"]), labels)
+
+    def _resample_meteostat(self, station_id: str, data_df: pd.DataFrame, period_keys: np.ndarray,
+                            schema: Dict, resample: str) -> pd.DataFrame:
+        """
+        Resamples the parsed rows of a weather file to a coarser grain, with the aggregations of the schema.
+
+        Parameters:
+            station_id (str): The id of the weather station.
+            data_df (pd.DataFrame): The parsed rows of complete periods.
+            period_keys (np.ndarray): The integer time keys of the rows in the coarser grain.
+            schema (dict): The declared schema of the grain of the file.
+            resample (str): The coarser grain.
+
+        Returns:
+            data_df (pd.DataFrame): The resampled weather of the station with a 'date' column and '<param>_<station>' columns.
+        """
+        aggregations = schema["aggregations"]
+        grouped = data_df[list(aggregations)].groupby(period_keys, sort=False)
+        # a period without any value is missing, the sum of no values would be 0
+        resampled_df = grouped.agg(aggregations).where(grouped.count() > 0)
+        resampled_df = resampled_df.rename(columns=schema["resampled_names"])
+
+        return self._label_meteostat(station_id, resampled_df,
+                                     self._format_time_labels(resampled_df.index.to_numpy(dtype='int64'), resample))
+
+    def _label_meteostat(self, station_id: str, value_df: pd.DataFrame, labels: np.ndarray) -> pd.DataFrame:
+        """
+        Suffixes the weather parameters with the station and puts the time labels in front.
+
+        Parameters:
+            station_id (str): The id of the weather station.
+            value_df (pd.DataFrame): The weather parameters.
+            labels (np.ndarray): The time labels of the rows.
+
+        Returns:
+            data_df (pd.DataFrame): The weather of the station with a 'date' column and '<param>_<station>' columns.
+        """
+        data_df = value_df.reset_index(drop=True)
+        data_df.columns = [column + "_" + station_id for column in data_df.columns]
+        data_df.insert(0, 'date', labels)
+
+        return data_df
+
+    def _get_time_keys(self, data_df: pd.DataFrame, granularity: str) -> np.ndarray:
+        """
+        Builds the integer time keys of parsed weather rows in one vectorized pass.
+
+        Parameters:
+            data_df (pd.DataFrame): The parsed rows.
+            granularity (str): The grain of the rows.
+
+        Returns:
+            time_keys (np.ndarray): The keys YYYYMM (monthly), YYYYMMDD (daily) or YYYYMMDDHH (hourly) as int64.
+        """
+        if granularity == "monthly":
+            return data_df['year'].to_numpy(dtype='int64') * 100 + data_df['month'].to_numpy(dtype='int64')
+
+        dates = pd.to_datetime(data_df['date'], format="%Y-%m-%d")
+        day_keys = (dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day).to_numpy(dtype='int64')
+        if granularity == "daily":
+            return day_keys
+
+        return day_keys * 100 + data_df['hour'].to_numpy(dtype='int64')
+
+    def _get_time_labels(self, data_df: pd.DataFrame, time_keys: np.ndarray, granularity: str) -> np.ndarray:
+        """
+        Returns the time labels of parsed weather rows, the dates of daily and hourly files are labels already.
+
+        Parameters:
+            data_df (pd.DataFrame): The parsed rows.
+            time_keys (np.ndarray): The integer time keys of the rows.
+            granularity (str): The grain of the rows.
+
+        Returns:
+            labels (np.ndarray): The labels like 'January-2009', '2009-01-01' or '2009-01-01 05:00'.
+        """
+        if granularity == "monthly":
+            return self._format_time_labels(time_keys, granularity)
+
+        labels = data_df['date'].to_numpy(dtype=object)
+        if granularity == "hourly":
+            hour_labels = np.array([f" {hour:02d}:00" for hour in range(24)], dtype=object)
+            labels = labels + hour_labels[data_df['hour'].to_numpy()]
+
+        return labels
+
+    def _format_time_labels(self, time_keys: np.ndarray, granularity: str) -> np.ndarray:
+        """
+        Formats integer time keys as time labels.
+
+        Parameters:
+            time_keys (np.ndarray): The integer time keys.
+            granularity (str): The grain of the keys.
+
+        Returns:
+            labels (np.ndarray): The labels like 'January-2009', '2009-01-01' or '2009-01-01 05:00'.
+        """
+        if granularity == "monthly":
+            month_names = np.array(calendar.month_name, dtype=object)
+            return month_names[time_keys % 100] + "-" + (time_keys // 100).astype(str).astype(object)
+
+        key_format, label_format = {"daily": ("%Y%m%d", "%Y-%m-%d"),
+                                    "hourly": ("%Y%m%d%H", "%Y-%m-%d %H:00")}[granularity]
+
+        return pd.to_datetime(time_keys.astype(str), format=key_format).strftime(label_format).to_numpy(dtype=object)
+
+    def _get_schema(self, source: str, year: int = None, granularity: str = None) -> Dict:
+        """
+        Returns the declared parse schema of a source for a year and a grain.
+
+        Parameters:
+            source (str): The name of the source.
+            year (int, optional): The year of the file, None for sources without yearly files.
+            granularity (str, optional): The grain of the file, None for sources with a single grain.
+
+        Returns:
+            schema (dict): The schema entry of SOURCE_SCHEMAS whose year range contains the year, of the grain.
+        """
+        for schema in SOURCE_SCHEMAS[source]:
+            first_year, last_year = schema["years"]
+            if granularity is not None and schema.get("granularity", granularity) != granularity:
+                continue
+            if year is None or ((first_year is None or first_year <= year) and (last_year is None or year <= last_year)):
+                return schema
+
+        print(f"Error: No schema declared for {source} data of {year}" + (f" ({granularity})" if granularity else ""))
+        sys.exit(1)
+
+    def _get_read_options(self, schema: Dict) -> Dict:
+        """
+        Converts a declared schema into the keyword arguments of `_read_data`.
+
+        Parameters:
+            schema (dict): A schema entry of SOURCE_SCHEMAS.
+
+        Returns:
+            read_options (dict): The parse options (separator, dtypes, NA values, engine, ...) of the schema.
+        """
+        read_options = {option: schema[option] for option in
+                        ["sep", "header", "names", "usecols", "dtype", "na_values", "thousands", "decimal",
+                         "compression", "encoding", "engine", "rows_sorted"] if option in schema}
+
+        # yearly files have a different set of station columns, only the first (date) column is fixed
+        if "value_dtype" in schema:
+            read_options["dtype"] = defaultdict(lambda: schema["value_dtype"], {0: schema["date_dtype"]})
+
+        return read_options
+
+    def _get_chunk_rows(self, file_path: str, read_options: Dict) -> int:
+        """
+        Returns the number of rows of a chunk whose parsed values fit into the memory budget.
+
+        Parameters:
+            file_path (str): The path to the file.
+            read_options (dict): The parse options of the file.
+
+        Returns:
+            chunk_rows (int): The number of rows of a chunk, at least 1.
+        """
+        if read_options.get("names"):
+            columns = len(read_options["names"])
+        else:
+            # files with a header have as many columns as header fields
+            columns = len(pd.read_csv(file_path, sep=read_options.get("sep", ","), nrows=0,
+                                      encoding=read_options.get("encoding", "utf-8"),
+                                      compression=read_options.get("compression")).columns)
+
+        return max(1, self.memory_budget // (max(columns, 1) * TRANSFORM_BYTES_PER_VALUE))
+
+    def _merge_mobilithek(self, temp_df_list: List[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Merges the yearly bicycle traffic frames into one frame.
+
+        Parameters:
+            temp_df_list (list): The transformed frames of all the years.
+
+        Returns:
+            merged_df (pd.DataFrame): The concatenated frame, counting stations missing in a year are 0.
+        """
+        # align every year on the union of the stations with 0 counts, so the concatenation stays int64
+        columns = list(dict.fromkeys(col for data_df in temp_df_list for col in data_df.columns))
+        merged_df = pd.concat([data_df.reindex(columns=columns, fill_value=0) for data_df in temp_df_list],
+                              axis=0, ignore_index=True)
+        # merged_df.to_csv(source+'.csv', index=False, encoding='utf-8-sig')
+        return merged_df
+
+    def _merge_meteostat(self, temp_df_list: List[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Merges the weather frames of the stations into one frame.
+
+        Parameters:
+            temp_df_list (list): The transformed frames of all the stations.
+
+        Returns:
+            merged_df (pd.DataFrame): The station frames aligned on 'date' (see station_merger.py), the rows in time order.
+        """
+        granularity, resample = self.get_granularity("Meteostat")
+        merged_df = StationMerger(resample or granularity).merge(temp_df_list)
+        # merged_df.fillna(0, inplace=True)
+        # merged_df.to_csv(source+'.csv', index=False)
+        return merged_df
+
+    def _read_data(self, file_path: str, sep: str = ",",
+                   header: int = 0,
+                   names: List = None,
+                   usecols: List = None,
+                   dtype: Dict = None,
+                   na_values: List = None,
+                   thousands: str = None,
+                   decimal: str = ".",
+                   compression: str = None,
+                   encoding: str = 'utf-8',
+                   engine: str = PARSER_FALLBACK_ENGINE,
+                   chunksize: int = None,
+                   year_window: Tuple = None,
+                   rows_sorted: bool = False) -> pd.DataFrame:
+        """
+        Reads a file into a pandas DataFrame.
+
+        Parameters:
+            file_path (str): The path to the desired file.
+            sep (str, optional): The seperator for the desired file.
+            header (int, optional): The row number of the header, None if the file has no header.
+            names (list, optional): The column names to use for a file without header.
+            usecols (list, optional): The columns to parse, all of them by default.
+            dtype (dict, optional): The dtype of each column, inferred by pandas by default.
+            na_values (list, optional): The additional strings recognized as missing values.
+            thousands (str, optional): The thousands separator of the numbers.
+            decimal (str, optional): The decimal point of the numbers. Defaults to '.'.
+            compression (str, optional): The type of compression used on the file (e.g., 'gzip', 'zip').
+            encoding (str, optional): The encoding of the desired file. Defaults to 'utf-8'.
+            engine (str, optional): The parser engine, the fallback engine is used if it is unavailable or fails.
+            chunksize (int, optional): The rows of a chunk, the file is read into an iterator of chunks if given.
+            year_window (tuple, optional): The first and last year of the rows to parse, rows starting with another
+                year are dropped while the file is decoded (see year_window_reader.py).
+            rows_sorted (bool, optional): Whether the rows are in chronological order, used to skip whole blocks.
+
+        Returns:
+            data_df (pd.DataFrame): The contents of the file as a pandas DataFrame (an iterator of chunks with chunksize).
+        """
+        if engine != PARSER_FALLBACK_ENGINE and not self._is_engine_available(engine):
+            print(f"Error: Parser engine '{engine}' is not available, falling back to '{PARSER_FALLBACK_ENGINE}'")
+            engine = PARSER_FALLBACK_ENGINE
+        # the Arrow reader cannot read in chunks
+        if chunksize is not None and engine == "pyarrow":
+            engine = PARSER_FALLBACK_ENGINE
+
+        engines = [engine] if engine == PARSER_FALLBACK_ENGINE else [engine, PARSER_FALLBACK_ENGINE]
+
+        for engine in engines:
+            try:
+                # a fresh stream for every engine, a failed engine may have consumed the previous one
+                source = (YearWindowReader(file_path, *year_window, compression=compression,
+                                           keep_header=header is not None, rows_sorted=rows_sorted)
+                          if year_window is not None else file_path)
+                data_df = pd.read_csv(source, sep=sep,
+                                      header=header, names=names, usecols=usecols,
+                                      dtype=dtype, na_values=na_values,
+                                      thousands=thousands, decimal=decimal,
+                                      compression=None if year_window is not None else compression,
+                                      encoding=encoding, engine=engine, chunksize=chunksize)
+                print(f"Succeed: '{file_path.split(os.sep)[-1]}' is successfully loaded")
+                return data_df
+            except FileNotFoundError:
+                print(f"Error: File not found- '{file_path}'")
+                sys.exit(1)
+            except Exception as e:
+                if engine != engines[-1]:
+                    print(f"Error: Parser engine '{engine}' failed reading the file, "
+                          f"falling back to '{PARSER_FALLBACK_ENGINE}'- {str(e)}")
+                    continue
+                print(f"Error: Failed reading the file- {str(e)}")
+                sys.exit(1)
+    
+    def _is_engine_available(self, engine: str) -> bool:
+        """
+        Checks whether a pandas CSV parser engine can be used (pyarrow is an optional dependency).
+
+        Parameters:
+            engine (str): The name of the parser engine ('c', 'python' or 'pyarrow').
+
+        Returns:
+            available (bool): True if the engine can be used.
+        """
+        if engine == "pyarrow":
+            return importlib.util.find_spec("pyarrow") is not None
+
+        return engine in ("c", "python")
+
+    def _delete_file(self, file_path: str) -> None:
+        """
+        Delete a file from the directory.
+
+        Parameters:
+            file_path (str): The desired file path.
+
+        Returns:
+            None
+        """
+        try:
+            os.remove(file_path)
+            print(f"Succeed: File '{file_path.split(os.sep)[-1]}' deleted successfully.")
+        except OSError as e:
+            print(f"Error: Issue occurred while deleting the file: {str(e)}")
+            sys.exit(1)
+        except Exception as e:
+            print(f"Error: Failed deleting the file- {str(e)}")
+            sys.exit(1)
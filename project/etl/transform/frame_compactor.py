@@ -0,0 +1,196 @@
+# Python imports
+from typing import Union
+import calendar
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Self imports
+from config.config_var import *
+
+
+class FrameCompactor:
+    """
+    A class to represent the compact in-memory representation of the transformed frames.
+
+    The month labels ('January-2009') become integer month keys (200901, uint32), the counts the smallest
+    integer type holding them (unsigned unless negative) and a float column becomes float32 if rounding its
+    float32 values back to the column's number of decimals restores every float64 value. Otherwise the column
+    keeps its dtype. The original dtypes and decimals are kept in `DataFrame.attrs`, so `expand` restores
+    the frame of the current schema exactly.
+
+    Attributes:
+        max_decimals (int): The largest number of decimals a float column may have to be stored as float32.
+
+    Methods:
+        compact(data_df: pd.DataFrame) -> pd.DataFrame: Returns the compact representation of a transformed frame.
+        expand(data_df: pd.DataFrame) -> pd.DataFrame: Restores a compact frame to the current schema.
+        is_compact(data_df: pd.DataFrame) -> bool: Checks whether a frame is in the compact representation.
+        memory_usage(data_df: pd.DataFrame) -> int: Returns the memory of a frame, including its Python strings.
+        _to_month_keys(labels: pd.Series) -> Union[pd.Series, None]: Converts month labels into integer month keys.
+        _to_labels(month_keys: pd.Series) -> pd.Series: Converts integer month keys back into month labels.
+        _get_float32_decimals(values: pd.Series) -> Union[int, None]: Returns the decimals a float32 copy restores.
+    """
+
+    ATTRS_KEY = "compact_schema"
+    MONTH_NUMBERS = {month: number for number, month in enumerate(calendar.month_name) if month}
+
+    def __init__(self, max_decimals: int = COMPACT_MAX_DECIMALS) -> None:
+        self.max_decimals = max_decimals
+
+    def compact(self, data_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns the compact representation of a transformed frame (its first column is the month label).
+
+        Parameters:
+            data_df (pd.DataFrame): The transformed frame of a source.
+
+        Returns:
+            compact_df (pd.DataFrame): The frame with compact dtypes, its original schema in `attrs`.
+        """
+        if self.is_compact(data_df):
+            return data_df
+
+        date_column = data_df.columns[0]
+        compact_columns, schema = dict(), dict()
+
+        for column in data_df.columns:
+            values = data_df[column]
+            schema[column] = {"dtype": str(values.dtype), "decimals": None}
+
+            if column == date_column:
+                month_keys = self._to_month_keys(values)
+                # labels of another format are kept as categoricals
+                compact_columns[column] = month_keys if month_keys is not None else values.astype("category")
+            elif pd.api.types.is_integer_dtype(values.dtype):
+                compact_columns[column] = pd.to_numeric(
+                    values, downcast="unsigned" if len(values) == 0 or values.min() >= 0 else "integer")
+            elif pd.api.types.is_float_dtype(values.dtype):
+                decimals = self._get_float32_decimals(values)
+                if decimals is None:
+                    compact_columns[column] = values
+                else:
+                    compact_columns[column] = values.astype("float32")
+                    schema[column]["decimals"] = decimals
+            else:
+                compact_columns[column] = values
+
+        compact_df = pd.DataFrame(compact_columns, index=data_df.index)
+        compact_df.attrs[self.ATTRS_KEY] = {"date_column": date_column, "columns": schema}
+
+        return compact_df
+
+    def expand(self, data_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Restores a compact frame to the current schema (frames which are not compact are returned as they are).
+
+        Parameters:
+            data_df (pd.DataFrame): The compact frame.
+
+        Returns:
+            expanded_df (pd.DataFrame): The frame with its original labels, dtypes and values.
+        """
+        if not self.is_compact(data_df):
+            return data_df
+
+        schema = data_df.attrs[self.ATTRS_KEY]
+        expanded_columns = dict()
+
+        for column in data_df.columns:
+            values, column_schema = data_df[column], schema["columns"][column]
+
+            if column == schema["date_column"]:
+                expanded_columns[column] = (self._to_labels(values) if pd.api.types.is_integer_dtype(values.dtype)
+                                            else values.astype(column_schema["dtype"]))
+            elif column_schema["decimals"] is not None:
+                expanded_columns[column] = values.astype("float64").round(column_schema["decimals"])
+            else:
+                expanded_columns[column] = values.astype(column_schema["dtype"])
+
+        return pd.DataFrame(expanded_columns, index=data_df.index)
+
+    def is_compact(self, data_df: pd.DataFrame) -> bool:
+        """
+        Checks whether a frame is in the compact representation.
+
+        Parameters:
+            data_df (pd.DataFrame): The frame to check.
+
+        Returns:
+            compact (bool): True if the frame carries its original schema in `attrs`.
+        """
+        return self.ATTRS_KEY in data_df.attrs
+
+    def memory_usage(self, data_df: pd.DataFrame) -> int:
+        """
+        Returns the memory of a frame, including the Python strings of its object columns.
+
+        Parameters:
+            data_df (pd.DataFrame): The frame to measure.
+
+        Returns:
+            memory_bytes (int): The memory of the frame in bytes.
+        """
+        return int(data_df.memory_usage(index=True, deep=True).sum())
+
+    def _to_month_keys(self, labels: pd.Series) -> Union[pd.Series, None]:
+        """
+        Converts month labels ('January-2009') into integer month keys (200901).
+
+        Parameters:
+            labels (pd.Series): The month labels.
+
+        Returns:
+            month_keys (pd.Series/none): The uint32 month keys, None if a label has another format.
+        """
+        parts = labels.astype(str).str.rsplit("-", n=1, expand=True)
+        if parts.shape[1] != 2:
+            return None
+
+        months = parts[0].map(self.MONTH_NUMBERS)
+        years = pd.to_numeric(parts[1], errors="coerce")
+        if months.isna().any() or years.isna().any():
+            return None
+
+        month_keys = (years * 100 + months).astype("uint32")
+        # only a key which restores its label exactly is used
+        if not self._to_labels(month_keys).equals(labels.astype(object)):
+            return None
+
+        return month_keys
+
+    def _to_labels(self, month_keys: pd.Series) -> pd.Series:
+        """
+        Converts integer month keys (200901) back into month labels ('January-2009').
+
+        Parameters:
+            month_keys (pd.Series): The integer month keys.
+
+        Returns:
+            labels (pd.Series): The month labels as Python strings.
+        """
+        month_names = np.array(calendar.month_name, dtype=object)
+
+        return pd.Series(month_names[(month_keys % 100).to_numpy(dtype="int64")] + "-"
+                         + (month_keys // 100).astype(str).to_numpy(dtype=object),
+                         index=month_keys.index, name=month_keys.name, dtype=object)
+
+    def _get_float32_decimals(self, values: pd.Series) -> Union[int, None]:
+        """
+        Returns the number of decimals a float32 copy of a column restores every float64 value with.
+
+        Parameters:
+            values (pd.Series): The float column.
+
+        Returns:
+            decimals (int/none): The smallest number of decimals up to `max_decimals`, None if float32 is lossy.
+        """
+        original = values.to_numpy(dtype="float64")
+        restored = original.astype("float32").astype("float64")
+
+        for decimals in range(self.max_decimals + 1):
+            if np.array_equal(np.round(restored, decimals), original, equal_nan=True):
+                return decimals
+
+        return None
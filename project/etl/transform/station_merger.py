@@ -0,0 +1,88 @@
+# Python imports
+from typing import List
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Self imports
+from config.config_var import *
+
+
+class StationMerger:
+    """
+    A class to represent the merge engine of the weather frames of any number of stations.
+
+    The time labels of all the stations are factorized in one pass into a shared integer index, every distinct
+    label is turned into its integer time key (YYYYMM, YYYYMMDD or YYYYMMDDHH) once to order the rows in time,
+    and the values of every station are written into their rows of a single preallocated block. The cost grows
+    linearly with the number of stations and rows, unlike a chain of outer joins on the string labels, whose
+    intermediate frames grow with every station joined.
+
+    Attributes:
+        granularity (str): The grain of the time labels, 'monthly', 'daily' or 'hourly'.
+
+    Methods:
+        merge(station_frames: List, date_column: str) -> pd.DataFrame: Aligns the station frames on their time labels.
+        get_time_keys(labels: np.ndarray) -> np.ndarray: Converts time labels into integer time keys.
+    """
+
+    LABEL_FORMATS = {"monthly": "%B-%Y", "daily": "%Y-%m-%d", "hourly": "%Y-%m-%d %H:%M"}
+
+    def __init__(self, granularity: str = METEOSTAT_GRANULARITY) -> None:
+        self.granularity = granularity
+
+    def merge(self, station_frames: List, date_column: str = 'date') -> pd.DataFrame:
+        """
+        Aligns the station frames on their time labels, the rows of the union of the labels in time order.
+
+        Parameters:
+            station_frames (list): The transformed frames of the stations, the time label first and float columns.
+            date_column (str, optional): The name of the time label column.
+
+        Returns:
+            merged_df (pd.DataFrame): The time labels and the columns of all the stations, NaN where a station has no row.
+        """
+        labels = np.concatenate([data_df[date_column].to_numpy(dtype=object) for data_df in station_frames])
+        label_codes, unique_labels = pd.factorize(labels)
+
+        # the row of every distinct label in the merged frame
+        order = np.argsort(self.get_time_keys(unique_labels), kind='stable')
+        label_rows = np.empty(len(order), dtype='int64')
+        label_rows[order] = np.arange(len(order))
+
+        value_columns = [column for data_df in station_frames for column in data_df.columns if column != date_column]
+        values = np.full((len(order), len(value_columns)), np.nan)
+
+        first_code, first_column = 0, 0
+        for data_df in station_frames:
+            station_values = data_df.drop(columns=date_column).to_numpy(dtype='float64')
+            rows = label_rows[label_codes[first_code:first_code + len(data_df)]]
+            values[rows, first_column:first_column + station_values.shape[1]] = station_values
+            first_code += len(data_df)
+            first_column += station_values.shape[1]
+
+        merged_df = pd.DataFrame(values, columns=value_columns)
+        merged_df.insert(0, date_column, unique_labels[order])
+
+        return merged_df
+
+    def get_time_keys(self, labels: np.ndarray) -> np.ndarray:
+        """
+        Converts time labels into integer time keys.
+
+        Parameters:
+            labels (np.ndarray): Time labels like 'January-2009', '2009-01-01' or '2009-01-01 05:00'.
+
+        Returns:
+            time_keys (np.ndarray): The keys YYYYMM, YYYYMMDD or YYYYMMDDHH as int64.
+        """
+        dates = pd.to_datetime(pd.Series(labels, dtype=object), format=self.LABEL_FORMATS[self.granularity])
+        time_keys = (dates.dt.year * 100 + dates.dt.month).to_numpy(dtype='int64')
+
+        if self.granularity != "monthly":
+            time_keys = time_keys * 100 + dates.dt.day.to_numpy(dtype='int64')
+        if self.granularity == "hourly":
+            time_keys = time_keys * 100 + dates.dt.hour.to_numpy(dtype='int64')
+
+        return time_keys
@@ -0,0 +1,172 @@
+# Python imports
+from typing import List
+import io, gzip
+
+# Third party imports
+
+# Self imports
+from config.config_var import *
+
+
+class YearWindowReader(io.RawIOBase):
+    """
+    A class to represent a binary stream of the rows of a CSV file within a window of years.
+
+    The file is decoded block by block (gzip files incrementally) and only the lines starting with a year
+    of the window are passed on, so the CSV parser reading the stream never materializes the other rows.
+    The rows of the Meteostat bulk files start with the year ('2009,1,...' monthly, '2009-01-01,...' daily
+    and hourly), a line is kept if its first four characters are a year of the window.
+
+    If the rows are in chronological order, a block is judged by its first and last line: blocks before the
+    window are dropped and blocks inside it passed on without splitting them into lines, only the blocks at
+    the edges of the window are filtered line by line, and decoding stops after the window.
+
+    Attributes:
+        file_path (str): The path to the file.
+        first_year (int): The first year of the window.
+        last_year (int): The last year of the window.
+        keep_header (bool): Whether the first line (a header) is kept whatever it starts with.
+        rows_sorted (bool): Whether the rows are in chronological order.
+        rows_read (int): The number of rows decoded so far.
+        rows_kept (int): The number of rows passed on so far.
+
+    Methods:
+        readable() -> bool: Returns True, the stream can be read.
+        readinto(buffer: bytearray) -> int: Fills a buffer with the next bytes of the kept rows.
+        close() -> None: Closes the file.
+        _filter_block(block: bytes) -> bytes: Keeps the lines of a block within the window.
+        _filter_lines(lines: List) -> List: Keeps the lines within the window.
+    """
+
+    def __init__(self, file_path: str, first_year: int, last_year: int, compression: str = None,
+                 keep_header: bool = False, rows_sorted: bool = False, block_size: int = READ_BLOCK_SIZE) -> None:
+        super().__init__()
+        self.file_path = file_path
+        self.first_year = first_year
+        self.last_year = last_year
+        self.keep_header = keep_header
+        self.rows_sorted = rows_sorted
+        self.rows_read = 0
+        self.rows_kept = 0
+        self._file = gzip.open(file_path, 'rb') if compression == "gzip" else open(file_path, 'rb')
+        self._block_size = block_size
+        # the years compare as bytes, all of them have four digits
+        self._first_key = str(first_year).encode("ascii")
+        self._last_key = str(last_year).encode("ascii")
+        self._pending = b""
+        self._output = bytearray()
+        # set at the end of the file, or once a sorted file is past the window
+        self._finished = False
+
+    def readable(self) -> bool:
+        """
+        Returns True, the stream can be read.
+
+        Parameters:
+            None
+
+        Returns:
+            readable (bool): True.
+        """
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:
+        """
+        Fills a buffer with the next bytes of the kept rows, decoding further blocks of the file as needed.
+
+        Parameters:
+            buffer (bytearray): The buffer to fill.
+
+        Returns:
+            size (int): The number of bytes written into the buffer, 0 at the end of the file.
+        """
+        while len(self._output) < len(buffer) and self._file is not None:
+            data = self._pending + self._file.read(self._block_size)
+            end = data.rfind(b"\n") + 1
+
+            if len(data) == len(self._pending):
+                # the end of the file, the last line may have no line break
+                block, self._pending = (data + b"\n" if data else b""), b""
+                self._finished = True
+            elif end == 0:
+                # a line longer than the block, read on
+                self._pending = data
+                continue
+            else:
+                block, self._pending = data[:end], data[end:]
+
+            self._output += self._filter_block(block)
+            if self._finished:
+                self._file.close()
+                self._file = None
+
+        size = min(len(buffer), len(self._output))
+        buffer[:size] = self._output[:size]
+        del self._output[:size]
+
+        return size
+
+    def close(self) -> None:
+        """
+        Closes the file.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+    def _filter_block(self, block: bytes) -> bytes:
+        """
+        Keeps the lines of a block of complete lines whose year is within the window.
+
+        Parameters:
+            block (bytes): The complete lines of a block, ending with a line break.
+
+        Returns:
+            kept_block (bytes): The lines within the window (and the header if kept), ending with a line break.
+        """
+        if not block:
+            return b""
+
+        if self.rows_sorted and not (self.keep_header and self.rows_read == 0):
+            first_key = block[:4]
+            last_line_start = block.rfind(b"\n", 0, len(block) - 1) + 1
+            last_key = block[last_line_start:last_line_start + 4]
+
+            if last_key < self._first_key or first_key > self._last_key:
+                self.rows_read += block.count(b"\n")
+                # no later row can be within the window
+                self._finished = self._finished or first_key > self._last_key
+                return b""
+            if self._first_key <= first_key and last_key <= self._last_key:
+                rows = block.count(b"\n")
+                self.rows_read += rows
+                self.rows_kept += rows
+                return block
+            self._finished = self._finished or last_key > self._last_key
+
+        return b"".join(line + b"\n" for line in self._filter_lines(block[:-1].split(b"\n")))
+
+    def _filter_lines(self, lines: List) -> List:
+        """
+        Keeps the lines whose year is within the window.
+
+        Parameters:
+            lines (list): The complete lines of a block, without line breaks.
+
+        Returns:
+            kept_lines (list): The lines within the window (and the header if kept).
+        """
+        header = [lines.pop(0)] if self.keep_header and self.rows_read == 0 and lines else []
+        kept_lines = header + [line for line in lines if self._first_key <= line[:4] <= self._last_key]
+
+        self.rows_read += len(header) + len(lines)
+        self.rows_kept += len(kept_lines)
+
+        return kept_lines
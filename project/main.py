@@ -1,33 +1,276 @@
-"""
-Script Name: main.py
-Script Description: This script run the whole ETL pipeline
-Author: Sujit Debnath
-Author Email: sujit.debnath.bd@gmail.com
-University: Friedrich-Alexander University Erlangen-Nuremberg
-Course: Data Engineering (AMSE/SAKI)
-Semester: SS2023
-"""
-
-
-# Python imports
-
-# Third party imports
-
-# Self imports
-from pipelines.data_pipeline import DataPipeline
-from utils.service_factory import HelperService
-from etl.extract.data_extractor import DataExtractor
-from etl.transform.data_transformer import DataTransformer
-from etl.load.data_loader import DataLoader
-
-
-if __name__ == '__main__':
-    # created a object of DataPipeline using helper service, extractor, transformer and loader object
-    etl_data_pipeline = DataPipeline(
-        helper_service = HelperService(),
-        extractor = DataExtractor(),
-        transformer = DataTransformer(),
-        loader = DataLoader()
-    )
-
-    etl_data_pipeline.run_pipeline() # run the ETL pipeline
+"""
+Script Name: main.py
+Script Description: This script run the whole ETL pipeline, its stages, and reports the state of its outputs
+Usage: python main.py [run|extract|transform|load|status|cache] [options] (run from the project directory,
+       without a command the whole pipeline is run, see python main.py --help)
+Author: Sujit Debnath
+Author Email: sujit.debnath.bd@gmail.com
+University: Friedrich-Alexander University Erlangen-Nuremberg
+Course: Data Engineering (AMSE/SAKI)
+Semester: SS2023
+"""
+
+
+# Python imports
+from typing import List
+import os, sys, json, argparse
+
+# Third party imports
+
+# Self imports
+from config.config_var import *
+
+# pandas, requests and the ETL modules are imported by the commands which need them (see build_pipeline),
+# so status and cache start without them
+
+# commands of the command line, the arguments without one of them are run by run
+COMMANDS = ("run", "extract", "transform", "load", "status", "cache")
+
+
+def build_pipeline(args: argparse.Namespace):
+    """
+    Builds the ETL pipeline of a run or stage command, importing the ETL modules on first use.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        etl_data_pipeline (DataPipeline): The pipeline configured by the arguments.
+    """
+    from pipelines.data_pipeline import DataPipeline
+    from utils.service_factory import HelperService
+    from etl.extract.data_extractor import DataExtractor
+    from etl.transform.data_transformer import DataTransformer
+    from etl.load.data_loader import DataLoader
+    from etl.extract.raw_cache import RawCache
+    from utils.instrumentation import Instrumentation
+    from utils.checkpoint_store import CheckpointStore
+
+    # created a object of DataPipeline using helper service, extractor, transformer and loader object
+    return DataPipeline(
+        helper_service = HelperService(),
+        extractor = DataExtractor(use_raw_cache=args.raw_cache, mirror_url=args.mirror_url,
+                                  raw_cache=RawCache(cache_dir=args.raw_cache_dir) if args.raw_cache else None,
+                                  raw_dir=args.raw_dir),
+        transformer = DataTransformer(raw_dir=args.raw_dir),
+        loader = DataLoader(analytics=args.analytics, db_path=args.db_path),
+        instrumentation = Instrumentation(report_dir=args.report_dir),
+        streaming = getattr(args, "streaming", PIPELINE_STREAMING),
+        task_graph = getattr(args, "task_graph", PIPELINE_TASK_GRAPH),
+        chunked = getattr(args, "chunked", PIPELINE_CHUNKED),
+        checkpoint_store = CheckpointStore(root_dir=args.checkpoint_dir),
+        source_info_path = args.source_info
+    )
+
+
+def run_command(args: argparse.Namespace) -> None:
+    """
+    Runs the whole ETL pipeline (run), or its stages up to the stage of the command (extract, transform, load).
+
+    Parameters:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        None
+    """
+    etl_data_pipeline = build_pipeline(args)
+
+    if args.command in ("extract", "transform") and not etl_data_pipeline.checkpoint_store.enabled:
+        print(f"Error: The {args.command} command keeps its output in the stage checkpoints, enable them "
+              f"(CHECKPOINT_ENABLED) and install pyarrow")
+        sys.exit(1)
+
+    etl_data_pipeline.run_pipeline(last_stage="load" if args.command == "run" else args.command) # run the ETL pipeline
+
+
+def status_command(args: argparse.Namespace) -> None:
+    """
+    Prints the state of the pipeline outputs: the stage checkpoints, the database tables, the raw cache
+    and the latest run report. Reads the files only, pandas and the ETL modules are not imported.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        None
+    """
+    import sqlite3
+    from utils.checkpoint_store import CheckpointStore
+
+    print("{} {} {}".format(20*"-", "Checkpoints", 20*"-"))
+    checkpoints = CheckpointStore(root_dir=args.checkpoint_dir, enabled=False).inspect()
+    for checkpoint in checkpoints:
+        state = "invalid" if checkpoint["invalid_files"] else "completed" if checkpoint["completed"] else "resumable"
+        size = f", {checkpoint['rows']} rows" if "rows" in checkpoint else ""
+        print(f"{checkpoint['stage']:<10} {checkpoint['source']:<12} {checkpoint['created_at']}  {state}{size}")
+    if not checkpoints:
+        print(f"No checkpoints in {args.checkpoint_dir}")
+
+    print("{} {} {}".format(20*"-", "Database", 20*"-"))
+    if os.path.exists(args.db_path):
+        conn = sqlite3.connect(f"file:{args.db_path}?mode=ro", uri=True)
+        table_names = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') ORDER BY name")]
+        for table_name in table_names:
+            rows = conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+            print(f"{table_name:<40} {rows:>8} rows")
+        conn.close()
+        print(f"{args.db_path}: {os.path.getsize(args.db_path)} B")
+    else:
+        print(f"No database at {args.db_path}")
+
+    print("{} {} {}".format(20*"-", "Raw cache", 20*"-"))
+    print_cache_info(args.raw_cache_dir)
+
+    print("{} {} {}".format(20*"-", "Last run", 20*"-"))
+    report_names = list()
+    if os.path.isdir(args.report_dir):
+        report_names = sorted(file_name for file_name in os.listdir(args.report_dir)
+                              if file_name.startswith("run_") and file_name.endswith(".json"))
+    if report_names:
+        with open(os.path.join(args.report_dir, report_names[-1]), 'r', encoding='utf-8') as file:
+            report = json.load(file)
+        pipeline_span = report["spans"]
+        stages = ", ".join(f"{span['name']} {span['wall_seconds']:.2f}s" for span in pipeline_span["children"])
+        print(f"{report_names[-1]}: {pipeline_span['wall_seconds']:.2f}s, {pipeline_span['rows']} rows ({stages})")
+    else:
+        print(f"No run reports in {args.report_dir}")
+
+
+def cache_command(args: argparse.Namespace) -> None:
+    """
+    Prints the size of the raw cache (info) or deletes the cached files (clear).
+
+    Parameters:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        None
+    """
+    if args.action == "clear":
+        from etl.extract.raw_cache import RawCache
+        deleted = RawCache(cache_dir=args.raw_cache_dir).clear()
+        print(f"Succeed: {deleted} cached object(s) deleted from {args.raw_cache_dir}")
+    else:
+        print_cache_info(args.raw_cache_dir)
+
+
+def print_cache_info(cache_dir: str = RAW_CACHE_PATH) -> None:
+    """
+    Prints the number of cached URLs and objects and their size against RAW_CACHE_MAX_BYTES.
+
+    Parameters:
+        cache_dir (str, optional): The directory of the raw cache.
+
+    Returns:
+        None
+    """
+    index_path = os.path.join(cache_dir, "index.json")
+
+    if not os.path.exists(index_path):
+        print(f"No raw cache at {cache_dir}")
+        return
+
+    try:
+        with open(index_path, 'r') as file:
+            index = json.load(file)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"Error: Raw cache index is unreadable. {str(e)}")
+        return
+
+    objects = {entry["sha256"]: entry["size"] for entry in index.values()}
+    print(f"{len(index)} URLs, {len(objects)} objects, {sum(objects.values())} of {RAW_CACHE_MAX_BYTES} B "
+          f"in {cache_dir}")
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """
+    Returns the parser of the command line, a subcommand for every command.
+
+    Parameters:
+        None
+
+    Returns:
+        parser (argparse.ArgumentParser): The command line parser.
+    """
+    parser = argparse.ArgumentParser(description="Run the ETL pipeline, its stages, or report the state of its outputs.")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    path_options = argparse.ArgumentParser(add_help=False)
+    path_options.add_argument("--db-path", default=DB_PATH, help="path of the SQLite database")
+    path_options.add_argument("--raw-dir", default=DOWNLOADED_RAW_FILE_PATH, help="directory of the downloaded files")
+    path_options.add_argument("--raw-cache-dir", default=RAW_CACHE_PATH, help="directory of the raw cache")
+    path_options.add_argument("--checkpoint-dir", default=CHECKPOINT_PATH, help="directory of the stage checkpoints")
+    path_options.add_argument("--report-dir", default=INSTRUMENTATION_REPORT_PATH, help="directory of the run reports")
+
+    pipeline_options = argparse.ArgumentParser(add_help=False, parents=[path_options])
+    pipeline_options.add_argument("--source-info", default=SOURCE_INFO_PATH, help="path of the source information")
+    pipeline_options.add_argument("--mirror-url", default=EXTRACT_MIRROR_URL, help="base URL all the downloads go to")
+    pipeline_options.add_argument("--raw-cache", action=argparse.BooleanOptionalAction, default=RAW_CACHE_ENABLED,
+                                  help="keep the downloads in the raw cache")
+    pipeline_options.add_argument("--analytics", action=argparse.BooleanOptionalAction, default=LOAD_ANALYTICS,
+                                  help="build the bicycle x weather analysis tables after the load")
+
+    run_parser = commands.add_parser("run", parents=[pipeline_options], help="run the whole ETL pipeline (default)")
+    modes = run_parser.add_mutually_exclusive_group()
+    modes.add_argument("--streaming", action="store_true", default=PIPELINE_STREAMING, help="overlap the stages")
+    modes.add_argument("--task-graph", action="store_true", default=PIPELINE_TASK_GRAPH,
+                       help="run every source as its own branch")
+    modes.add_argument("--chunked", action="store_true", default=PIPELINE_CHUNKED,
+                       help="transform and load the files chunk by chunk")
+
+    commands.add_parser("extract", parents=[pipeline_options], help="download the files into the checkpoints")
+    commands.add_parser("transform", parents=[pipeline_options],
+                        help="extract (resumed from the checkpoints) and transform")
+    commands.add_parser("load", parents=[pipeline_options],
+                        help="extract and transform (resumed from the checkpoints) and load")
+
+    commands.add_parser("status", parents=[path_options], help="show the checkpoints, database tables, raw cache and last run")
+
+    cache_parser = commands.add_parser("cache", parents=[path_options], help="show the size of the raw cache or clear it")
+    cache_parser.add_argument("action", nargs="?", choices=["info", "clear"], default="info", help="cache action")
+
+    return parser
+
+
+def parse_arguments(argv: List) -> argparse.Namespace:
+    """
+    Parses the command line arguments, inserting the run command when they do not start with a command.
+
+    Parameters:
+        argv (list): The command line arguments.
+
+    Returns:
+        args (argparse.Namespace): The parsed command line arguments.
+    """
+    argv = list(argv)
+
+    if not argv or argv[0] not in COMMANDS + ("-h", "--help"):
+        argv = ["run"] + argv
+
+    return get_parser().parse_args(argv)
+
+
+def main(argv: List = None) -> None:
+    """
+    Parses the command line and runs its command, the whole pipeline (run) when the arguments do not start
+    with a command, so that python main.py --chunked is python main.py run --chunked.
+
+    Parameters:
+        argv (list, optional): The command line arguments, sys.argv[1:] by default.
+
+    Returns:
+        None
+    """
+    args = parse_arguments(sys.argv[1:] if argv is None else argv)
+
+    if args.command == "status":
+        status_command(args)
+    elif args.command == "cache":
+        cache_command(args)
+    else:
+        run_command(args)
+
+
+if __name__ == '__main__':
+    main()
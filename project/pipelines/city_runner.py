@@ -0,0 +1,230 @@
+# Python imports
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+import os, re, sys, json, time, argparse
+
+# Third party imports
+
+# Self imports
+from config.config_var import *
+from pipelines.data_pipeline import DataPipeline
+from utils.service_factory import HelperService
+from utils.instrumentation import Instrumentation
+from utils.checkpoint_store import CheckpointStore
+from etl.extract.data_extractor import DataExtractor
+from etl.extract.http_session import HttpSession
+from etl.extract.raw_cache import RawCache
+from etl.transform.data_transformer import DataTransformer
+from etl.load.data_loader import DataLoader
+
+
+class CityRunner:
+    """
+    A class to run the ETL pipeline for several cities, every city in a worker process.
+
+    Every city has its own source information (a file like config/source_info.json) and its own outputs
+    under `<output_dir>/<city>/`: the downloaded files, the SQLite database, the columnar sink, the checkpoints
+    and the run reports. The raw cache is shared by all the cities (files several cities use, like the
+    bulk files of a weather station, are downloaded once), and every worker process keeps a single HTTP
+    session whose connection pool is reused by all the cities it runs. The files of a city are transformed
+    in its worker process, the cities are the unit of parallelism.
+
+    Attributes:
+        city_configs (list): The cities, dicts of the 'city' name and the 'source_info_path' of the city.
+        output_dir (str): The directory of the city output directories and the run summary.
+        max_workers (int): The number of cities run concurrently (1 runs them one by one in this process).
+        use_raw_cache (bool): Whether the shared raw cache is used.
+        raw_cache_dir (str): The directory of the shared raw cache.
+        mirror_url (str): The base URL of a mirror all the downloads go to, None for the sources.
+        pipeline_options (dict): Further keyword arguments of DataPipeline, e.g. {'task_graph': True}.
+        city_results (list): The status, wall time, stage timings and outputs of every city, in the order of the configs.
+
+    Methods:
+        run() -> List: Runs the pipelines of all the cities and reports their stage timings.
+        get_city_dir(city: str) -> str: Returns the output directory of a city.
+        _run_city(city_config: Dict) -> Dict: Runs the pipeline of a single city (in a worker process).
+        _init_worker(use_raw_cache: bool, raw_cache_dir: str) -> None: Creates the HTTP session and raw cache
+            shared by the cities of a worker process.
+        _write_summary() -> str: Writes the JSON summary of the run.
+    """
+
+    # the HTTP session and the raw cache of the current worker process (see _init_worker)
+    _worker_state = dict()
+
+    def __init__(self, city_configs: List, output_dir: str = CITY_OUTPUT_PATH, max_workers: int = CITY_MAX_WORKERS,
+                 use_raw_cache: bool = RAW_CACHE_ENABLED, raw_cache_dir: str = RAW_CACHE_PATH,
+                 mirror_url: str = EXTRACT_MIRROR_URL, pipeline_options: Dict = None) -> None:
+        self.city_configs = city_configs
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.use_raw_cache = use_raw_cache
+        self.raw_cache_dir = raw_cache_dir
+        self.mirror_url = mirror_url
+        self.pipeline_options = pipeline_options or dict()
+        self.city_results = list()
+
+    def run(self) -> List:
+        """
+        Runs the pipelines of all the cities, at most `max_workers` of them concurrently, and reports their
+        stage timings. A failing city does not stop the others.
+
+        Parameters:
+            None
+
+        Returns:
+            city_results (list): The status, wall time, stage timings and outputs of every city.
+        """
+        city_names = [city_config["city"] for city_config in self.city_configs]
+        if len(set(map(self.get_city_dir, city_names))) != len(city_names):
+            print(f"Error: The cities must have distinct names, got {', '.join(city_names)}")
+            sys.exit(1)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        worker_args = (self.use_raw_cache, self.raw_cache_dir)
+
+        if self.max_workers > 1 and len(self.city_configs) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(self.city_configs)),
+                                     initializer=CityRunner._init_worker, initargs=worker_args) as executor:
+                self.city_results = list(executor.map(self._run_city, self.city_configs))
+        else:
+            CityRunner._init_worker(*worker_args)
+            self.city_results = [self._run_city(city_config) for city_config in self.city_configs]
+
+        print("\n{} {} {}".format(20*"-", "Cities: stage timings", 20*"-"))
+        for result in self.city_results:
+            stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["stages"].items())
+            print(f"{result['city']:<20} {result['status']:<9} wall {result['wall_seconds']:8.2f}s ({stages})")
+
+        summary_path = self._write_summary()
+        if summary_path is not None:
+            print(f"Succeed: Multi-city run summary written to {summary_path}")
+
+        failed_cities = [result["city"] for result in self.city_results if result["status"] != "succeeded"]
+        if failed_cities:
+            print(f"Error: {len(failed_cities)} city pipeline(s) failed: {', '.join(failed_cities)}")
+            sys.exit(1)
+
+        return self.city_results
+
+    def get_city_dir(self, city: str) -> str:
+        """
+        Returns the output directory of a city.
+
+        Parameters:
+            city (str): The name of the city.
+
+        Returns:
+            city_dir (str): The directory `<output_dir>/<city name in lower case, without blanks and punctuation>`.
+        """
+        return os.path.join(self.output_dir, re.sub(r"\W+", "_", city.strip().lower()).strip("_"))
+
+    def _run_city(self, city_config: Dict) -> Dict:
+        """
+        Runs the pipeline of a single city with its own output paths (runs in a worker process).
+
+        Parameters:
+            city_config (dict): The 'city' name and the 'source_info_path' of the city.
+
+        Returns:
+            city_result (dict): The city, its status, wall time, stage timings in seconds, rows and output paths.
+        """
+        city_dir = self.get_city_dir(city_config["city"])
+        raw_dir = os.path.join(city_dir, "raw")
+        db_path = os.path.join(city_dir, os.path.basename(city_dir) + ".sqlite")
+        os.makedirs(raw_dir, exist_ok=True)
+
+        sinks = list()
+        if "columnar" in LOAD_SINKS:
+            from etl.load.columnar_sink import ColumnarSink
+            sinks.append(ColumnarSink(root_dir=os.path.join(city_dir, "columnar")))
+
+        etl_data_pipeline = DataPipeline(
+            helper_service = HelperService(),
+            extractor = DataExtractor(use_raw_cache=self.use_raw_cache, mirror_url=self.mirror_url, raw_dir=raw_dir,
+                                      http_session=self._worker_state["http_session"],
+                                      raw_cache=self._worker_state["raw_cache"]),
+            # the cities already keep the processes busy
+            transformer = DataTransformer(parallel=False, raw_dir=raw_dir),
+            loader = DataLoader(sinks=sinks, db_path=db_path),
+            instrumentation = Instrumentation(enabled=True, report_dir=os.path.join(city_dir, "run_reports")),
+            checkpoint_store = CheckpointStore(root_dir=os.path.join(city_dir, "checkpoints")),
+            source_info_path = city_config["source_info_path"],
+            **self.pipeline_options
+        )
+
+        print(f"\nSucceed: Pipeline of {city_config['city']} started in process {os.getpid()}")
+        started_at = time.perf_counter()
+        status = "succeeded"
+        try:
+            etl_data_pipeline.run_pipeline()
+        except SystemExit as e:
+            # the pipeline reports its errors itself and stops with sys.exit
+            status = "succeeded" if e.code in (None, 0) else "failed"
+        except Exception as e:
+            print(f"Error: Pipeline of {city_config['city']} failed - {str(e)}")
+            status = "failed"
+
+        pipeline_span = etl_data_pipeline.instrumentation.root
+        stage_spans = pipeline_span.children if pipeline_span is not None else list()
+
+        return {"city": city_config["city"], "status": status,
+                "wall_seconds": round(time.perf_counter() - started_at, 6),
+                "stages": {span.name: round(span.wall_seconds, 6) for span in stage_spans},
+                "rows": pipeline_span.rows if pipeline_span is not None else 0,
+                "db_path": db_path, "city_dir": city_dir, "pid": os.getpid()}
+
+    @staticmethod
+    def _init_worker(use_raw_cache: bool, raw_cache_dir: str) -> None:
+        """
+        Creates the HTTP session and the raw cache shared by the cities run in the current (worker) process.
+
+        Parameters:
+            use_raw_cache (bool): Whether the shared raw cache is used.
+            raw_cache_dir (str): The directory of the shared raw cache.
+
+        Returns:
+            None
+        """
+        CityRunner._worker_state["http_session"] = HttpSession(pool_size=max(EXTRACT_MAX_WORKERS, 1))
+        CityRunner._worker_state["raw_cache"] = RawCache(cache_dir=raw_cache_dir) if use_raw_cache else None
+
+    def _write_summary(self) -> str:
+        """
+        Writes the JSON summary of the run next to the city output directories.
+
+        Parameters:
+            None
+
+        Returns:
+            summary_path (str): The path of the written summary, None if it could not be written.
+        """
+        summary_path = os.path.join(self.output_dir, f"cities_{datetime.now().strftime('%Y%m%dT%H%M%S')}.json")
+
+        try:
+            with open(summary_path, 'w', encoding='utf-8') as file:
+                json.dump({"max_workers": self.max_workers, "cities": self.city_results}, file, indent=2,
+                          ensure_ascii=False)
+        except OSError as e:
+            print(f"Error: Issue occurred while writing the multi-city run summary: {str(e)}")
+            return None
+
+        return summary_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the ETL pipeline for several cities in worker processes.")
+    parser.add_argument("cities", nargs="+", metavar="CITY=SOURCE_INFO",
+                        help="a city and the path of its source information, e.g. Köln=config/source_info.json")
+    parser.add_argument("--output-dir", default=CITY_OUTPUT_PATH, help="directory of the city outputs")
+    parser.add_argument("--max-workers", type=int, default=CITY_MAX_WORKERS, help="number of cities run concurrently")
+    args = parser.parse_args()
+
+    city_configs = list()
+    for city_argument in args.cities:
+        city, _, source_info_path = city_argument.partition("=")
+        if not source_info_path:
+            parser.error(f"expected CITY=SOURCE_INFO, got '{city_argument}'")
+        city_configs.append({"city": city, "source_info_path": os.path.abspath(source_info_path)})
+
+    CityRunner(city_configs, output_dir=args.output_dir, max_workers=args.max_workers).run()
@@ -1,123 +1,650 @@
-"""
-Script Name: data_pipeline.py
-Script Description: This script implements ETL pipeline for collecting and processing data from multiple sources
-Author: Sujit Debnath
-Author Email: sujit.debnath.bd@gmail.com
-University: Friedrich-Alexander University Erlangen-Nuremberg
-Course: Data Engineering (AMSE/SAKI)
-Semester: SS2023
-"""
-
-
-# Python imports
-from typing import Dict
-
-# Third party imports
-
-# Self imports
-from config.config_var import *
-from utils.service_factory import HelperService
-from etl.extract.data_extractor import DataExtractor
-from etl.transform.data_transformer import DataTransformer
-from etl.load.data_loader import DataLoader
-
-
-class DataPipeline:
-    """
-    A class to represent an ETL pipeline.
-
-    Attributes:
-        helper_service (HelperService): An object of HelperService class for external functionalities
-        extractor (DataExtractor): An object of DataExtractor class for extracting data
-        transformer (DataTransformer): An object of DataTransformer class for transforming data
-        loader (DataLoader): An object of DataLoader class for loading data
-
-    Methods:
-        on_extract(source_info: Dict) ->  Dict: Extracts data from multiple sources.
-        on_transform(extracted_data: Dict) -> Dict: Transforms the input data by applying necessary transformations.
-        on_load(transformed_data: Dict) -> None: Loads transformed data into database.
-        run_pipeline() -> None: Run the whole ETL pipeline.
-    """
-
-    def __init__(
-            self,
-            helper_service: HelperService,
-            extractor: DataExtractor,
-            transformer: DataTransformer,
-            loader: DataLoader
-            ) -> None:
-        self.helper_service = helper_service
-        self.extractor = extractor
-        self.transformer = transformer
-        self.loader = loader
-    
-    def on_extract(self, source_info: Dict) ->  Dict:
-        """
-        Extracts data from multiple sources.
-
-        Parameters:
-            source_info (dict): A dictionary containing the necessary source URL and other information.
-
-        Returns:
-            Dictionary: A dictionary containing information of extracted data.
-        """
-        self.extractor.source_info = source_info
-        self.extractor.extract()
-
-        return self.extractor.extracted_data
-
-    def on_transform(self, extracted_data: Dict) -> Dict:
-        """
-        Transforms the input data by applying necessary transformations.
-
-        Parameters:
-            extracted_data (pd.DataFrame): A panda dataframe of all the extracted data.
-
-        Returns:
-            transformed_data (dict): A dict that contains transformed data.
-        """
-        self.transformer.extracted_data = extracted_data
-        self.transformer.transform()
-
-        return self.transformer.transformed_data
-
-    def on_load(self, transformed_data: Dict) -> None:
-        """
-        Loads transformed data into database.
-
-        Parameters:
-            transformed_data (dict): A dict that contains transformed data.
-        
-        Returns:
-            None
-        """
-        self.loader.transformed_data = transformed_data
-        self.loader.load()
-
-    def run_pipeline(self) -> None:
-        """
-        Run the whole ETL pipeline.
-
-        Parameters:
-            None
-
-        Returns:
-            None
-        """
-        # load the source information from the json file
-        source_info = self.helper_service.load_json(SOURCE_INFO_PATH)
-        
-        # extract data from multiple sources
-        print("\n{} {} {}".format(20*"-", "Extract: data extraction from the source initiated", 20*"-"))
-        extracted_data = self.on_extract(source_info)
-        print("{} {} {}\n".format(20*"-", "Extract: data extraction from the source ended", 20*"-"))
-        
-        # read, transform and merge data from both sources
-        print("\n{} {} {}".format(20*"-", "Transform: data transformation from extracted data initiated", 20*"-"))
-        transformed_data = self.on_transform(extracted_data)
-        print("{} {} {}\n".format(20*"-", "Transform: data transformation from extracted data ended", 20*"-"))
-
-        # load transformed data into database
-        print("\n{} {} {}".format(20*"-", "Load: transformed data loading into a database initiated", 20*"-"))
-        self.on_load(transformed_data)
-        print("{} {} {}\n".format(20*"-", "Load: transformed data loading into a database ended", 20*"-"))
+"""
+Script Name: data_pipeline.py
+Script Description: This script implements ETL pipeline for collecting and processing data from multiple sources
+Author: Sujit Debnath
+Author Email: sujit.debnath.bd@gmail.com
+University: Friedrich-Alexander University Erlangen-Nuremberg
+Course: Data Engineering (AMSE/SAKI)
+Semester: SS2023
+"""
+
+
+# Python imports
+from typing import Dict, List
+import os, sys, time, queue, threading
+
+# Third party imports
+
+# Self imports
+from config.config_var import *
+from utils.service_factory import HelperService
+from etl.extract.data_extractor import DataExtractor
+from etl.transform.data_transformer import DataTransformer
+from etl.load.data_loader import DataLoader
+from utils.instrumentation import Instrumentation, Span
+from pipelines.task_scheduler import TaskScheduler
+from utils.checkpoint_store import CheckpointStore
+from config.source_schema import SOURCE_SCHEMAS
+
+
+class DataPipeline:
+    """
+    A class to represent an ETL pipeline.
+
+    The outputs of the extract and transform stages are checkpointed per source (in the phased mode and in
+    the task graph), so a rerun after a failure resumes from them instead of downloading and transforming
+    everything again.
+
+    Attributes:
+        helper_service (HelperService): An object of HelperService class for external functionalities
+        extractor (DataExtractor): An object of DataExtractor class for extracting data
+        transformer (DataTransformer): An object of DataTransformer class for transforming data
+        loader (DataLoader): An object of DataLoader class for loading data
+        instrumentation (Instrumentation): An object of Instrumentation class measuring the stages of a run
+        streaming (bool): Whether the stages overlap (files are transformed and loaded while others are still downloading)
+        task_graph (bool): Whether every source runs as its own extract -> transform -> load branch of a task graph
+        chunked (bool): Whether the extracted files are transformed and loaded chunk by chunk within a memory budget
+        checkpoint_store (CheckpointStore): An object of CheckpointStore class keeping the stage outputs
+        source_info_path (str): The path of the source information of the run
+
+    Methods:
+        on_extract(source_info: Dict, source_names: List) ->  Dict: Extracts data from multiple sources.
+        on_detect_changes(extracted_data: Dict, source_names: List) -> Dict: Keeps the partitions changed since the last
+            load (incremental mode).
+        on_transform(extracted_data: Dict, source_names: List) -> Dict: Transforms the input data by applying necessary
+            transformations.
+        on_load(transformed_data: Dict, source_names: List) -> None: Loads transformed data into database.
+        run_pipeline(last_stage: str) -> None: Run the whole ETL pipeline, or its stages up to the last stage.
+        _run_phased(pipeline_span: Span, last_stage: str) -> None: Runs the stages one after the other.
+        _run_streaming(pipeline_span: Span) -> None: Runs the stages overlapped, connected by a bounded queue.
+        _stream_extract(source_info: Dict, file_queue: queue.Queue, stage_seconds: Dict, errors: List) -> None:
+            Downloads the files into the queue of the transformer (runs in its own thread).
+        _run_task_graph(pipeline_span: Span) -> List: Runs every source as its own branch of a task graph.
+        _run_chunked(pipeline_span: Span) -> None: Runs the extraction, then transforms and loads the files chunk by chunk.
+        _record_stages(pipeline_span: Span, stage_seconds: Dict, database_bytes: int) -> None:
+            Attaches the overlapping stages to the pipeline span.
+        _load_source_info() -> Dict: Loads the source information and checks that the loader can store its weather grain.
+        _get_extract_key(source_info: Dict, source: str) -> str: Returns the checkpoint key of the extraction of a source.
+        _get_transform_key(source: str, files_list: List) -> str: Returns the checkpoint key of the transformation of a source.
+        _record_extract(stage_span: Span) -> None: Attaches the measured downloads to the extract span.
+        _record_transform(stage_span: Span) -> None: Attaches the measured file transformations to the transform span.
+        _record_load(stage_span: Span, database_bytes: int) -> None: Attaches the loaded sources to the load span.
+        _database_size() -> int: Returns the size of the database files.
+    """
+
+    def __init__(
+            self,
+            helper_service: HelperService,
+            extractor: DataExtractor,
+            transformer: DataTransformer,
+            loader: DataLoader,
+            instrumentation: Instrumentation = None,
+            streaming: bool = PIPELINE_STREAMING,
+            task_graph: bool = PIPELINE_TASK_GRAPH,
+            chunked: bool = PIPELINE_CHUNKED,
+            checkpoint_store: CheckpointStore = None,
+            source_info_path: str = SOURCE_INFO_PATH
+            ) -> None:
+        self.helper_service = helper_service
+        self.extractor = extractor
+        self.transformer = transformer
+        self.loader = loader
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+        self.streaming = streaming
+        self.task_graph = task_graph
+        self.chunked = chunked
+        self.checkpoint_store = checkpoint_store if checkpoint_store is not None else CheckpointStore()
+        self.source_info_path = source_info_path
+    
+    def on_extract(self, source_info: Dict, source_names: List = None) ->  Dict:
+        """
+        Extracts data from multiple sources, a source is resumed from the checkpoint of an unfinished run.
+
+        Parameters:
+            source_info (dict): A dictionary containing the necessary source URL and other information.
+            source_names (list, optional): The sources to extract, all of them by default.
+
+        Returns:
+            Dictionary: A dictionary containing information of extracted data.
+        """
+        self.extractor.source_info = source_info
+        self.transformer.source_info = source_info
+        sources_to_extract = list()
+
+        for source in source_names or [source["source_name"] for source in source_info["data_sources"]]:
+            key = self._get_extract_key(source_info, source)
+            checkpoint = self.checkpoint_store.load("extract", source, key, reuse_completed=False)
+
+            if checkpoint is None:
+                sources_to_extract.append(source)
+                # the sources keep the order of the source information
+                self.extractor.extracted_data.setdefault(source, list())
+            else:
+                self.extractor.extracted_data[source] = [tuple(file_info) for file_info in checkpoint["extracted_files"]]
+                print(f"Succeed: {source} extraction resumed from checkpoint {key[:12]} "
+                      f"({len(checkpoint['extracted_files'])} files)")
+
+        if sources_to_extract:
+            self.extractor.extract(sources_to_extract)
+
+        for source in sources_to_extract:
+            files_list = self.extractor.extracted_data[source]
+            file_paths = [os.path.join(self.extractor.raw_dir, file_info[-1]) for file_info in files_list]
+            self.checkpoint_store.save("extract", source, self._get_extract_key(source_info, source), {
+                "extracted_files": files_list,
+                "files": [{"path": path, "size": os.path.getsize(path), "mtime_ns": os.stat(path).st_mtime_ns}
+                          for path in file_paths]
+            })
+
+        if source_names is None:
+            return self.extractor.extracted_data
+
+        return {source: self.extractor.extracted_data.get(source, list()) for source in source_names}
+
+    def on_detect_changes(self, extracted_data: Dict, source_names: List = None) -> Dict:
+        """
+        Hashes the extracted partitions and, in incremental mode, keeps only those changed since the last load.
+
+        Parameters:
+            extracted_data (dict): A dictionary containing information of extracted data.
+            source_names (list, optional): The sources to hash, all of them by default.
+
+        Returns:
+            extracted_data (dict): The extracted data to transform, restricted to the changed partitions if incremental.
+        """
+        if source_names is None:
+            self.loader.partition_hashes = self.extractor.get_partition_hashes()
+        else:
+            self.loader.partition_hashes.update(self.extractor.get_partition_hashes(source_names))
+
+        if self.loader.incremental:
+            return self.loader.get_changed_partitions(extracted_data)
+
+        return extracted_data
+
+    def on_transform(self, extracted_data: Dict, source_names: List = None) -> Dict:
+        """
+        Transforms the input data by applying necessary transformations, a source is resumed from the
+        checkpoint of the same raw files.
+
+        Parameters:
+            extracted_data (pd.DataFrame): A panda dataframe of all the extracted data.
+            source_names (list, optional): The sources to transform, the others of a previous call are kept.
+
+        Returns:
+            transformed_data (dict): A dict that contains transformed data.
+        """
+        all_sources = source_names is None
+        source_names = source_names or list(extracted_data)
+        resumed_data = dict()
+
+        for source in source_names:
+            if extracted_data.get(source):
+                key = self._get_transform_key(source, extracted_data[source])
+                checkpoint = self.checkpoint_store.load("transform", source, key)
+                if checkpoint is not None:
+                    resumed_data[source] = checkpoint["data"]
+                    print(f"Succeed: {source} transformation resumed from checkpoint {key[:12]} "
+                          f"({checkpoint['rows']} rows)")
+
+        if all_sources:
+            self.transformer.extracted_data = extracted_data
+        else:
+            self.transformer.extracted_data.update(extracted_data)
+        self.transformer.transform(None if all_sources and not resumed_data
+                                   else [source for source in source_names if source not in resumed_data])
+        self.transformer.transformed_data.update(resumed_data)
+
+        for source in source_names:
+            if extracted_data.get(source) and source not in resumed_data:
+                self.checkpoint_store.save("transform", source, self._get_transform_key(source, extracted_data[source]),
+                                           {"extracted_files": extracted_data[source]},
+                                           self.transformer.transformed_data[source])
+
+        return self.transformer.transformed_data
+
+    def on_load(self, transformed_data: Dict, source_names: List = None) -> None:
+        """
+        Loads transformed data into database.
+
+        Parameters:
+            transformed_data (dict): A dict that contains transformed data.
+            source_names (list, optional): The sources to load, all of them by default.
+        
+        Returns:
+            None
+        """
+        self.loader.transformed_data = transformed_data
+        self.loader.load(source_names)
+
+    def run_pipeline(self, last_stage: str = "load") -> None:
+        """
+        Run the whole ETL pipeline, or its stages up to the last stage (the stage commands of main.py).
+
+        The stages before the last stage are resumed from their checkpoints, the extraction is only
+        marked completed (the next run downloads again) once a run loaded the data.
+
+        Parameters:
+            last_stage (str, optional): The last stage to run, 'extract', 'transform' or 'load'.
+
+        Returns:
+            None
+        """
+        if self.streaming + self.task_graph + self.chunked > 1:
+            print("Error: The streaming mode, the task graph and the chunked mode cannot be combined")
+            sys.exit(1)
+
+        if last_stage not in ("extract", "transform", "load"):
+            print(f"Error: Unknown stage '{last_stage}', expected extract, transform or load")
+            sys.exit(1)
+
+        if last_stage != "load" and (self.streaming or self.task_graph or self.chunked):
+            print("Error: Only the phased pipeline can stop after the extract or transform stage")
+            sys.exit(1)
+
+        failed_tasks = list()
+        with self.instrumentation.span("pipeline", kind="pipeline", streaming=self.streaming,
+                                       task_graph=self.task_graph, chunked=self.chunked) as pipeline_span:
+            if self.streaming:
+                self._run_streaming(pipeline_span)
+            elif self.task_graph:
+                failed_tasks = self._run_task_graph(pipeline_span)
+            elif self.chunked:
+                self._run_chunked(pipeline_span)
+            else:
+                self._run_phased(pipeline_span, last_stage)
+
+            for stage_span in pipeline_span.children:
+                pipeline_span.add(**{counter: getattr(stage_span, counter) for counter in stage_span.COUNTERS})
+
+        # write the run report
+        report_path = self.instrumentation.write_report()
+        if report_path is not None:
+            print(self.instrumentation.summary())
+            print(f"Succeed: Run report written to {report_path}")
+
+        # the next run downloads again, an unfinished run is resumed from the extracted files
+        if not failed_tasks and last_stage == "load":
+            self.checkpoint_store.complete("extract")
+
+        if failed_tasks:
+            print(f"Error: {len(failed_tasks)} task(s) failed or were skipped: "
+                  f"{', '.join(task.name for task in failed_tasks)}")
+            sys.exit(1)
+
+    def _run_phased(self, pipeline_span: Span, last_stage: str = "load") -> None:
+        """
+        Runs the stages one after the other, every stage starts once the previous one is done.
+
+        Parameters:
+            pipeline_span (Span): The span of the pipeline run.
+            last_stage (str, optional): The stage after which the run stops.
+
+        Returns:
+            None
+        """
+        # load the source information from the json file
+        source_info = self._load_source_info()
+
+        # extract data from multiple sources
+        print("\n{} {} {}".format(20*"-", "Extract: data extraction from the source initiated", 20*"-"))
+        with self.instrumentation.span("extract") as stage_span:
+            extracted_data = self.on_extract(source_info)
+            extracted_data = self.on_detect_changes(extracted_data)
+            self._record_extract(stage_span)
+        print("{} {} {}\n".format(20*"-", "Extract: data extraction from the source ended", 20*"-"))
+
+        if last_stage == "extract":
+            return
+
+        # read, transform and merge data from both sources
+        print("\n{} {} {}".format(20*"-", "Transform: data transformation from extracted data initiated", 20*"-"))
+        with self.instrumentation.span("transform") as stage_span:
+            transformed_data = self.on_transform(extracted_data)
+            self._record_transform(stage_span)
+        print("{} {} {}\n".format(20*"-", "Transform: data transformation from extracted data ended", 20*"-"))
+
+        if last_stage == "transform":
+            return
+
+        # load transformed data into database
+        print("\n{} {} {}".format(20*"-", "Load: transformed data loading into a database initiated", 20*"-"))
+        with self.instrumentation.span("load") as stage_span:
+            database_bytes = self._database_size()
+            self.on_load(transformed_data)
+            self._record_load(stage_span, database_bytes)
+        print("{} {} {}\n".format(20*"-", "Load: transformed data loading into a database ended", 20*"-"))
+
+    def _run_streaming(self, pipeline_span: Span) -> None:
+        """
+        Runs the stages overlapped: the extractor thread puts every file into a bounded queue as soon as it
+        landed, the transformer takes them from the queue and the loader writes every transformed partition
+        as it arrives, so the run takes about as long as its slowest stage instead of the sum of the stages.
+
+        Parameters:
+            pipeline_span (Span): The span of the pipeline run.
+
+        Returns:
+            None
+        """
+        # load the source information from the json file
+        source_info = self._load_source_info()
+        file_queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        stage_seconds, errors = dict(), list()
+
+        print("\n{} {} {}".format(20*"-", "Stream: overlapped extraction, transformation and loading initiated", 20*"-"))
+        extract_thread = threading.Thread(target=self._stream_extract,
+                                          args=(source_info, file_queue, stage_seconds, errors), daemon=True)
+        extract_thread.start()
+
+        # the transformer completes the merged frames at the end of the stream, the loader writes its sinks from them
+        self.loader.transformed_data = self.transformer.transformed_data
+        database_bytes = self._database_size()
+        started_at = time.perf_counter()
+
+        def transform_stream():
+            yield from self.transformer.transform_stream(file_queue)
+            stage_seconds["transform"] = time.perf_counter() - started_at
+            # raised inside the load, so a failed extraction is rolled back instead of committed
+            if errors:
+                raise errors[0]
+
+        self.loader.load_stream(transform_stream())
+        stage_seconds["load"] = time.perf_counter() - started_at
+        extract_thread.join()
+        print("{} {} {}\n".format(20*"-", "Stream: overlapped extraction, transformation and loading ended", 20*"-"))
+
+        self._record_stages(pipeline_span, stage_seconds, database_bytes)
+
+    def _stream_extract(self, source_info: Dict, file_queue: queue.Queue, stage_seconds: Dict, errors: List) -> None:
+        """
+        Downloads the files into the queue of the transformer, the queue ends with None (runs in its own thread).
+
+        In incremental mode the files whose partition did not change since the last load are not queued.
+        The partition hashes are handed to the loader before the queue ends, so they are recorded with the load.
+
+        Parameters:
+            source_info (dict): A dictionary containing the necessary source URL and other information.
+            file_queue (queue.Queue): The bounded queue of the landed files.
+            stage_seconds (dict): The wall times of the stages, the extract time is added.
+            errors (list): The exceptions of the thread, raised again by the pipeline.
+
+        Returns:
+            None
+        """
+        started_at = time.perf_counter()
+        loaded_hashes = self.loader.get_loaded_hashes() if self.loader.incremental else dict()
+        self.loader.changed_partitions = dict()
+        self.extractor.source_info = source_info
+        self.transformer.source_info = source_info
+
+        try:
+            for task_index, source, file_info in self.extractor.extract_stream():
+                if self.loader.incremental:
+                    sha256 = self.helper_service.file_sha256(os.path.join(self.extractor.raw_dir, file_info[-1]))
+                    if sha256 == loaded_hashes.get(source, dict()).get(file_info[0]):
+                        continue
+                    self.loader.changed_partitions.setdefault(source, list()).append(file_info[0])
+                file_queue.put((task_index, source, file_info))
+
+            self.loader.partition_hashes = self.extractor.get_partition_hashes()
+        except BaseException as e:
+            # the pipeline raises it again, sys.exit of a thread would otherwise be lost
+            errors.append(e)
+        finally:
+            stage_seconds["extract"] = time.perf_counter() - started_at
+            file_queue.put(None)
+
+    def _run_task_graph(self, pipeline_span: Span) -> List:
+        """
+        Runs every source as its own extract -> transform -> load branch of a task graph, the analysis tables
+        are rebuilt once all the loads are done.
+
+        The branches run concurrently on at most PIPELINE_MAX_PARALLEL_TASKS threads (the downloads keep their
+        per-host limits, the loads take turns on the database). A failing task only skips the tasks depending
+        on it, so a failing source neither blocks nor cancels the other one.
+
+        Parameters:
+            pipeline_span (Span): The span of the pipeline run.
+
+        Returns:
+            failed_tasks (list): The tasks which failed or were skipped.
+        """
+        # load the source information from the json file
+        source_info = self._load_source_info()
+        source_names = [source["source_name"] for source in source_info["data_sources"]]
+
+        self.extractor.source_info = source_info
+        self.transformer.source_info = source_info
+        # every source has its key up front, so no branch resizes the dict another branch is iterating
+        self.transformer.extracted_data = {source: list() for source in source_names}
+        self.loader.transformed_data = self.transformer.transformed_data
+        database_bytes = self._database_size()
+
+        task_scheduler = TaskScheduler()
+        for source in source_names:
+            task_scheduler.add_task(f"extract:{source}", lambda source=source: self.on_detect_changes(
+                self.on_extract(source_info, [source]), [source]))
+            task_scheduler.add_task(f"transform:{source}", lambda source=source: self.on_transform(
+                task_scheduler.tasks[f"extract:{source}"].result, [source]), [f"extract:{source}"])
+            task_scheduler.add_task(f"load:{source}", lambda source=source: self.loader.load([source]),
+                                    [f"transform:{source}"])
+        task_scheduler.add_task("analytics", self.loader.write_analytics, [f"load:{source}" for source in source_names])
+
+        print("\n{} {} {}".format(20*"-", "Task graph: per-source extract, transform and load branches initiated", 20*"-"))
+        tasks = task_scheduler.run()
+        print("{} {} {}\n".format(20*"-", "Task graph: per-source extract, transform and load branches ended", 20*"-"))
+
+        # the wall time of a stage spans from its first task starting to its last task ending
+        stage_seconds = dict()
+        for stage in ["extract", "transform", "load"]:
+            stage_tasks = [task for task in tasks.values() if task.started_at is not None and
+                           (task.name.split(":")[0] == stage or (stage == "load" and task.name == "analytics"))]
+            if stage_tasks:
+                stage_seconds[stage] = (max(task.started_at + task.wall_seconds for task in stage_tasks)
+                                        - min(task.started_at for task in stage_tasks))
+
+        self._record_stages(pipeline_span, stage_seconds, database_bytes)
+        pipeline_span.attributes["tasks"] = {name: task.to_dict() for name, task in tasks.items()}
+
+        return task_scheduler.get_failed_tasks()
+
+    def _run_chunked(self, pipeline_span: Span) -> None:
+        """
+        Runs the extraction, then transforms and loads the extracted files chunk by chunk: every chunk is
+        appended to the database as soon as it is cleaned and dropped afterwards, so the memory of the run is
+        bounded by TRANSFORM_MEMORY_BUDGET instead of growing with the years, stations and rows of the data.
+
+        No transformed frames are kept, so there are no transform checkpoints and no additional sinks.
+
+        Parameters:
+            pipeline_span (Span): The span of the pipeline run.
+
+        Returns:
+            None
+        """
+        # load the source information from the json file
+        source_info = self._load_source_info()
+
+        # extract data from multiple sources
+        print("\n{} {} {}".format(20*"-", "Extract: data extraction from the source initiated", 20*"-"))
+        with self.instrumentation.span("extract") as stage_span:
+            extracted_data = self.on_extract(source_info)
+            extracted_data = self.on_detect_changes(extracted_data)
+            self._record_extract(stage_span)
+        print("{} {} {}\n".format(20*"-", "Extract: data extraction from the source ended", 20*"-"))
+
+        # transform every chunk and load it right away
+        print("\n{} {} {}".format(20*"-", "Chunked: chunk by chunk transformation and loading initiated", 20*"-"))
+        self.transformer.extracted_data = extracted_data
+        self.loader.transformed_data = self.transformer.transformed_data
+        database_bytes = self._database_size()
+        started_at = time.perf_counter()
+
+        self.loader.load_stream(self.transformer.transform_chunks())
+
+        # the transformation and the load alternate, the load takes the rest of the time
+        transform_seconds = sum(file_stats["wall_seconds"] for file_stats in self.transformer.file_stats)
+        stage_seconds = {"transform": transform_seconds, "load": time.perf_counter() - started_at - transform_seconds}
+        print("{} {} {}\n".format(20*"-", "Chunked: chunk by chunk transformation and loading ended", 20*"-"))
+
+        self._record_transform(self.instrumentation.record(pipeline_span, "transform", kind="stage",
+                                                           wall_seconds=stage_seconds["transform"], overlapped=True))
+        self._record_load(self.instrumentation.record(pipeline_span, "load", kind="stage",
+                                                      wall_seconds=stage_seconds["load"], overlapped=True), database_bytes)
+
+    def _record_stages(self, pipeline_span: Span, stage_seconds: Dict, database_bytes: int) -> None:
+        """
+        Attaches the overlapping stages to the pipeline span with their measured wall times.
+
+        The stages of the streaming mode and of the task graph run at the same time, so they cannot be nested
+        spans of their own.
+
+        Parameters:
+            pipeline_span (Span): The span of the pipeline run.
+            stage_seconds (dict): The wall time of every stage.
+            database_bytes (int): The size of the database files before the run.
+
+        Returns:
+            None
+        """
+        for stage, record_stage in [("extract", self._record_extract), ("transform", self._record_transform),
+                                    ("load", lambda stage_span: self._record_load(stage_span, database_bytes))]:
+            record_stage(self.instrumentation.record(pipeline_span, stage, kind="stage",
+                                                     wall_seconds=stage_seconds.get(stage), overlapped=True))
+
+    def _load_source_info(self) -> Dict:
+        """
+        Loads the source information and checks that the loader can store the grain of its weather data.
+
+        The normalized tables and the analysis tables are monthly, daily or hourly weather is only loaded into the
+        wide tables (and the sinks): a normalized run stops, the analysis tables are skipped.
+
+        Parameters:
+            None
+
+        Returns:
+            source_info (dict): The source information.
+        """
+        source_info = self.helper_service.load_json(self.source_info_path)
+        self.transformer.source_info = source_info
+        granularity, resample = self.transformer.get_granularity("Meteostat")
+
+        if (resample or granularity) != "monthly":
+            if self.loader.normalized:
+                print(f"Error: The normalized tables hold monthly weather, resample the {granularity} Meteostat "
+                      f"data to monthly or load the wide tables")
+                sys.exit(1)
+            if self.loader.analytics:
+                print(f"Error: The analysis tables join monthly weather, they are skipped for "
+                      f"{resample or granularity} Meteostat data")
+                self.loader.analytics = False
+
+        return source_info
+
+    def _get_extract_key(self, source_info: Dict, source: str) -> str:
+        """
+        Returns the checkpoint key of the extraction of a source: its source information and download location.
+
+        Parameters:
+            source_info (dict): A dictionary containing the necessary source URL and other information.
+            source (str): The name of the source.
+
+        Returns:
+            key (str): The key of the extract checkpoint.
+        """
+        source_entry = [entry for entry in source_info["data_sources"] if entry["source_name"] == source]
+
+        return self.checkpoint_store.get_key("extract", source_entry, self.extractor.mirror_url, self.extractor.raw_dir)
+
+    def _get_transform_key(self, source: str, files_list: List) -> str:
+        """
+        Returns the checkpoint key of the transformation of a source: the content hashes of its raw files, the
+        declared schemas, the year window, the grain and the code of the transformer.
+
+        Parameters:
+            source (str): The name of the source.
+            files_list (list): The extracted files of the source to transform.
+
+        Returns:
+            key (str): The key of the transform checkpoint.
+        """
+        partition_hashes = self.loader.partition_hashes.get(source, dict())
+        transformer_path = sys.modules[type(self.transformer).__module__].__file__
+
+        return self.checkpoint_store.get_key(
+            "transform", source, [[*file_info, partition_hashes.get(file_info[0])] for file_info in files_list],
+            SOURCE_SCHEMAS[source], self.transformer.get_year_window(source), self.transformer.get_granularity(source),
+            self.helper_service.file_sha256(transformer_path))
+
+    def _record_extract(self, stage_span: Span) -> None:
+        """
+        Attaches the measured downloads to the extract span.
+
+        Parameters:
+            stage_span (Span): The span of the extract stage.
+
+        Returns:
+            None
+        """
+        for result in self.extractor.download_results.values():
+            downloaded_bytes = result.get("downloaded_bytes", 0)
+            self.instrumentation.record(stage_span, result["file_name"], wall_seconds=result.get("wall_seconds"),
+                                        bytes_downloaded=downloaded_bytes, bytes_written=downloaded_bytes,
+                                        status=result["status"], attempts=result.get("attempts"), url=result["url"])
+            stage_span.add(bytes_downloaded=downloaded_bytes, bytes_written=downloaded_bytes)
+
+    def _record_transform(self, stage_span: Span) -> None:
+        """
+        Attaches the measured file transformations (and the memory of the compacted frames) to the transform span.
+
+        Parameters:
+            stage_span (Span): The span of the transform stage.
+
+        Returns:
+            None
+        """
+        for file_stats in self.transformer.file_stats:
+            self.instrumentation.record(stage_span, file_stats["file_name"], wall_seconds=file_stats["wall_seconds"],
+                                        cpu_seconds=file_stats["cpu_seconds"], bytes_read=file_stats["bytes_read"],
+                                        rows=file_stats["rows"], source=file_stats["source"])
+            stage_span.add(bytes_read=file_stats["bytes_read"])
+
+        # the chunked mode keeps no merged frames, its rows are the rows of the files
+        stage_span.add(rows=sum(len(data_df) for data_df in self.transformer.transformed_data.values())
+                       if self.transformer.transformed_data
+                       else sum(file_stats["rows"] for file_stats in self.transformer.file_stats))
+        if self.transformer.memory_stats:
+            stage_span.attributes["memory"] = self.transformer.memory_stats
+
+    def _record_load(self, stage_span: Span, database_bytes: int) -> None:
+        """
+        Attaches the loaded sources to the load span, the bytes written are the growth of the database files.
+
+        Parameters:
+            stage_span (Span): The span of the load stage.
+            database_bytes (int): The size of the database files before the load.
+
+        Returns:
+            None
+        """
+        for source, load_stats in self.loader.load_stats.items():
+            self.instrumentation.record(stage_span, source, kind="source", wall_seconds=load_stats["seconds"],
+                                        rows=load_stats["rows"])
+            stage_span.add(rows=load_stats["rows"])
+
+        stage_span.add(bytes_written=max(0, self._database_size() - database_bytes))
+        stage_span.attributes["database_bytes"] = self._database_size()
+
+    def _database_size(self) -> int:
+        """
+        Returns the size of the database files (with the write-ahead log).
+
+        Parameters:
+            None
+
+        Returns:
+            size (int): The size in bytes, 0 if the database does not exist yet.
+        """
+        db_path = self.loader.db_path
+        return sum(os.path.getsize(path) for path in (db_path, db_path + "-wal") if os.path.exists(path))
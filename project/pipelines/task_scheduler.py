@@ -0,0 +1,192 @@
+# Python imports
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List
+import time
+
+# Third party imports
+
+# Self imports
+from config.config_var import *
+
+
+class Task:
+    """
+    A class to represent a task of the task graph.
+
+    Attributes:
+        name (str): The unique name of the task, e.g. 'transform:Meteostat'.
+        function (Callable): The function running the task, called without arguments.
+        dependencies (list): The names of the tasks which have to be done before the task starts.
+        status (str): 'pending', 'running', 'done', 'failed' or 'skipped' (a dependency failed or was skipped).
+        result (Any): The return value of the function.
+        error (str): The error of a failed task, or the dependency a skipped task was waiting for.
+        started_at (float): The perf_counter time the task started.
+        wall_seconds (float): The elapsed wall-clock time of the task.
+
+    Methods:
+        to_dict() -> Dict: Returns the status of the task as a JSON serializable dictionary.
+    """
+
+    def __init__(self, name: str, function: Callable, dependencies: List = None) -> None:
+        self.name = name
+        self.function = function
+        self.dependencies = list(dependencies or [])
+        self.status = "pending"
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.wall_seconds = 0.0
+
+    def to_dict(self) -> Dict:
+        """
+        Returns the status of the task as a JSON serializable dictionary.
+
+        Parameters:
+            None
+
+        Returns:
+            task (dict): The status, dependencies, wall time and error of the task.
+        """
+        return {"status": self.status, "dependencies": self.dependencies,
+                "wall_seconds": round(self.wall_seconds, 6), "error": self.error}
+
+
+class TaskScheduler:
+    """
+    A class to run a graph of tasks with explicit dependencies on a bounded pool of threads.
+
+    A task starts as soon as all its dependencies are done and a thread is free, ready tasks start in the
+    order they were added. A failing task (an exception or a sys.exit of the code it runs) only fails its
+    own task: the tasks depending on it are skipped, all the other tasks keep running.
+
+    Attributes:
+        max_workers (int): The maximum number of tasks running at the same time.
+        tasks (dict): The tasks by name, in the order they were added.
+
+    Methods:
+        add_task(name: str, function: Callable, dependencies: List) -> Task: Adds a task to the graph.
+        run() -> Dict: Runs all the tasks and returns them with their status.
+        get_failed_tasks() -> List: Returns the tasks which failed or were skipped.
+        _validate() -> None: Checks that the dependencies exist and contain no cycle.
+        _run_task(task: Task) -> Any: Runs a single task and measures it.
+    """
+
+    def __init__(self, max_workers: int = PIPELINE_MAX_PARALLEL_TASKS) -> None:
+        self.max_workers = max_workers
+        self.tasks = dict()
+
+    def add_task(self, name: str, function: Callable, dependencies: List = None) -> Task:
+        """
+        Adds a task to the graph.
+
+        Parameters:
+            name (str): The unique name of the task.
+            function (Callable): The function running the task, called without arguments.
+            dependencies (list, optional): The names of the tasks which have to be done before the task starts.
+
+        Returns:
+            task (Task): The added task.
+        """
+        if name in self.tasks:
+            raise ValueError(f"Task '{name}' is already in the graph")
+
+        self.tasks[name] = Task(name, function, dependencies)
+        return self.tasks[name]
+
+    def run(self) -> Dict:
+        """
+        Runs all the tasks, every task as soon as its dependencies are done and a thread is free.
+
+        Parameters:
+            None
+
+        Returns:
+            tasks (dict): The tasks by name with their status, result and wall time.
+        """
+        self._validate()
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            running = dict()
+
+            while True:
+                for task in self.tasks.values():
+                    if task.status != "pending":
+                        continue
+
+                    # the dependencies are added before their dependents, so a skip propagates in a single pass
+                    blocking = [self.tasks[name] for name in task.dependencies
+                                if self.tasks[name].status in ("failed", "skipped")]
+                    if blocking:
+                        task.status, task.error = "skipped", f"dependency '{blocking[0].name}' {blocking[0].status}"
+                        print(f"Error: Task {task.name} skipped, its {task.error}")
+                    elif len(running) < max(1, self.max_workers) and all(
+                            self.tasks[name].status == "done" for name in task.dependencies):
+                        task.status = "running"
+                        running[executor.submit(self._run_task, task)] = task
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    try:
+                        task.result = future.result()
+                        task.status = "done"
+                    except KeyboardInterrupt:
+                        raise
+                    except BaseException as e:
+                        # a sys.exit of the task code only ends the task, not the other branches
+                        task.status, task.error = "failed", f"{type(e).__name__}: {str(e)}"
+                        print(f"Error: Task {task.name} failed- {task.error}")
+
+        return self.tasks
+
+    def get_failed_tasks(self) -> List:
+        """
+        Returns the tasks which failed or were skipped.
+
+        Parameters:
+            None
+
+        Returns:
+            failed_tasks (list): The failed and skipped tasks, in the order they were added.
+        """
+        return [task for task in self.tasks.values() if task.status in ("failed", "skipped")]
+
+    def _validate(self) -> None:
+        """
+        Checks that every dependency is a task of the graph added before its dependent (so there is no cycle).
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        added = set()
+
+        for task in self.tasks.values():
+            for name in task.dependencies:
+                if name not in self.tasks:
+                    raise ValueError(f"Task '{task.name}' depends on the unknown task '{name}'")
+                if name not in added:
+                    raise ValueError(f"Task '{task.name}' depends on '{name}', which has to be added before it")
+            added.add(task.name)
+
+    def _run_task(self, task: Task) -> Any:
+        """
+        Runs a single task and measures its wall time (runs in a thread of the pool).
+
+        Parameters:
+            task (Task): The task to run.
+
+        Returns:
+            result (Any): The return value of the function of the task.
+        """
+        task.started_at = time.perf_counter()
+
+        try:
+            return task.function()
+        finally:
+            task.wall_seconds = time.perf_counter() - task.started_at
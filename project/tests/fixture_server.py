@@ -0,0 +1,438 @@
+"""
+Script Name: fixture_server.py
+Script Description: This script records the source files and replays them from a local HTTP server for offline tests
+Usage: python -m tests.fixture_server record [--source-info FILE]   (downloads every source URL once)
+       python -m tests.fixture_server seed [--source-info FILE]     (synthetic stand-ins, no network needed)
+       python -m tests.fixture_server serve [--port N] [--latency S] (prints the mirror URL for ETL_MIRROR_URL)
+       (run from the project directory)
+"""
+
+
+# Python imports
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List
+import os, json, time, shutil, hashlib, tempfile, argparse, threading
+
+# Third party imports
+import requests
+
+# Self imports
+from config.config_var import *
+from utils.service_factory import HelperService
+from benchmarks.data_generator import SyntheticDataGenerator
+
+
+FIXTURE_RECORDINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "recordings")
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    """
+    A class to answer the requests of the fixture server from its recordings.
+
+    `GET /replay/<scheme>/<host>/<path>` returns the recording of `<scheme>://<host>/<path>` with its
+    ETag and Last-Modified validators, honouring If-None-Match/If-Modified-Since (304) and
+    Range/If-Range (206/416) like the real servers do.
+
+    Methods:
+        do_GET() -> None: Answers a GET request after the configured latency.
+        log_message(format: str, *args) -> None: Silences the request log.
+        _send_validators(entry: Dict) -> None: Sends the ETag and Last-Modified headers of a recording.
+        _is_not_modified(entry: Dict) -> bool: Checks the conditional request headers against a recording.
+        _get_range(entry: Dict, size: int) -> tuple: Returns the requested byte range.
+    """
+
+    def __init__(self, *args, fixture_server: "FixtureServer" = None, **kwargs) -> None:
+        self.fixture_server = fixture_server
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self) -> None:
+        """
+        Answers a GET request after the configured latency.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        time.sleep(self.fixture_server.latency)
+
+        entry = self.fixture_server.lookup(self.path)
+        self.fixture_server.requests_log.append((self.path, dict(self.headers)))
+        if entry is None:
+            self.send_error(404, "No recording for this URL")
+            return
+
+        file_path = os.path.join(self.fixture_server.recordings_dir, "files", entry["file"])
+        size = os.path.getsize(file_path)
+
+        if self._is_not_modified(entry):
+            self.send_response(304)
+            self._send_validators(entry)
+            self.end_headers()
+            return
+
+        start, end = self._get_range(entry, size)
+        if start is not None and start >= size:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if start is None:
+            start, end = 0, size - 1
+            self.send_response(200)
+        else:
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+
+        self.send_header("Content-Type", entry.get("content_type") or "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self._send_validators(entry)
+        self.end_headers()
+
+        with open(file_path, 'rb') as file:
+            file.seek(start)
+            self.wfile.write(file.read(end - start + 1))
+
+    def log_message(self, format: str, *args) -> None:
+        """
+        Silences the request log.
+
+        Parameters:
+            format (str): The format of the log message.
+            *args: The values of the log message.
+
+        Returns:
+            None
+        """
+        pass
+
+    def _send_validators(self, entry: Dict) -> None:
+        """
+        Sends the ETag and Last-Modified headers of a recording.
+
+        Parameters:
+            entry (dict): The index entry of the recording.
+
+        Returns:
+            None
+        """
+        self.send_header("ETag", entry["etag"])
+        self.send_header("Last-Modified", entry["last_modified"])
+
+    def _is_not_modified(self, entry: Dict) -> bool:
+        """
+        Checks the conditional request headers against a recording (If-None-Match takes precedence).
+
+        Parameters:
+            entry (dict): The index entry of the recording.
+
+        Returns:
+            not_modified (bool): True if the client's copy is current and a 304 is answered.
+        """
+        if self.headers.get("If-None-Match") is not None:
+            return entry["etag"] in [etag.strip() for etag in self.headers["If-None-Match"].split(",")]
+
+        if self.headers.get("If-Modified-Since") is not None:
+            try:
+                return parsedate_to_datetime(entry["last_modified"]) <= parsedate_to_datetime(self.headers["If-Modified-Since"])
+            except (TypeError, ValueError):
+                return False
+
+        return False
+
+    def _get_range(self, entry: Dict, size: int) -> tuple:
+        """
+        Returns the requested byte range, a single range only.
+
+        Parameters:
+            entry (dict): The index entry of the recording.
+            size (int): The size of the recorded file.
+
+        Returns:
+            byte_range (tuple): The first and last byte, (None, None) for the full file.
+        """
+        range_header = self.headers.get("Range")
+        if range_header is None or not range_header.startswith("bytes=") or "," in range_header:
+            return None, None
+
+        # a stale If-Range validator means the client has to start over with the full file
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range not in (entry["etag"], entry["last_modified"]):
+            return None, None
+
+        first, _, last = range_header[len("bytes="):].partition("-")
+        if not first:
+            return max(0, size - int(last)), size - 1
+
+        return int(first), min(int(last), size - 1) if last else size - 1
+
+
+class FixtureServer:
+    """
+    A class to represent a hermetic local stand-in for the source servers.
+
+    Recordings are stored as `files/<sha1 of the URL>` next to an `index.json` mapping every recorded URL
+    to its file and validators. The extractor is pointed at the server with its `mirror_url` (or the
+    ETL_MIRROR_URL environment variable), which maps every source URL below `/replay/`.
+
+    Attributes:
+        recordings_dir (str): The directory of the recordings.
+        latency (float): The seconds every request waits before it is answered.
+        port (int): The port of the server, 0 picks a free one.
+        index (dict): The recording index by source URL.
+        requests_log (list): The (path, headers) of every request, for the tests.
+        url (str): The base URL of the running server, None before it is started.
+
+    Methods:
+        start() -> FixtureServer: Starts the server on a free (or the given) localhost port in a background thread.
+        stop() -> None: Stops the server.
+        lookup(path: str) -> Dict: Returns the recording of a requested path.
+        record(source_info: Dict) -> None: Downloads and records every URL of the source information.
+        seed(source_info: Dict) -> None: Records synthetic stand-ins for every URL of the source information.
+        source_urls(source_info: Dict) -> List: Returns every URL of the source information.
+        has_recordings(source_info: Dict) -> bool: Checks that every URL of the source information is recorded from its source.
+        _get_station_url(source: Dict, station_id: str) -> str: Returns the URL of the file of a weather station.
+        _store(url: str, file_path: str, etag: str, last_modified: str, content_type: str, synthetic: bool) -> None:
+            Adds a file to the recordings.
+        _save_index() -> None: Saves the recording index.
+    """
+
+    def __init__(self, recordings_dir: str = FIXTURE_RECORDINGS_PATH, latency: float = 0.0, port: int = 0) -> None:
+        self.recordings_dir = recordings_dir
+        self.latency = latency
+        self.port = port
+        self.requests_log = list()
+        self.url = None
+        self._server = None
+
+        index_path = os.path.join(self.recordings_dir, "index.json")
+        self.index = HelperService().load_json(index_path) if os.path.exists(index_path) else dict()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> "FixtureServer":
+        """
+        Starts the server on a free (or the given) localhost port in a background thread.
+
+        Parameters:
+            None
+
+        Returns:
+            fixture_server (FixtureServer): The running server.
+        """
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), partial(FixtureRequestHandler, fixture_server=self))
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops the server.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def lookup(self, path: str) -> Dict:
+        """
+        Returns the recording of a requested path.
+
+        Parameters:
+            path (str): The request path, `/replay/<scheme>/<host>/<path>`.
+
+        Returns:
+            entry (dict): The index entry of the recorded URL, None if the URL is not recorded.
+        """
+        if not path.startswith("/replay/"):
+            return None
+
+        scheme, _, rest = path[len("/replay/"):].partition("/")
+        return self.index.get(f"{scheme}://{rest}")
+
+    def record(self, source_info: Dict) -> None:
+        """
+        Downloads and records every URL of the source information (needs network access once).
+
+        Parameters:
+            source_info (dict): The source information, e.g. config/source_info.json.
+
+        Returns:
+            None
+        """
+        for url in self.source_urls(source_info):
+            response = requests.get(url, timeout=(10, 120))
+            response.raise_for_status()
+
+            with tempfile.NamedTemporaryFile(delete=False) as file:
+                file.write(response.content)
+
+            self._store(url, file.name, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                        response.headers.get("Content-Type"), synthetic=False)
+            print(f"Succeed: Recorded {url} ({len(response.content)} bytes)")
+
+        self._save_index()
+
+    def seed(self, source_info: Dict) -> None:
+        """
+        Records synthetic stand-ins (see benchmarks/data_generator.py) for every URL of the source information.
+
+        The files have the formats and the size of the real ones, but not their values.
+
+        Parameters:
+            source_info (dict): The source information, e.g. config/source_info.json.
+
+        Returns:
+            None
+        """
+        sources = {source["source_name"]: source for source in source_info["data_sources"]}
+        years = [int(url_dict["year"]) for url_dict in sources["Mobilithek"]["data_urls"]]
+        station_ids = [station["station_id"] for station in sources["Meteostat"]["stations"]]
+        granularity = sources["Meteostat"].get("granularity", METEOSTAT_GRANULARITY)
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            SyntheticDataGenerator(output_dir, first_year=min(years), last_year=max(years),
+                                   weather_station_ids=station_ids, weather_granularity=granularity).generate()
+
+            for url_dict in sources["Mobilithek"]["data_urls"]:
+                self._store(url_dict["url"], os.path.join(output_dir, f"mobilithek_bicycle_traffic_{url_dict['year']}.csv"),
+                            content_type="text/csv", synthetic=True)
+            for station_id in station_ids:
+                self._store(self._get_station_url(sources["Meteostat"], station_id),
+                            os.path.join(output_dir, f"{station_id}.csv.gz"), content_type="application/gzip",
+                            synthetic=True)
+
+        self._save_index()
+        print(f"Succeed: Synthetic recordings seeded in {self.recordings_dir}")
+
+    def source_urls(self, source_info: Dict) -> List:
+        """
+        Returns every URL of the source information.
+
+        Parameters:
+            source_info (dict): The source information.
+
+        Returns:
+            urls (list): The Mobilithek file URLs and the Meteostat station URLs.
+        """
+        urls = list()
+
+        for source in source_info["data_sources"]:
+            if source["source_name"] == "Mobilithek":
+                urls.extend(url_dict["url"] for url_dict in source["data_urls"])
+            elif source["source_name"] == "Meteostat":
+                urls.extend(self._get_station_url(source, station["station_id"]) for station in source["stations"])
+
+        return urls
+
+    def has_recordings(self, source_info: Dict) -> bool:
+        """
+        Checks that every URL of the source information is recorded from its source, not by a synthetic stand-in.
+
+        Parameters:
+            source_info (dict): The source information.
+
+        Returns:
+            recorded (bool): Whether the real files of every URL are recorded.
+        """
+        return all(url in self.index and not self.index[url].get("synthetic", False)
+                   for url in self.source_urls(source_info))
+
+    def _get_station_url(self, source: Dict, station_id: str) -> str:
+        """
+        Returns the URL of the file of a weather station, in the grain of the source (the same URL as the extractor).
+
+        Parameters:
+            source (dict): The Meteostat entry of the source information.
+            station_id (str): The id of the weather station.
+
+        Returns:
+            url (str): The URL of the station file.
+        """
+        return source["api_endpoint"].replace("{granularity}", source.get("granularity", METEOSTAT_GRANULARITY)
+                                              ).replace("{station}", station_id)
+
+    def _store(self, url: str, file_path: str, etag: str = None, last_modified: str = None,
+               content_type: str = None, synthetic: bool = False) -> None:
+        """
+        Adds a file to the recordings, missing validators are derived from the content and the recording time.
+
+        Parameters:
+            url (str): The source URL of the file.
+            file_path (str): The path of the file, it is copied.
+            etag (str, optional): The ETag of the source.
+            last_modified (str, optional): The Last-Modified of the source.
+            content_type (str, optional): The Content-Type of the source.
+            synthetic (bool, optional): Whether the file is a synthetic stand-in.
+
+        Returns:
+            None
+        """
+        file_name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        os.makedirs(os.path.join(self.recordings_dir, "files"), exist_ok=True)
+        shutil.copyfile(file_path, os.path.join(self.recordings_dir, "files", file_name))
+
+        self.index[url] = {
+            "file": file_name,
+            "etag": etag or '"{}"'.format(HelperService().file_sha256(file_path)[:32]),
+            "last_modified": last_modified or formatdate(time.time(), usegmt=True),
+            "content_type": content_type,
+            "synthetic": synthetic,
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec='seconds')
+        }
+
+    def _save_index(self) -> None:
+        """
+        Saves the recording index.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        with open(os.path.join(self.recordings_dir, "index.json"), 'w', encoding='utf-8') as file:
+            json.dump(self.index, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Record the source files and replay them from a local HTTP server")
+    parser.add_argument("command", choices=["record", "seed", "serve"])
+    parser.add_argument("--source-info", default=SOURCE_INFO_PATH, help="source information of the URLs to record")
+    parser.add_argument("--recordings-dir", default=FIXTURE_RECORDINGS_PATH, help="directory of the recordings")
+    parser.add_argument("--port", type=int, default=8765, help="port of the server")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every request waits before it is answered")
+    args = parser.parse_args()
+
+    fixture_server = FixtureServer(recordings_dir=args.recordings_dir, latency=args.latency, port=args.port)
+
+    if args.command == "record":
+        fixture_server.record(HelperService().load_json(args.source_info))
+    elif args.command == "seed":
+        fixture_server.seed(HelperService().load_json(args.source_info))
+    else:
+        fixture_server.start()
+        print(f"Succeed: Serving {len(fixture_server.index)} recordings, export ETL_MIRROR_URL={fixture_server.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            fixture_server.stop()
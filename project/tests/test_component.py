@@ -1,123 +1,705 @@
-# Python imports
-import unittest
-import json
-import pickle
-import sqlite3
-
-# Third party imports
-import numpy as np
-import pandas as pd
-from pandas.testing import assert_frame_equal
-
-# Self imports
-from config.config_var import *
-from utils.service_factory import HelperService
-from etl.extract.data_extractor import DataExtractor
-from etl.transform.data_transformer import DataTransformer
-from etl.load.data_loader import DataLoader
-
-
-class TestComponent(unittest.TestCase):
-
-    # Component Testing: HelperService
-    def test_helper_service(self):
-        with open(SOURCE_INFO_PATH, 'r') as file:
-            expected_data = json.load(file)
-
-        helper_service = HelperService()
-        hs_load_json = helper_service.load_json(SOURCE_INFO_PATH)
-
-        self.assertEqual(hs_load_json, expected_data)
-    
-    # Component Testing: DataExtractor
-    def test_data_extractor(self):
-        expected_data = {
-            'Mobilithek': [
-                ('2009', 'mobilithek_bicycle_traffic_2009.csv'),
-                ('2010', 'mobilithek_bicycle_traffic_2010.csv'),
-                ('2011', 'mobilithek_bicycle_traffic_2011.csv'),
-                ('2012', 'mobilithek_bicycle_traffic_2012.csv'),
-                ('2013', 'mobilithek_bicycle_traffic_2013.csv'),
-                ('2014', 'mobilithek_bicycle_traffic_2014.csv'),
-                ('2015', 'mobilithek_bicycle_traffic_2015.csv'),
-                ('2016', 'mobilithek_bicycle_traffic_2016.csv'),
-                ('2017', 'mobilithek_bicycle_traffic_2017.csv'),
-                ('2018', 'mobilithek_bicycle_traffic_2018.csv'),
-                ('2019', 'mobilithek_bicycle_traffic_2019.csv'),
-                ('2020', 'mobilithek_bicycle_traffic_2020.csv'),
-                ('2021', 'mobilithek_bicycle_traffic_2021.csv'),
-                ('2022', 'mobilithek_bicycle_traffic_2022.csv')
-            ],
-            'Meteostat': [
-                ('10513', 'Köln-Bonn Airport', 'meteostat_weather_data_10513_Köln-Bonn Airport.csv.gz'),
-                ('D2968', 'Köln-Stammheim', 'meteostat_weather_data_D2968_Köln-Stammheim.csv.gz')
-            ]
-        }
-
-        with open(SOURCE_INFO_PATH, 'r') as file:
-            source_info = json.load(file)
-        
-        data_extractor = DataExtractor()
-        data_extractor.source_info = source_info
-        data_extractor.extract()
-        extracted_data = data_extractor.extracted_data
-
-        self.assertEqual(extracted_data, expected_data)
-    
-    # Component Testing: DataTransformer
-    def test_data_transformer(self):
-        with open(os.path.join(os.getcwd(), 'tests', 'transformed_data.pkl'), 'rb') as file:
-            expected_data = pickle.load(file)
-        
-        extracted_data = {
-            'Mobilithek': [
-                ('2009', 'mobilithek_bicycle_traffic_2009.csv'),
-                ('2010', 'mobilithek_bicycle_traffic_2010.csv'),
-                ('2011', 'mobilithek_bicycle_traffic_2011.csv'),
-                ('2012', 'mobilithek_bicycle_traffic_2012.csv'),
-                ('2013', 'mobilithek_bicycle_traffic_2013.csv'),
-                ('2014', 'mobilithek_bicycle_traffic_2014.csv'),
-                ('2015', 'mobilithek_bicycle_traffic_2015.csv'),
-                ('2016', 'mobilithek_bicycle_traffic_2016.csv'),
-                ('2017', 'mobilithek_bicycle_traffic_2017.csv'),
-                ('2018', 'mobilithek_bicycle_traffic_2018.csv'),
-                ('2019', 'mobilithek_bicycle_traffic_2019.csv'),
-                ('2020', 'mobilithek_bicycle_traffic_2020.csv'),
-                ('2021', 'mobilithek_bicycle_traffic_2021.csv'),
-                ('2022', 'mobilithek_bicycle_traffic_2022.csv')
-            ],
-            'Meteostat': [
-                ('10513', 'Köln-Bonn Airport', 'meteostat_weather_data_10513_Köln-Bonn Airport.csv.gz'),
-                ('D2968', 'Köln-Stammheim', 'meteostat_weather_data_D2968_Köln-Stammheim.csv.gz')
-            ]
-        }
-
-        data_transformer = DataTransformer()
-        data_transformer.extracted_data = extracted_data
-        data_transformer.transform()
-        transformed_data = data_transformer.transformed_data
-
-        assert_frame_equal(transformed_data["Mobilithek"], expected_data["Mobilithek"])
-        assert_frame_equal(transformed_data["Meteostat"], expected_data["Meteostat"])
-    
-    # Component Testing: DataLoader
-    def test_data_loader(self):
-        with open(os.path.join(os.getcwd(), 'tests', 'transformed_data.pkl'), 'rb') as file:
-            transformed_data = pickle.load(file)
-        
-        data_loader = DataLoader()
-        data_loader.transformed_data = transformed_data
-        data_loader.load()
-
-        conn = sqlite3.connect(DB_PATH)
-        expected_data_t1 = pd.read_sql_query("SELECT * FROM mobilithek_bicycle_traffic", conn)
-        expected_data_t2 = pd.read_sql_query("SELECT * FROM meteostat_weather_data", conn)
-        conn.close()
-
-        # Convert None to NaN in expected_data_t2
-        expected_data_t2 = expected_data_t2.where(pd.notnull(expected_data_t2), np.nan)
-        # Convert dtype of tsun_D2968 column from object to float
-        expected_data_t2["tsun_D2968"] = expected_data_t2["tsun_D2968"].astype(float)
-
-        assert_frame_equal(transformed_data["Mobilithek"], expected_data_t1)
-        assert_frame_equal(transformed_data["Meteostat"], expected_data_t2)
+# Python imports
+import unittest
+import json
+import calendar
+import gzip
+import pickle
+import sqlite3
+import sys
+import tempfile
+import importlib.util
+
+# Third party imports
+import numpy as np
+import pandas as pd
+import requests
+from pandas.testing import assert_frame_equal
+
+# Self imports
+from config.config_var import *
+from utils.service_factory import HelperService
+from etl.extract.data_extractor import DataExtractor
+from etl.extract.http_session import HttpSession
+from etl.extract.raw_cache import RawCache
+from etl.transform.data_transformer import DataTransformer
+from etl.load.data_loader import DataLoader
+from etl.load.data_sink import DataSink
+from etl.load.columnar_sink import ColumnarSink
+from utils.instrumentation import Instrumentation
+from benchmarks.data_generator import SyntheticDataGenerator
+from tests.fixture_server import FixtureServer
+from pipelines.task_scheduler import TaskScheduler
+from utils.checkpoint_store import CheckpointStore
+from etl.transform.frame_compactor import FrameCompactor
+from etl.transform.year_window_reader import YearWindowReader
+from etl.transform.station_merger import StationMerger
+
+
+class TestComponent(unittest.TestCase):
+
+    # Component Testing: HelperService
+    def test_helper_service(self):
+        with open(SOURCE_INFO_PATH, 'r') as file:
+            expected_data = json.load(file)
+
+        helper_service = HelperService()
+        hs_load_json = helper_service.load_json(SOURCE_INFO_PATH)
+
+        self.assertEqual(hs_load_json, expected_data)
+
+        # the rows for executemany: Python values, missing values (NaN, None, <NA>) as None
+        data_df = pd.DataFrame({'date': ['January-2009', None, 'March-2009'], 'count': pd.array([1, None, 3], dtype='Int64'),
+                                'tavg': np.array([1.5, np.nan, 2.0], dtype='float32')})
+        row_batches = list(helper_service.get_row_batches(data_df, 2))
+        self.assertEqual(row_batches, [[('January-2009', 1, 1.5), (None, None, None)], [('March-2009', 3, 2.0)]])
+        self.assertEqual([type(value) for value in row_batches[0][0]], [str, int, float])
+    
+    # Component Testing: DataExtractor
+    def test_data_extractor(self):
+        expected_data = {
+            'Mobilithek': [
+                ('2009', 'mobilithek_bicycle_traffic_2009.csv'),
+                ('2010', 'mobilithek_bicycle_traffic_2010.csv'),
+                ('2011', 'mobilithek_bicycle_traffic_2011.csv'),
+                ('2012', 'mobilithek_bicycle_traffic_2012.csv'),
+                ('2013', 'mobilithek_bicycle_traffic_2013.csv'),
+                ('2014', 'mobilithek_bicycle_traffic_2014.csv'),
+                ('2015', 'mobilithek_bicycle_traffic_2015.csv'),
+                ('2016', 'mobilithek_bicycle_traffic_2016.csv'),
+                ('2017', 'mobilithek_bicycle_traffic_2017.csv'),
+                ('2018', 'mobilithek_bicycle_traffic_2018.csv'),
+                ('2019', 'mobilithek_bicycle_traffic_2019.csv'),
+                ('2020', 'mobilithek_bicycle_traffic_2020.csv'),
+                ('2021', 'mobilithek_bicycle_traffic_2021.csv'),
+                ('2022', 'mobilithek_bicycle_traffic_2022.csv')
+            ],
+            'Meteostat': [
+                ('10513', 'Köln-Bonn Airport', 'meteostat_weather_data_10513_Köln-Bonn Airport.csv.gz'),
+                ('D2968', 'Köln-Stammheim', 'meteostat_weather_data_D2968_Köln-Stammheim.csv.gz')
+            ]
+        }
+
+        with open(SOURCE_INFO_PATH, 'r') as file:
+            source_info = json.load(file)
+
+        # the source files are served by the local fixture server (synthetic stand-ins), no network is needed
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fixture_server = FixtureServer(recordings_dir=os.path.join(temp_dir, 'recordings'))
+            fixture_server.seed(source_info)
+            raw_dir = os.path.join(temp_dir, 'raw')
+            os.makedirs(raw_dir)
+
+            with fixture_server:
+                data_extractor = DataExtractor(use_raw_cache=False, mirror_url=fixture_server.url, raw_dir=raw_dir)
+                data_extractor.source_info = source_info
+                data_extractor.extract()
+                extracted_data = data_extractor.extracted_data
+
+            self.assertEqual(extracted_data, expected_data)
+            self.assertEqual(sorted(os.listdir(raw_dir)),
+                             sorted(file_info[-1] for files_list in expected_data.values() for file_info in files_list))
+    
+    # Component Testing: HttpSession
+    def test_http_session(self):
+        http_session = HttpSession(max_retries=2, backoff_base=0.01)
+        attempts = []
+
+        # transient failures are retried until the operation succeeds
+        def flaky_operation():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise requests.exceptions.ConnectionError("connection reset")
+            return "done"
+
+        self.assertEqual(http_session.retry(flaky_operation), "done")
+        self.assertEqual(len(attempts), 3)
+
+        # a permanent HTTP error is raised without retrying
+        response = requests.Response()
+        response.status_code = 404
+        attempts.clear()
+
+        def missing_operation():
+            attempts.append(1)
+            raise requests.exceptions.HTTPError("404 Client Error", response=response)
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            http_session.retry(missing_operation)
+        self.assertEqual(len(attempts), 1)
+        http_session.close()
+    
+    # Component Testing: RawCache
+    def test_raw_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            raw_cache = RawCache(cache_dir=os.path.join(temp_dir, 'cache'), max_bytes=10)
+
+            for name, content in [('old.csv', b'2009;1;2'), ('new.csv', b'2022;3;4')]:
+                with open(os.path.join(temp_dir, name), 'wb') as file:
+                    file.write(content)
+                raw_cache.store('http://example.org/' + name, os.path.join(temp_dir, name), etag='"' + name + '"')
+
+            # the least recently used object is evicted once the cache exceeds max_bytes
+            self.assertIsNone(raw_cache.get_entry('http://example.org/old.csv'))
+            self.assertEqual(raw_cache.get_validators('http://example.org/new.csv'), {'If-None-Match': '"new.csv"'})
+
+            # the cached copy survives the deletion of the downloaded file and can be placed again
+            os.remove(os.path.join(temp_dir, 'new.csv'))
+            self.assertTrue(raw_cache.materialize('http://example.org/new.csv', os.path.join(temp_dir, 'new.csv')))
+            with open(os.path.join(temp_dir, 'new.csv'), 'rb') as file:
+                self.assertEqual(file.read(), b'2022;3;4')
+
+            # the index is persisted across instances
+            self.assertIsNotNone(RawCache(cache_dir=os.path.join(temp_dir, 'cache')).get_entry('http://example.org/new.csv'))
+    
+    # Component Testing: DataTransformer (recorded source files against the golden transformed data)
+    def test_data_transformer(self):
+        with open(SOURCE_INFO_PATH, 'r') as file:
+            source_info = json.load(file)
+        with open(os.path.join(os.getcwd(), 'tests', 'transformed_data.pkl'), 'rb') as file:
+            expected_data = pickle.load(file)
+
+        # the recordings of the real files in tests/fixtures/recordings, served offline
+        fixture_server = FixtureServer()
+        if not fixture_server.has_recordings(source_info):
+            self.skipTest("the source files are not recorded, run python -m tests.fixture_server record once")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            raw_dir = os.path.join(temp_dir, 'raw')
+            os.makedirs(raw_dir)
+
+            with fixture_server:
+                data_extractor = DataExtractor(use_raw_cache=False, mirror_url=fixture_server.url, raw_dir=raw_dir)
+                data_extractor.source_info = source_info
+                data_extractor.extract()
+
+            data_transformer = DataTransformer(raw_dir=raw_dir)
+            data_transformer.source_info = source_info
+            data_transformer.extracted_data = data_extractor.extracted_data
+            data_transformer.transform()
+
+        assert_frame_equal(data_transformer.transformed_data["Mobilithek"], expected_data["Mobilithek"])
+        assert_frame_equal(data_transformer.transformed_data["Meteostat"], expected_data["Meteostat"])
+
+    # Component Testing: DataTransformer (process pool against serial execution, synthetic files)
+    def test_data_transformer_parallel(self):
+        with open(SOURCE_INFO_PATH, 'r') as file:
+            source_info = json.load(file)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fixture_server = FixtureServer(recordings_dir=os.path.join(temp_dir, 'recordings'))
+            fixture_server.seed(source_info)
+            raw_dir = os.path.join(temp_dir, 'raw')
+            os.makedirs(raw_dir)
+
+            with fixture_server:
+                data_extractor = DataExtractor(use_raw_cache=False, mirror_url=fixture_server.url, raw_dir=raw_dir)
+                data_extractor.source_info = source_info
+                data_extractor.extract()
+                extracted_data = data_extractor.extracted_data
+
+            # the process pool and the serial execution must produce the same frames
+            transformed_frames = list()
+            for parallel in (True, False):
+                data_transformer = DataTransformer(parallel=parallel, max_workers=4, raw_dir=raw_dir)
+                data_transformer.source_info = source_info
+                data_transformer.extracted_data = extracted_data
+                data_transformer.transform()
+                transformed_frames.append(data_transformer.transformed_data)
+
+            for source in ["Mobilithek", "Meteostat"]:
+                assert_frame_equal(transformed_frames[0][source], transformed_frames[1][source])
+            mobilithek_df = transformed_frames[0]["Mobilithek"].set_index('Date')
+            meteostat_df = transformed_frames[0]["Meteostat"].set_index('date')
+
+            # the counts read from the raw text, a missing count ('', '-') or station is 0
+            self.assertEqual(len(mobilithek_df), 168)
+            for year, file_name in extracted_data["Mobilithek"]:
+                with open(os.path.join(raw_dir, file_name), 'rb') as file:
+                    content = file.read().decode('utf-8-sig' if 2016 <= int(year) <= 2020 else 'latin-1')
+                rows = [line.split(';') for line in content.splitlines()]
+                for month, row in enumerate([row for row in rows[1:] if row[0] != 'Jahressumme'], start=1):
+                    expected_counts = {station: int(count.replace('.', '')) if count not in ('', '-') else 0
+                                       for station, count in zip(rows[0][1:], row[1:])}
+                    counts = mobilithek_df.loc[f"{calendar.month_name[month]}-{year}"]
+                    self.assertEqual(counts[list(expected_counts)].tolist(), list(expected_counts.values()))
+                    self.assertEqual(counts.drop(list(expected_counts)).sum(), 0)
+
+            # the monthly weather within the year window, a missing value is NaN
+            self.assertEqual(len(meteostat_df), 168)
+            for station_id, _, file_name in extracted_data["Meteostat"]:
+                with gzip.open(os.path.join(raw_dir, file_name), 'rt') as file:
+                    rows = [line.split(',') for line in file.read().splitlines()]
+                window_rows = [row for row in rows if 2009 <= int(row[0]) <= 2022]
+                labels = [f"{calendar.month_name[int(row[1])]}-{row[0]}" for row in window_rows]
+                expected_tavg = [float(row[2]) if row[2] else np.nan for row in window_rows]
+                np.testing.assert_array_equal(meteostat_df.loc[labels, f'tavg_{station_id}'], expected_tavg)
+    
+    # Component Testing: DataTransformer (Mobilithek counts with thousands separators)
+    def test_mobilithek_counts(self):
+        counts = [("1.001", "463"), ("46.319", "-"), ("99.999", "0"), ("1.000", "2.300"), ("", "999")]
+        expected_counts = [[1001, 463], [46319, 0], [99999, 0], [1000, 2300], [0, 999]]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, 'mobilithek_bicycle_traffic_2016.csv')
+            with open(file_path, 'w', encoding='utf-8-sig') as file:
+                file.write("Monat;Station A;Station B\n")
+                file.write("".join(f"Monat {month};{a};{b}\n" for month, (a, b) in enumerate(counts, start=1)))
+
+            data_transformer = DataTransformer(raw_dir=temp_dir, memory_budget=1)
+            data_df = data_transformer._transform_mobilithek_file("2016", file_path)
+            chunks = list(data_transformer._transform_file_chunks("Mobilithek", ("2016", os.path.basename(file_path))))
+
+        self.assertEqual(data_df[['Station A', 'Station B']].values.tolist(), expected_counts)
+        self.assertEqual(list(data_df.dtypes[1:]), [np.dtype('int64')] * 2)
+        self.assertEqual(list(data_df['Date']), ["January-2016", "February-2016", "March-2016", "April-2016", "May-2016"])
+        assert_frame_equal(pd.concat(chunks, ignore_index=True), data_df)
+
+    # Component Testing: DataLoader
+    def test_data_loader(self):
+        with open(os.path.join(os.getcwd(), 'tests', 'transformed_data.pkl'), 'rb') as file:
+            transformed_data = pickle.load(file)
+        
+        data_loader = DataLoader()
+        data_loader.transformed_data = transformed_data
+        data_loader.load()
+
+        conn = sqlite3.connect(DB_PATH)
+        expected_data_t1 = pd.read_sql_query("SELECT * FROM mobilithek_bicycle_traffic", conn)
+        expected_data_t2 = pd.read_sql_query("SELECT * FROM meteostat_weather_data", conn)
+        conn.close()
+
+        # Convert None to NaN in expected_data_t2
+        expected_data_t2 = expected_data_t2.where(pd.notnull(expected_data_t2), np.nan)
+        # Convert dtype of tsun_D2968 column from object to float
+        expected_data_t2["tsun_D2968"] = expected_data_t2["tsun_D2968"].astype(float)
+
+        assert_frame_equal(transformed_data["Mobilithek"], expected_data_t1)
+        assert_frame_equal(transformed_data["Meteostat"], expected_data_t2)
+    
+    # Component Testing: DataLoader (incremental)
+    def test_data_loader_incremental(self):
+        with open(os.path.join(os.getcwd(), 'tests', 'transformed_data.pkl'), 'rb') as file:
+            transformed_data = pickle.load(file)
+        
+        extracted_data = {'Mobilithek': [(str(year), f'mobilithek_bicycle_traffic_{year}.csv') for year in range(2009, 2023)]}
+        partition_hashes = {'Mobilithek': {str(year): f'hash-{year}' for year in range(2009, 2023)}}
+
+        data_loader = DataLoader()
+        data_loader.partition_hashes = partition_hashes
+        data_loader.transformed_data = transformed_data
+        data_loader.load()
+
+        # only the raw file of 2022 changed since the last load
+        partition_hashes['Mobilithek']['2022'] = 'hash-2022-updated'
+        data_loader = DataLoader(incremental=True)
+        data_loader.partition_hashes = partition_hashes
+        changed_data = data_loader.get_changed_partitions(extracted_data)
+
+        self.assertEqual(changed_data, {'Mobilithek': [('2022', 'mobilithek_bicycle_traffic_2022.csv')]})
+
+        expected_data = transformed_data["Mobilithek"].copy()
+        rows_2022 = expected_data['Date'].str.endswith('-2022')
+        expected_data.loc[rows_2022, expected_data.columns[1:]] += 1
+
+        data_loader.transformed_data = {'Mobilithek': expected_data[rows_2022].reset_index(drop=True)}
+        data_loader.load()
+
+        conn = sqlite3.connect(DB_PATH)
+        loaded_data = pd.read_sql_query("SELECT * FROM mobilithek_bicycle_traffic", conn)
+        conn.close()
+
+        assert_frame_equal(expected_data, loaded_data)
+        self.assertEqual(data_loader.get_changed_partitions(extracted_data), {'Mobilithek': []})
+
+    # Component Testing: DataLoader (upserts of more keys than the SQL variable limit of stock SQLite builds)
+    @unittest.skipUnless(hasattr(sqlite3.Connection, 'setlimit'), "Connection.setlimit needs Python 3.11")
+    def test_data_loader_upsert_keys(self):
+        keys = [f'{hour}-2022' for hour in range(40000)]
+        mobilithek_df = pd.DataFrame({'Date': keys, 'Station A': range(40000)})
+        meteostat_df = pd.DataFrame({'date': keys, 'tavg_10513': np.arange(40000) / 10})
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            conn = sqlite3.connect(os.path.join(temp_dir, 'upsert.sqlite'))
+            conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 32766)
+
+            data_loader = DataLoader(db_path=os.path.join(temp_dir, 'upsert.sqlite'))
+            for source, data_df in [('Mobilithek', mobilithek_df), ('Meteostat', meteostat_df)]:
+                data_loader._upsert_data(conn, source, data_df)
+                # the second upsert of a partition without the first key clears the row (or the values) of the key
+                data_loader._upsert_data(conn, source, data_df.iloc[1:])
+            conn.commit()
+
+            mobilithek_rows = conn.execute('SELECT COUNT(*) FROM mobilithek_bicycle_traffic').fetchone()[0]
+            meteostat_nulls = conn.execute('SELECT COUNT(*) FROM meteostat_weather_data '
+                                           'WHERE tavg_10513 IS NULL').fetchone()[0]
+            conn.close()
+
+        self.assertEqual(mobilithek_rows, 39999)
+        self.assertEqual(meteostat_nulls, 1)
+
+    
+    # Component Testing: DataLoader (normalized)
+    def test_data_loader_normalized(self):
+        with open(os.path.join(os.getcwd(), 'tests', 'transformed_data.pkl'), 'rb') as file:
+            transformed_data = pickle.load(file)
+
+        data_loader = DataLoader(normalized=True)
+        data_loader.transformed_data = transformed_data
+        data_loader.load()
+
+        conn = sqlite3.connect(DB_PATH)
+        expected_data_t1 = pd.read_sql_query("SELECT * FROM mobilithek_bicycle_traffic", conn)
+        expected_data_t2 = pd.read_sql_query("SELECT * FROM meteostat_weather_data", conn)
+        summer_tavg = pd.read_sql_query("SELECT month, value FROM meteostat_weather_values "
+                                        "WHERE station_id = '10513' AND metric = 'tavg' "
+                                        "AND month BETWEEN 201506 AND 201908 AND month % 100 BETWEEN 6 AND 8", conn)
+        conn.close()
+
+        # the compatibility views rebuild the wide tables
+        expected_data_t2 = expected_data_t2.astype({column: float for column in expected_data_t2.columns[1:]})
+        assert_frame_equal(transformed_data["Mobilithek"], expected_data_t1)
+        assert_frame_equal(transformed_data["Meteostat"], expected_data_t2)
+
+        summer_rows = transformed_data["Meteostat"]['date'].str.match(r'(June|July|August)-(2015|2016|2017|2018|2019)')
+        self.assertEqual(summer_tavg['value'].tolist(), transformed_data["Meteostat"].loc[summer_rows, 'tavg_10513'].tolist())
+
+        # station ids are quoted in the view SQL, a quote in an id neither breaks nor escapes it
+        quoted_data = {"Meteostat": transformed_data["Meteostat"].rename(columns={'tavg_10513': "tavg_O'Hare"})}
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data_loader = DataLoader(normalized=True, analytics=False, db_path=os.path.join(temp_dir, 'quoted.sqlite'))
+            data_loader.transformed_data = quoted_data
+            data_loader.load()
+
+            conn = sqlite3.connect(data_loader.db_path)
+            view_data = pd.read_sql_query("SELECT * FROM meteostat_weather_data", conn)
+            conn.close()
+        # the view has a column for every station and metric, the stations without a metric are NULL
+        view_data = view_data[quoted_data["Meteostat"].columns]
+        assert_frame_equal(view_data.astype({column: float for column in view_data.columns[1:]}), quoted_data["Meteostat"])
+    
+    # Component Testing: DataLoader (analysis tables)
+    def test_data_loader_analytics(self):
+        with open(os.path.join(os.getcwd(), 'tests', 'transformed_data.pkl'), 'rb') as file:
+            transformed_data = pickle.load(file)
+
+        data_loader = DataLoader(analytics=True)
+        data_loader.transformed_data = transformed_data
+        data_loader.load()
+
+        conn = sqlite3.connect(DB_PATH)
+        month_data = pd.read_sql_query("SELECT * FROM bicycle_weather_month", conn)
+        season_data = pd.read_sql_query("SELECT * FROM bicycle_weather_by_season", conn)
+        conn.close()
+
+        expected_traffic = transformed_data["Mobilithek"][ANALYTICS_TRAFFIC_STATIONS].sum(axis=1)
+        self.assertEqual(month_data['total_traffic'].tolist(), expected_traffic.tolist())
+        self.assertEqual(month_data['date'].tolist(), transformed_data["Mobilithek"]['Date'].tolist())
+
+        expected_seasons = month_data.groupby('season')['total_traffic'].sum()
+        self.assertEqual(season_data.set_index('season')['total_traffic_sum'].to_dict(), expected_seasons.to_dict())
+    
+    # Component Testing: ColumnarSink
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_columnar_sink(self):
+        with open(os.path.join(os.getcwd(), 'tests', 'transformed_data.pkl'), 'rb') as file:
+            transformed_data = pickle.load(file)
+
+        with tempfile.TemporaryDirectory() as root_dir:
+            columnar_sink = ColumnarSink(root_dir=root_dir)
+            columnar_sink.write(transformed_data)
+
+            mobilithek_data = columnar_sink.read("Mobilithek", filters=[("year", "=", 2015)])
+            expected_data = transformed_data["Mobilithek"]
+            expected_data = expected_data[expected_data['Date'].str.endswith('-2015')].reset_index(drop=True)
+            assert_frame_equal(mobilithek_data.drop(columns='year'), expected_data)
+
+            meteostat_data = columnar_sink.read("Meteostat", filters=[("station", "=", "10513")])
+            self.assertEqual(list(meteostat_data['station'].unique()), ['10513'])
+            np.testing.assert_array_equal(meteostat_data['tavg'], transformed_data["Meteostat"]['tavg_10513'])
+
+        # a sink without write fails when it is created, not at load time
+        class IncompleteSink(DataSink):
+            name = "incomplete"
+
+        with self.assertRaises(TypeError):
+            IncompleteSink()
+
+    # Component Testing: Instrumentation
+    def test_instrumentation(self):
+        with tempfile.TemporaryDirectory() as report_dir:
+            instrumentation = Instrumentation(enabled=True, trace_memory=True, profile_stages=True, report_dir=report_dir)
+
+            with instrumentation.span("pipeline", kind="pipeline"):
+                with instrumentation.span("transform") as stage_span:
+                    data = [list(range(1000)) for _ in range(100)]
+                    stage_span.add(rows=len(data))
+                    instrumentation.record(stage_span, "file.csv", wall_seconds=0.5, bytes_read=2048, rows=12)
+
+            with open(instrumentation.write_report(), 'r') as file:
+                report = json.load(file)
+
+            pipeline_span = report["spans"]
+            stage_span = pipeline_span["children"][0]
+            self.assertEqual((pipeline_span["kind"], stage_span["name"], stage_span["rows"]), ("pipeline", "transform", 100))
+            self.assertEqual(stage_span["children"][0]["bytes_read"], 2048)
+            self.assertGreaterEqual(pipeline_span["peak_memory_bytes"], stage_span["peak_memory_bytes"])
+            self.assertGreater(stage_span["peak_memory_bytes"], 0)
+            self.assertTrue(os.path.exists(stage_span["attributes"]["profile_path"]))
+
+    # Component Testing: SyntheticDataGenerator
+    def test_synthetic_data_generator(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            source_info = SyntheticDataGenerator(output_dir, scale=2).generate()
+            data_transformer = DataTransformer()
+
+            for year in (2009, 2016, 2022):
+                data_df = data_transformer._transform_mobilithek_file(
+                    str(year), os.path.join(output_dir, f'mobilithek_bicycle_traffic_{year}.csv'))
+                self.assertEqual(len(data_df), 12)
+                self.assertEqual(data_df['Date'].iloc[0], f'January-{year}')
+                self.assertTrue((data_df[data_df.columns[1:]] >= 0).all().all())
+
+            stations = source_info['data_sources'][1]['stations']
+            self.assertEqual(len(stations), 4)
+            data_df = data_transformer._transform_meteostat_file(
+                stations[0]['station_id'], os.path.join(output_dir, f"{stations[0]['station_id']}.csv.gz"))
+            self.assertEqual(len(data_df), 14 * 12)
+
+    # Component Testing: FixtureServer
+    def test_fixture_server(self):
+        with open(SOURCE_INFO_PATH, 'r') as file:
+            source_info = json.load(file)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fixture_server = FixtureServer(recordings_dir=os.path.join(temp_dir, 'recordings'), latency=0.01)
+            fixture_server.seed(source_info)
+            url = fixture_server.source_urls(source_info)[0]
+            recorded_path = os.path.join(fixture_server.recordings_dir, 'files', fixture_server.index[url]['file'])
+
+            with fixture_server:
+                data_extractor = DataExtractor(use_raw_cache=False, mirror_url=fixture_server.url)
+                data_extractor.raw_cache = RawCache(cache_dir=os.path.join(temp_dir, 'cache'))
+                mirror_url = data_extractor._get_mirror_url(url)
+                output_path = os.path.join(temp_dir, 'file.csv')
+
+                # full download, then a conditional request answered with 304
+                self.assertEqual(data_extractor._download_data(mirror_url, output_path)['status'], 'downloaded')
+                self.assertEqual(data_extractor._download_data(mirror_url, output_path)['status'], 'not_modified')
+                self.assertEqual(fixture_server.requests_log[-1][1].get('If-None-Match'), fixture_server.index[url]['etag'])
+
+                # a partial download is resumed with a Range request
+                with open(recorded_path, 'rb') as file:
+                    content = file.read()
+                with open(output_path + '.part', 'wb') as file:
+                    file.write(content[:100])
+                with open(output_path + '.part.validator', 'w') as file:
+                    file.write(fixture_server.index[url]['etag'])
+
+                data_extractor.raw_cache = None
+                result = data_extractor._download_data(mirror_url, output_path)
+                self.assertEqual((result['status'], result['resumed_from']), ('downloaded', 100))
+                with open(output_path, 'rb') as file:
+                    self.assertEqual(file.read(), content)
+
+                self.assertEqual(requests.get(fixture_server.url + '/replay/https/example.org/missing.csv').status_code, 404)
+
+    # Component Testing: TaskScheduler
+    def test_task_scheduler(self):
+        def fail():
+            sys.exit(1)
+
+        task_scheduler = TaskScheduler(max_workers=2)
+        task_scheduler.add_task("extract:A", lambda: 1)
+        task_scheduler.add_task("extract:B", fail)
+        task_scheduler.add_task("load:A", lambda: task_scheduler.tasks["extract:A"].result + 1, ["extract:A"])
+        task_scheduler.add_task("load:B", lambda: 0, ["extract:B"])
+        task_scheduler.add_task("analytics", lambda: 0, ["load:A", "load:B"])
+        tasks = task_scheduler.run()
+
+        # the failing branch does not cancel the other one, its dependents are skipped
+        self.assertEqual({name: task.status for name, task in tasks.items()},
+                         {"extract:A": "done", "extract:B": "failed", "load:A": "done",
+                          "load:B": "skipped", "analytics": "skipped"})
+        self.assertEqual(tasks["load:A"].result, 2)
+        self.assertEqual(tasks["extract:B"].error, "SystemExit: 1")
+        self.assertEqual([task.name for task in task_scheduler.get_failed_tasks()], ["extract:B", "load:B", "analytics"])
+
+        task_scheduler = TaskScheduler()
+        task_scheduler.add_task("load", lambda: 0, ["extract"])
+        with self.assertRaises(ValueError):
+            task_scheduler.run()
+
+    # Component Testing: CheckpointStore
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_checkpoint_store(self):
+        with open(os.path.join(os.getcwd(), 'tests', 'transformed_data.pkl'), 'rb') as file:
+            transformed_data = pickle.load(file)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            checkpoint_store = CheckpointStore(root_dir=os.path.join(temp_dir, 'checkpoints'), enabled=True)
+
+            # the transformed frames round-trip exactly
+            for source, source_merged_df in transformed_data.items():
+                key = checkpoint_store.get_key("transform", source, [["2009", "sha256"]])
+                checkpoint_store.save("transform", source, key, {"extracted_files": []}, source_merged_df)
+                assert_frame_equal(checkpoint_store.load("transform", source, key)["data"], source_merged_df)
+                self.assertIsNone(checkpoint_store.load("transform", source, checkpoint_store.get_key("other")))
+
+            # an extract checkpoint is invalid once a recorded file changed or its run completed
+            raw_path = os.path.join(temp_dir, 'raw.csv')
+            with open(raw_path, 'w') as file:
+                file.write("a;b\n")
+            file_stats = {"path": raw_path, "size": os.path.getsize(raw_path), "mtime_ns": os.stat(raw_path).st_mtime_ns}
+            checkpoint_store.save("extract", "Mobilithek", "key", {"extracted_files": [["2009", "raw.csv"]],
+                                                                     "files": [file_stats]})
+            self.assertEqual(checkpoint_store.load("extract", "Mobilithek", "key")["extracted_files"], [["2009", "raw.csv"]])
+
+            checkpoint_store.complete("extract")
+            self.assertIsNone(checkpoint_store.load("extract", "Mobilithek", "key", reuse_completed=False))
+            self.assertIsNotNone(checkpoint_store.load("extract", "Mobilithek", "key"))
+
+            with open(raw_path, 'a') as file:
+                file.write("1;2\n")
+            self.assertIsNone(checkpoint_store.load("extract", "Mobilithek", "key"))
+
+            self.assertEqual(len(checkpoint_store.inspect()), 3)
+            self.assertEqual(checkpoint_store.invalidate(stage="transform"), 2)
+            self.assertEqual([checkpoint["stage"] for checkpoint in checkpoint_store.inspect()], ["extract"])
+
+    # Component Testing: FrameCompactor
+    def test_frame_compactor(self):
+        with open(os.path.join(os.getcwd(), 'tests', 'transformed_data.pkl'), 'rb') as file:
+            transformed_data = pickle.load(file)
+
+        frame_compactor = FrameCompactor()
+        compact_data = {source: frame_compactor.compact(source_merged_df)
+                        for source, source_merged_df in transformed_data.items()}
+
+        self.assertEqual(compact_data["Mobilithek"]["Date"].dtype, np.uint32)
+        self.assertEqual(compact_data["Mobilithek"]["Date"].iloc[0], 200901)
+        self.assertTrue(all(dtype.kind == "u" for dtype in compact_data["Mobilithek"].dtypes))
+        self.assertTrue(all(dtype == np.float32 for dtype in compact_data["Meteostat"].dtypes[1:]))
+
+        # the compact frames are smaller and round-trip exactly to the current schema
+        for source, source_merged_df in transformed_data.items():
+            self.assertLess(frame_compactor.memory_usage(compact_data[source]),
+                            frame_compactor.memory_usage(source_merged_df))
+            assert_frame_equal(frame_compactor.expand(compact_data[source]), source_merged_df)
+
+        # float32 is not used where it loses precision
+        precise_df = pd.DataFrame({"date": ["January-2009", "February-2009"], "value": [0.123456789, 1.0]})
+        self.assertEqual(frame_compactor.compact(precise_df)["value"].dtype, np.float64)
+
+        # the loader writes compact frames in the current schema
+        data_loader = DataLoader()
+        data_loader.transformed_data = compact_data
+        data_loader.load()
+
+        conn = sqlite3.connect(DB_PATH)
+        loaded_data_t1 = pd.read_sql_query("SELECT * FROM mobilithek_bicycle_traffic", conn)
+        conn.close()
+
+        assert_frame_equal(loaded_data_t1, transformed_data["Mobilithek"])
+
+    # Component Testing: YearWindowReader
+    def test_year_window_reader(self):
+        lines = [f"{year},{month},{year + month / 10:.1f}" for year in range(1957, 2025) for month in range(1, 13)]
+        expected_lines = [line for line in lines if 2009 <= int(line[:4]) <= 2022]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, 'station.csv.gz')
+            with gzip.open(file_path, 'wt') as file:
+                file.write("\n".join(lines))
+
+            # small blocks, so lines are split across blocks and the window starts and ends inside a block
+            for rows_sorted in [False, True]:
+                reader = YearWindowReader(file_path, 2009, 2022, compression="gzip", rows_sorted=rows_sorted, block_size=100)
+                self.assertEqual(reader.read().decode().splitlines(), expected_lines)
+                self.assertEqual(reader.rows_kept, len(expected_lines))
+                reader.close()
+
+            data_df = DataTransformer()._read_data(file_path, header=None, names=["year", "month", "value"],
+                                                   compression="gzip", year_window=(2009, 2022), rows_sorted=True)
+            self.assertEqual(len(data_df), len(expected_lines))
+            self.assertEqual((data_df["year"].min(), data_df["year"].max()), (2009, 2022))
+
+        data_transformer = DataTransformer()
+        self.assertEqual(data_transformer.get_year_window("Meteostat"), tuple(METEOSTAT_YEAR_WINDOW))
+        data_transformer.source_info = {"data_sources": [{"source_name": "Meteostat", "year_window": [2015, 2016]}]}
+        self.assertEqual(data_transformer.get_year_window("Meteostat"), (2015, 2016))
+        self.assertIsNone(data_transformer.get_year_window("Mobilithek"))
+
+    # Component Testing: DataTransformer (daily and hourly Meteostat data, resampled while reading)
+    def test_meteostat_granularity(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for granularity in ["daily", "hourly"]:
+                source_info = SyntheticDataGenerator(temp_dir, first_year=2015, last_year=2016,
+                                                     weather_station_ids=["10513"],
+                                                     weather_granularity=granularity).generate()
+                meteostat_info = source_info["data_sources"][1]
+                file_path = os.path.join(temp_dir, '10513.csv.gz')
+                raw_df = pd.read_csv(file_path, header=None,
+                                     names=DataTransformer()._get_schema("Meteostat", None, granularity)["names"])
+                raw_df = raw_df[raw_df['date'].str[:4].isin(['2015', '2016'])]
+
+                for resample in [None, "monthly"]:
+                    data_transformer = DataTransformer()
+                    data_transformer.source_info = {"data_sources": [{**meteostat_info, "resample": resample}]}
+                    data_df = data_transformer._transform_meteostat_file("10513", file_path)
+                    # chunks of a few days, the months go on across chunks
+                    chunks = data_transformer._transform_meteostat_chunks("10513", file_path, 64)
+                    assert_frame_equal(pd.concat(chunks, ignore_index=True), data_df)
+
+                    if resample is None:
+                        self.assertEqual(len(data_df), len(raw_df))
+                        self.assertEqual(data_df['date'].iloc[-1],
+                                         "2016-12-31 23:00" if granularity == "hourly" else "2016-12-31")
+
+                        # the normalized and the analysis tables are monthly, the load stops and rolls back
+                        db_path = os.path.join(temp_dir, 'granularity.sqlite')
+                        for loader_options in [{'normalized': True}, {'analytics': True}]:
+                            data_loader = DataLoader(**loader_options, db_path=db_path)
+                            data_loader.transformed_data = {'Meteostat': data_df}
+                            with self.assertRaises(SystemExit):
+                                data_loader.load()
+                        data_loader = DataLoader(db_path=db_path)
+                        data_loader.transformed_data = {'Meteostat': data_df}
+                        data_loader.load()
+                    else:
+                        monthly_df = raw_df.groupby(raw_df['date'].str[:7], sort=False).agg(
+                            {"tavg" if granularity == "daily" else "temp": "mean", "prcp": "sum"})
+                        self.assertEqual(list(data_df['date'][:2]), ["January-2015", "February-2015"])
+                        self.assertEqual(len(data_df), 24)
+                        np.testing.assert_allclose(data_df['tavg_10513'], monthly_df.iloc[:, 0])
+                        np.testing.assert_allclose(data_df['prcp_10513'], monthly_df['prcp'])
+                        self.assertNotIn('wdir_10513', data_df.columns)
+
+        data_transformer = DataTransformer()
+        self.assertEqual(data_transformer.get_granularity("Meteostat"), (METEOSTAT_GRANULARITY, None))
+        data_transformer.source_info = {"data_sources": [{"source_name": "Meteostat", "granularity": "daily",
+                                                          "resample": "hourly"}]}
+        with self.assertRaises(SystemExit):
+            data_transformer.get_granularity("Meteostat")
+
+    # Component Testing: StationMerger
+    def test_station_merger(self):
+        station_frames = [
+            pd.DataFrame({'date': ["January-2009", "February-2009", "March-2009"], 'tavg_A': [1.0, 2.0, 3.0]}),
+            pd.DataFrame({'date': ["April-2009", "February-2009"], 'tavg_B': [4.0, 2.5], 'prcp_B': [40.0, 25.0]}),
+            pd.DataFrame({'date': ["January-2010"], 'tavg_C': [-1.0]})
+        ]
+
+        merged_df = StationMerger("monthly").merge(station_frames)
+
+        expected_df = pd.DataFrame({
+            'date': ["January-2009", "February-2009", "March-2009", "April-2009", "January-2010"],
+            'tavg_A': [1.0, 2.0, 3.0, np.nan, np.nan],
+            'tavg_B': [np.nan, 2.5, np.nan, 4.0, np.nan],
+            'prcp_B': [np.nan, 25.0, np.nan, 40.0, np.nan],
+            'tavg_C': [np.nan, np.nan, np.nan, np.nan, -1.0]
+        })
+        assert_frame_equal(merged_df, expected_df)
+
+        self.assertEqual(list(StationMerger("daily").get_time_keys(np.array(["2009-12-31", "2010-01-01"]))),
+                         [20091231, 20100101])
+        self.assertEqual(list(StationMerger("hourly").get_time_keys(np.array(["2009-12-31 23:00"]))), [2009123123])
@@ -1,44 +1,254 @@
-# Python imports
-import unittest
-import sqlite3
-
-# Third party imports
-import pandas as pd
-from pandas.testing import assert_frame_equal
-
-# Self imports
-from config.config_var import *
-from pipelines.data_pipeline import DataPipeline
-from utils.service_factory import HelperService
-from etl.extract.data_extractor import DataExtractor
-from etl.transform.data_transformer import DataTransformer
-from etl.load.data_loader import DataLoader
-
-
-class TestSystem(unittest.TestCase):
-
-    # System Testing: whole ETL pipeline
-    def test_data_pipeline(self):
-        etl_data_pipeline = DataPipeline(
-            helper_service = HelperService(),
-            extractor = DataExtractor(),
-            transformer = DataTransformer(),
-            loader = DataLoader()
-        )
-
-        etl_data_pipeline.run_pipeline()
-
-        self.assertTrue(os.path.exists(DB_PATH))
-
-        conn = sqlite3.connect(DB_PATH)
-
-        expected_row_counts = {
-            'mobilithek_bicycle_traffic': 168,
-            'meteostat_weather_data': 168
-        }
-
-        for table_name, expected_row_count in expected_row_counts.items():
-            db_data = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-            self.assertEqual(len(db_data), expected_row_count)
-        
-        conn.close()
+# Python imports
+import unittest
+import json
+import sqlite3
+import sys
+import tempfile
+import subprocess
+import importlib.util
+
+# Third party imports
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+# Self imports
+import main
+from config.config_var import *
+from pipelines.data_pipeline import DataPipeline
+from pipelines.city_runner import CityRunner
+from utils.service_factory import HelperService
+from etl.extract.data_extractor import DataExtractor
+from etl.transform.data_transformer import DataTransformer
+from etl.load.data_loader import DataLoader
+from utils.instrumentation import Instrumentation
+from utils.checkpoint_store import CheckpointStore
+from etl.extract.raw_cache import RawCache
+from tests.fixture_server import FixtureServer
+
+
+class TestSystem(unittest.TestCase):
+
+    # System Testing: whole ETL pipeline
+    def test_data_pipeline(self):
+        with open(SOURCE_INFO_PATH, 'r') as file:
+            source_info = json.load(file)
+
+        # the source files are served by the local fixture server (synthetic stand-ins), no network is needed
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fixture_server = FixtureServer(recordings_dir=os.path.join(temp_dir, 'recordings'))
+            fixture_server.seed(source_info)
+            raw_dir = os.path.join(temp_dir, 'raw')
+            os.makedirs(raw_dir)
+
+            with fixture_server:
+                etl_data_pipeline = DataPipeline(
+                    helper_service = HelperService(),
+                    extractor = DataExtractor(use_raw_cache=False, mirror_url=fixture_server.url, raw_dir=raw_dir),
+                    transformer = DataTransformer(raw_dir=raw_dir),
+                    loader = DataLoader(),
+                    instrumentation = Instrumentation(report_dir=os.path.join(temp_dir, 'run_reports')),
+                    checkpoint_store = CheckpointStore(root_dir=os.path.join(temp_dir, 'checkpoints'))
+                )
+
+                etl_data_pipeline.run_pipeline()
+
+        self.assertTrue(os.path.exists(DB_PATH))
+
+        conn = sqlite3.connect(DB_PATH)
+
+        expected_row_counts = {
+            'mobilithek_bicycle_traffic': 168,
+            'meteostat_weather_data': 168
+        }
+
+        for table_name, expected_row_count in expected_row_counts.items():
+            db_data = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
+            self.assertEqual(len(db_data), expected_row_count)
+        
+        conn.close()
+
+    # System Testing: streaming, task graph and chunked ETL pipelines (against the fixture server, offline)
+    def test_data_pipeline_modes(self):
+        with open(SOURCE_INFO_PATH, 'r') as file:
+            source_info = json.load(file)
+
+        table_names = ['mobilithek_bicycle_traffic', 'meteostat_weather_data', 'bicycle_weather_month']
+        modes = {'phased': {}, 'streaming': {'streaming': True}, 'task_graph': {'task_graph': True},
+                 'chunked': {'chunked': True}}
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fixture_server = FixtureServer(recordings_dir=os.path.join(temp_dir, 'recordings'))
+            fixture_server.seed(source_info)
+            raw_dir = os.path.join(temp_dir, 'raw')
+            os.makedirs(raw_dir)
+
+            tables = dict()
+            with fixture_server:
+                for mode, options in modes.items():
+                    etl_data_pipeline = DataPipeline(
+                        helper_service = HelperService(),
+                        extractor = DataExtractor(use_raw_cache=False, mirror_url=fixture_server.url, raw_dir=raw_dir),
+                        # a few rows per chunk in chunked mode, the partitions are loaded in several chunks, and
+                        # a process pool created while the download threads run in streaming and task graph mode
+                        transformer = DataTransformer(delete_raw_files=True, memory_budget=4096, max_workers=2,
+                                                      raw_dir=raw_dir),
+                        loader = DataLoader(analytics=True),
+                        instrumentation = Instrumentation(enabled=False),
+                        checkpoint_store = CheckpointStore(enabled=False),
+                        **options
+                    )
+                    etl_data_pipeline.run_pipeline()
+
+                    conn = sqlite3.connect(DB_PATH)
+                    for table_name in table_names:
+                        db_data = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
+                        # the streamed partitions arrive in any order, only the rows and columns must match
+                        tables[(mode, table_name)] = db_data.sort_values(db_data.columns[0]).reset_index(drop=True)
+                    conn.close()
+
+        for mode in ['streaming', 'task_graph', 'chunked']:
+            for table_name in table_names:
+                phased_df = tables[('phased', table_name)]
+                mode_df = tables[(mode, table_name)]
+                self.assertEqual(len(mode_df), 168)
+                assert_frame_equal(mode_df[phased_df.columns], phased_df)
+
+    # System Testing: rerun of a failed ETL pipeline resumes from the stage checkpoints
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_data_pipeline_resume(self):
+        class FailingDataLoader(DataLoader):
+            def load(self, source_names=None):
+                sys.exit(1)
+
+        with open(SOURCE_INFO_PATH, 'r') as file:
+            source_info = json.load(file)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fixture_server = FixtureServer(recordings_dir=os.path.join(temp_dir, 'recordings'))
+            fixture_server.seed(source_info)
+            checkpoint_store = CheckpointStore(root_dir=os.path.join(temp_dir, 'checkpoints'), enabled=True)
+            raw_dir = os.path.join(temp_dir, 'raw')
+            os.makedirs(raw_dir)
+
+            with fixture_server:
+                for data_loader in (FailingDataLoader(), DataLoader()):
+                    etl_data_pipeline = DataPipeline(
+                        helper_service = HelperService(),
+                        extractor = DataExtractor(use_raw_cache=False, mirror_url=fixture_server.url, raw_dir=raw_dir),
+                        transformer = DataTransformer(raw_dir=raw_dir),
+                        loader = data_loader,
+                        instrumentation = Instrumentation(enabled=False),
+                        checkpoint_store = checkpoint_store
+                    )
+                    requests_count = len(fixture_server.requests_log)
+
+                    if isinstance(data_loader, FailingDataLoader):
+                        with self.assertRaises(SystemExit):
+                            etl_data_pipeline.run_pipeline()
+                    else:
+                        etl_data_pipeline.run_pipeline()
+
+                # the rerun neither downloads nor transforms again
+                self.assertEqual(len(fixture_server.requests_log), requests_count)
+                self.assertEqual(etl_data_pipeline.transformer.file_stats, [])
+
+            self.assertTrue(all(checkpoint["completed"] for checkpoint in checkpoint_store.inspect()
+                                if checkpoint["stage"] == "extract"))
+
+        conn = sqlite3.connect(DB_PATH)
+        for table_name in ['mobilithek_bicycle_traffic', 'meteostat_weather_data']:
+            self.assertEqual(len(pd.read_sql_query(f"SELECT * FROM {table_name}", conn)), 168)
+        conn.close()
+
+    # System Testing: ETL pipelines of several cities in worker processes (against the fixture server, offline)
+    def test_city_runner(self):
+        with open(SOURCE_INFO_PATH, 'r') as file:
+            source_info = json.load(file)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fixture_server = FixtureServer(recordings_dir=os.path.join(temp_dir, 'recordings'))
+            fixture_server.seed(source_info)
+
+            # both cities use the same files, the raw cache is shared by their worker processes
+            city_configs = list()
+            for city in ["Köln", "Köln Süd"]:
+                source_info_path = os.path.join(temp_dir, f"{city}.json")
+                with open(source_info_path, 'w', encoding='utf-8') as file:
+                    json.dump(source_info, file)
+                city_configs.append({"city": city, "source_info_path": source_info_path})
+
+            with fixture_server:
+                city_runner = CityRunner(city_configs, output_dir=os.path.join(temp_dir, 'cities'), max_workers=2,
+                                         use_raw_cache=True, raw_cache_dir=os.path.join(temp_dir, 'raw_cache'),
+                                         mirror_url=fixture_server.url)
+                city_results = city_runner.run()
+
+            self.assertEqual([result["city"] for result in city_results], ["Köln", "Köln Süd"])
+            self.assertEqual(len({result["db_path"] for result in city_results}), 2)
+
+            for result in city_results:
+                self.assertEqual(result["status"], "succeeded")
+                self.assertEqual(list(result["stages"]), ["extract", "transform", "load"])
+
+                conn = sqlite3.connect(result["db_path"])
+                for table_name in ['mobilithek_bicycle_traffic', 'meteostat_weather_data']:
+                    self.assertEqual(len(pd.read_sql_query(f"SELECT * FROM {table_name}", conn)), 168)
+                conn.close()
+
+            # the cache index holds the files of both processes
+            raw_cache = RawCache(cache_dir=os.path.join(temp_dir, 'raw_cache'))
+            self.assertEqual(len(raw_cache.index), len(fixture_server.source_urls(source_info)))
+
+    # System Testing: stage commands of the command line, resumed from the checkpoints, and its lightweight commands
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_command_line(self):
+        with open(SOURCE_INFO_PATH, 'r') as file:
+            source_info = json.load(file)
+
+        # the pipeline runs with all its outputs in the temporary directory, not in the data directories
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path_options = ['--db-path', os.path.join(temp_dir, 'test.sqlite'),
+                            '--raw-dir', os.path.join(temp_dir, 'raw'),
+                            '--raw-cache-dir', os.path.join(temp_dir, 'raw_cache'),
+                            '--checkpoint-dir', os.path.join(temp_dir, 'checkpoints'),
+                            '--report-dir', os.path.join(temp_dir, 'run_reports')]
+            os.makedirs(os.path.join(temp_dir, 'raw'))
+            checkpoint_store = CheckpointStore(root_dir=os.path.join(temp_dir, 'checkpoints'), enabled=True)
+
+            fixture_server = FixtureServer(recordings_dir=os.path.join(temp_dir, 'recordings'))
+            fixture_server.seed(source_info)
+
+            with fixture_server:
+                options = ['--mirror-url', fixture_server.url, '--no-raw-cache'] + path_options
+                main.main(['extract'] + options)
+                requests_count = len(fixture_server.requests_log)
+                self.assertEqual({checkpoint["stage"] for checkpoint in checkpoint_store.inspect()}, {"extract"})
+
+                # the later stages resume the extraction instead of downloading again
+                main.main(['transform'] + options)
+                main.main(['load'] + options)
+                self.assertEqual(len(fixture_server.requests_log), requests_count)
+
+            checkpoints = checkpoint_store.inspect()
+            self.assertEqual({checkpoint["stage"] for checkpoint in checkpoints}, {"extract", "transform"})
+            self.assertTrue(all(checkpoint["completed"] for checkpoint in checkpoints
+                                if checkpoint["stage"] == "extract"))
+
+            conn = sqlite3.connect(os.path.join(temp_dir, 'test.sqlite'))
+            for table_name in ['mobilithek_bicycle_traffic', 'meteostat_weather_data']:
+                self.assertEqual(len(pd.read_sql_query(f"SELECT * FROM {table_name}", conn)), 168)
+            conn.close()
+
+            # status and cache neither import pandas nor the ETL modules
+            result = subprocess.run([sys.executable, '-c', "import sys, main; "
+                                     f"main.main(['status'] + {path_options!r}); main.main(['cache'] + {path_options!r}); "
+                                     "print(sorted({'pandas', 'requests', 'pipelines.data_pipeline'} & set(sys.modules)))"],
+                                    capture_output=True, text=True, check=True)
+            self.assertIn("meteostat_weather_data", result.stdout)
+            self.assertNotIn("No run reports", result.stdout)
+            self.assertEqual(result.stdout.splitlines()[-1], "[]")
+
+        # the run options are accepted without the run command, which is the default command
+        args = main.parse_arguments(['--chunked', '--no-raw-cache'])
+        self.assertEqual((args.command, args.chunked, args.raw_cache), ("run", True, False))
+        self.assertTrue(main.parse_arguments(['load', '--raw-cache']).raw_cache)
@@ -0,0 +1,285 @@
+"""
+Script Name: checkpoint_store.py
+Script Description: This script stores the outputs of the pipeline stages, so reruns resume from them
+Usage: python -m utils.checkpoint_store inspect|invalidate [--stage extract|transform] [--source NAME]
+       (run from the project directory)
+"""
+
+
+# Python imports
+from datetime import datetime
+from typing import Dict, List, Union, TYPE_CHECKING
+import os, sys, json, shutil, hashlib, argparse, importlib.util
+
+# Third party imports
+if TYPE_CHECKING:
+    # imported on first use, inspecting and invalidating the checkpoints does not need pandas
+    import pandas as pd
+
+# Self imports
+from config.config_var import *
+
+
+class CheckpointStore:
+    """
+    A class to represent the checkpoints of the pipeline stages.
+
+    Every stage output is checkpointed per source: the extract stage as a manifest of the extracted files,
+    the transform stage as the transformed frame in Arrow IPC (Feather) format, which is read back at
+    memory speed with its dtypes. A checkpoint is keyed by the SHA-256 of its inputs and configuration,
+    only the latest checkpoint of a stage and source is kept in `<root_dir>/<stage>/<source>/`.
+
+    An extract checkpoint can only be resumed until the run that wrote it completed, later runs download
+    again to see changes at the sources. A transform checkpoint is keyed by the content hashes of its raw
+    files and the transformation code, so it stays valid as long as they do not change. pyarrow is an
+    optional dependency, without it the checkpoints are disabled.
+
+    Attributes:
+        root_dir (str): The directory of the checkpoints.
+        compression (str): The compression codec of the Feather files ('lz4', 'zstd' or 'uncompressed').
+        enabled (bool): Whether checkpoints are written and resumed.
+
+    Methods:
+        get_key(*inputs) -> str: Returns the key of a checkpoint, the hash of its inputs and configuration.
+        save(stage: str, source: str, key: str, manifest: Dict, data_df: pd.DataFrame) -> str: Writes a checkpoint.
+        load(stage: str, source: str, key: str, reuse_completed: bool) -> Union[Dict, None]: Reads a valid checkpoint.
+        complete(stage: str) -> None: Marks the checkpoints of a stage as written by a completed run.
+        inspect() -> List: Returns the manifest and the validity of every checkpoint.
+        invalidate(stage: str, source: str) -> int: Deletes checkpoints.
+        _checkpoint_dir(stage: str, source: str) -> str: Returns the directory of a checkpoint.
+        _read_manifest(checkpoint_dir: str) -> Union[Dict, None]: Reads the manifest of a checkpoint.
+        _get_invalid_files(manifest: Dict) -> List: Returns the recorded files which are missing or changed.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+    DATA_FILE = "data.feather"
+
+    def __init__(self, root_dir: str = CHECKPOINT_PATH, compression: str = CHECKPOINT_COMPRESSION,
+                 enabled: bool = CHECKPOINT_ENABLED) -> None:
+        self.root_dir = root_dir
+        self.compression = compression
+        self.enabled = enabled and importlib.util.find_spec("pyarrow") is not None
+
+        if enabled and not self.enabled:
+            print("Error: pyarrow is not installed, the stage checkpoints are disabled")
+
+    def get_key(self, *inputs) -> str:
+        """
+        Returns the key of a checkpoint, the SHA-256 of its inputs and configuration.
+
+        Parameters:
+            *inputs: JSON serializable inputs, e.g. the source information, content hashes and settings.
+
+        Returns:
+            key (str): The hex digest of the inputs.
+        """
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def save(self, stage: str, source: str, key: str, manifest: Dict, data_df: 'pd.DataFrame' = None) -> str:
+        """
+        Writes a checkpoint, replacing the previous checkpoint of the stage and source.
+
+        The checkpoint is written into a temporary directory that replaces the previous one, so a run
+        failing while writing never leaves a half-written checkpoint behind.
+
+        Parameters:
+            stage (str): The name of the stage.
+            source (str): The name of the source.
+            key (str): The key of the checkpoint.
+            manifest (dict): The JSON serializable output of the stage, e.g. the extracted files.
+            data_df (pd.DataFrame, optional): The frame output of the stage.
+
+        Returns:
+            checkpoint_dir (str): The directory of the checkpoint, None if the checkpoints are disabled.
+        """
+        if not self.enabled:
+            return None
+
+        checkpoint_dir = self._checkpoint_dir(stage, source)
+        temp_dir = checkpoint_dir + ".tmp"
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+
+        manifest = {"stage": stage, "source": source, "key": key, "created_at": datetime.now().isoformat(timespec='seconds'),
+                    "completed": False, **manifest}
+        if data_df is not None:
+            data_df.reset_index(drop=True).to_feather(os.path.join(temp_dir, self.DATA_FILE), compression=self.compression)
+            # the frame metadata (e.g. the original schema of a compact frame) is not kept by Feather
+            manifest.update({"rows": len(data_df), "columns": len(data_df.columns), "attrs": data_df.attrs,
+                             "data_bytes": os.path.getsize(os.path.join(temp_dir, self.DATA_FILE))})
+
+        with open(os.path.join(temp_dir, self.MANIFEST_FILE), 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2, ensure_ascii=False)
+
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        os.replace(temp_dir, checkpoint_dir)
+
+        return checkpoint_dir
+
+    def load(self, stage: str, source: str, key: str, reuse_completed: bool = True) -> Union[Dict, None]:
+        """
+        Reads the checkpoint of a stage and source if it is valid for the key.
+
+        Parameters:
+            stage (str): The name of the stage.
+            source (str): The name of the source.
+            key (str): The key the checkpoint must have.
+            reuse_completed (bool, optional): Whether a checkpoint of a completed run is valid.
+
+        Returns:
+            manifest (dict/none): The manifest with the frame under 'data' (if any), None without valid checkpoint.
+        """
+        if not self.enabled:
+            return None
+
+        checkpoint_dir = self._checkpoint_dir(stage, source)
+        manifest = self._read_manifest(checkpoint_dir)
+
+        if (manifest is None or manifest["key"] != key or (manifest["completed"] and not reuse_completed)
+                or self._get_invalid_files(manifest)):
+            return None
+
+        if os.path.exists(os.path.join(checkpoint_dir, self.DATA_FILE)):
+            try:
+                import pandas as pd
+                manifest["data"] = pd.read_feather(os.path.join(checkpoint_dir, self.DATA_FILE))
+                manifest["data"].attrs.update(manifest.get("attrs", dict()))
+            except Exception as e:
+                print(f"Error: The {stage} checkpoint of {source} is unreadable and ignored- {str(e)}")
+                return None
+
+        return manifest
+
+    def complete(self, stage: str) -> None:
+        """
+        Marks the checkpoints of a stage as written by a completed run.
+
+        Parameters:
+            stage (str): The name of the stage.
+
+        Returns:
+            None
+        """
+        stage_dir = os.path.join(self.root_dir, stage)
+        if not self.enabled or not os.path.isdir(stage_dir):
+            return
+
+        for source in os.listdir(stage_dir):
+            manifest_path = os.path.join(stage_dir, source, self.MANIFEST_FILE)
+            manifest = self._read_manifest(os.path.join(stage_dir, source))
+            if manifest is not None and not manifest["completed"]:
+                manifest["completed"] = True
+                with open(manifest_path, 'w', encoding='utf-8') as file:
+                    json.dump(manifest, file, indent=2, ensure_ascii=False)
+
+    def inspect(self) -> List:
+        """
+        Returns the manifest and the validity of every checkpoint.
+
+        Parameters:
+            None
+
+        Returns:
+            checkpoints (list): The manifests with an added 'invalid_files' list, ordered by stage and source.
+        """
+        checkpoints = list()
+        if not os.path.isdir(self.root_dir):
+            return checkpoints
+
+        for stage in sorted(os.listdir(self.root_dir)):
+            stage_dir = os.path.join(self.root_dir, stage)
+            for source in sorted(os.listdir(stage_dir)) if os.path.isdir(stage_dir) else []:
+                manifest = self._read_manifest(os.path.join(stage_dir, source))
+                if manifest is not None:
+                    manifest["invalid_files"] = self._get_invalid_files(manifest)
+                    checkpoints.append(manifest)
+
+        return checkpoints
+
+    def invalidate(self, stage: str = None, source: str = None) -> int:
+        """
+        Deletes checkpoints, the next run computes their stages again.
+
+        Parameters:
+            stage (str, optional): The stage whose checkpoints are deleted, all the stages by default.
+            source (str, optional): The source whose checkpoints are deleted, all the sources by default.
+
+        Returns:
+            deleted (int): The number of deleted checkpoints.
+        """
+        deleted = 0
+
+        for manifest in self.inspect():
+            if (stage is None or manifest["stage"] == stage) and (source is None or manifest["source"] == source):
+                shutil.rmtree(self._checkpoint_dir(manifest["stage"], manifest["source"]))
+                deleted += 1
+
+        return deleted
+
+    def _checkpoint_dir(self, stage: str, source: str) -> str:
+        """
+        Returns the directory of the checkpoint of a stage and source.
+
+        Parameters:
+            stage (str): The name of the stage.
+            source (str): The name of the source.
+
+        Returns:
+            checkpoint_dir (str): The directory of the checkpoint.
+        """
+        return os.path.join(self.root_dir, stage, source)
+
+    def _read_manifest(self, checkpoint_dir: str) -> Union[Dict, None]:
+        """
+        Reads the manifest of a checkpoint.
+
+        Parameters:
+            checkpoint_dir (str): The directory of the checkpoint.
+
+        Returns:
+            manifest (dict/none): The manifest, None if it is missing or unreadable.
+        """
+        try:
+            with open(os.path.join(checkpoint_dir, self.MANIFEST_FILE), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _get_invalid_files(self, manifest: Dict) -> List:
+        """
+        Returns the files recorded in a manifest which are missing or changed (by size and modification time).
+
+        Parameters:
+            manifest (dict): The manifest of a checkpoint.
+
+        Returns:
+            invalid_files (list): The paths of the missing or changed files.
+        """
+        invalid_files = list()
+
+        for file_stats in manifest.get("files", list()):
+            if (not os.path.exists(file_stats["path"]) or os.path.getsize(file_stats["path"]) != file_stats["size"]
+                    or os.stat(file_stats["path"]).st_mtime_ns != file_stats["mtime_ns"]):
+                invalid_files.append(file_stats["path"])
+
+        return invalid_files
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the stage checkpoints of the pipeline")
+    parser.add_argument("command", choices=["inspect", "invalidate"], help="command to run")
+    parser.add_argument("--stage", default=None, help="stage of the checkpoints to invalidate (all by default)")
+    parser.add_argument("--source", default=None, help="source of the checkpoints to invalidate (all by default)")
+    args = parser.parse_args()
+
+    checkpoint_store = CheckpointStore(enabled=True)
+
+    if args.command == "inspect":
+        for checkpoint in checkpoint_store.inspect():
+            state = "invalid" if checkpoint["invalid_files"] else "completed" if checkpoint["completed"] else "resumable"
+            size = f", {checkpoint['rows']} rows, {checkpoint['data_bytes']} B" if "rows" in checkpoint else ""
+            print(f"{checkpoint['stage']:<10} {checkpoint['source']:<12} {checkpoint['key'][:12]}  "
+                  f"{checkpoint['created_at']}  {state}{size}")
+    else:
+        deleted = checkpoint_store.invalidate(args.stage, args.source)
+        print(f"Succeed: {deleted} checkpoint(s) invalidated")
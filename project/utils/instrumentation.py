@@ -0,0 +1,279 @@
+# Python imports
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List
+import os, sys, json, time, pstats, cProfile, tracemalloc
+
+# Third party imports
+
+# Self imports
+from config.config_var import *
+
+
+class Span:
+    """
+    A class to represent a measured operation of a pipeline run (the pipeline, a stage or a single file).
+
+    Attributes:
+        name (str): The name of the operation, e.g. 'extract' or 'mobilithek_bicycle_traffic_2009.csv'.
+        kind (str): The level of the operation: 'pipeline', 'stage' or 'file'.
+        attributes (dict): Free-form details of the operation, e.g. the source or the download status.
+        wall_seconds (float): The elapsed wall-clock time.
+        cpu_seconds (float): The CPU time of the process running the operation.
+        peak_memory_bytes (int): The peak traced Python memory, None when memory tracing is off.
+        bytes_downloaded (int): The bytes received over the network.
+        bytes_read (int): The bytes read from the disk.
+        bytes_written (int): The bytes written to the disk.
+        rows (int): The number of rows produced.
+        children (list): The nested spans.
+
+    Methods:
+        add(**counters) -> None: Adds to the counters (bytes_downloaded, bytes_read, bytes_written, rows).
+        to_dict() -> Dict: Returns the span and its children as a JSON serializable dictionary.
+    """
+
+    COUNTERS = ("bytes_downloaded", "bytes_read", "bytes_written", "rows")
+
+    def __init__(self, name: str, kind: str, **attributes) -> None:
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_memory_bytes = None
+        self.bytes_downloaded = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.rows = 0
+        self.children = list()
+
+    def add(self, **counters) -> None:
+        """
+        Adds to the counters of the span.
+
+        Parameters:
+            **counters: The increments by counter name, e.g. rows=12 or bytes_read=2048.
+
+        Returns:
+            None
+        """
+        for counter, value in counters.items():
+            if counter not in self.COUNTERS:
+                raise ValueError(f"Unknown span counter '{counter}'")
+            setattr(self, counter, getattr(self, counter) + int(value or 0))
+
+    def to_dict(self) -> Dict:
+        """
+        Returns the span and its children as a JSON serializable dictionary.
+
+        Parameters:
+            None
+
+        Returns:
+            span (dict): The measurements, counters, attributes and children of the span.
+        """
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "peak_memory_bytes": self.peak_memory_bytes,
+            **{counter: getattr(self, counter) for counter in self.COUNTERS},
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children]
+        }
+
+
+class Instrumentation:
+    """
+    A class to represent the instrumentation of a pipeline run.
+
+    Spans are opened as nested context managers (pipeline -> stage -> file) in the main thread, operations
+    measured elsewhere (download threads, transform worker processes) are attached afterwards with
+    `record`. Memory is measured with tracemalloc, which slows Python allocations down noticeably, so it
+    can be switched off. Stages can be profiled with cProfile, the statistics are written next to the report.
+
+    Attributes:
+        enabled (bool): Whether spans are measured at all.
+        trace_memory (bool): Whether the peak traced memory of the spans is measured.
+        profile_stages (bool): Whether every stage is profiled with cProfile.
+        report_dir (str): The directory of the JSON run reports and the profile statistics.
+        run_id (str): The timestamp identifying the run.
+        root (Span): The outermost span, None before the first span is opened.
+
+    Methods:
+        span(name: str, kind: str, **attributes) -> Iterator[Span]: Measures the enclosed block as a nested span.
+        record(parent: Span, name: str, kind: str, wall_seconds: float, cpu_seconds: float, **values) -> Span:
+            Attaches an operation measured elsewhere.
+        write_report(report_path: str) -> str: Writes the JSON run report.
+        summary() -> str: Formats the timings of the stages for the log output.
+        _write_profile(profile: cProfile.Profile, name: str) -> str: Writes the cProfile statistics of a stage.
+    """
+
+    def __init__(self, enabled: bool = INSTRUMENTATION_ENABLED,
+                 trace_memory: bool = INSTRUMENTATION_TRACE_MEMORY,
+                 profile_stages: bool = INSTRUMENTATION_PROFILE_STAGES,
+                 report_dir: str = INSTRUMENTATION_REPORT_PATH) -> None:
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.profile_stages = profile_stages
+        self.report_dir = report_dir
+        self.run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.root = None
+        self._stack = list()
+
+    @contextmanager
+    def span(self, name: str, kind: str = "stage", **attributes) -> Iterator[Span]:
+        """
+        Measures the enclosed block as a span nested in the currently open one.
+
+        Parameters:
+            name (str): The name of the operation.
+            kind (str, optional): The level of the operation: 'pipeline', 'stage' or 'file'.
+            **attributes: Free-form details of the operation.
+
+        Returns:
+            span (Iterator[Span]): The open span, its counters can be increased inside the block.
+        """
+        span = Span(name, kind, **attributes)
+        if not self.enabled:
+            yield span
+            return
+
+        if self._stack:
+            self._stack[-1].children.append(span)
+        else:
+            self.root = span
+
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            # the peak of the enclosing span so far is kept before the peak is reset for this span
+            if self._stack:
+                self._stack[-1].peak_memory_bytes = max(self._stack[-1].peak_memory_bytes or 0,
+                                                        tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        profile = cProfile.Profile() if self.profile_stages and kind == "stage" else None
+        self._stack.append(span)
+        started_at, cpu_started_at = time.perf_counter(), time.process_time()
+        if profile is not None:
+            profile.enable()
+
+        try:
+            yield span
+        finally:
+            if profile is not None:
+                profile.disable()
+            span.wall_seconds = time.perf_counter() - started_at
+            span.cpu_seconds = time.process_time() - cpu_started_at
+            self._stack.pop()
+
+            if self.trace_memory:
+                span.peak_memory_bytes = max(span.peak_memory_bytes or 0, tracemalloc.get_traced_memory()[1])
+                if self._stack:
+                    self._stack[-1].peak_memory_bytes = max(self._stack[-1].peak_memory_bytes or 0,
+                                                            span.peak_memory_bytes)
+            if started_tracing:
+                tracemalloc.stop()
+            if profile is not None:
+                span.attributes["profile_path"] = self._write_profile(profile, name)
+
+    def record(self, parent: Span, name: str, kind: str = "file", wall_seconds: float = 0.0,
+               cpu_seconds: float = 0.0, **values) -> Span:
+        """
+        Attaches an operation measured elsewhere (in a download thread or a worker process) to a span.
+
+        Parameters:
+            parent (Span): The span the operation belongs to.
+            name (str): The name of the operation.
+            kind (str, optional): The level of the operation.
+            wall_seconds (float, optional): The measured wall-clock time.
+            cpu_seconds (float, optional): The measured CPU time.
+            **values: The counters (bytes_downloaded, bytes_read, bytes_written, rows), anything else is an attribute.
+
+        Returns:
+            span (Span): The attached span.
+        """
+        span = Span(name, kind, **{key: value for key, value in values.items() if key not in Span.COUNTERS})
+        span.wall_seconds = wall_seconds or 0.0
+        span.cpu_seconds = cpu_seconds or 0.0
+        span.add(**{key: value for key, value in values.items() if key in Span.COUNTERS})
+
+        if self.enabled:
+            parent.children.append(span)
+
+        return span
+
+    def write_report(self, report_path: str = None) -> str:
+        """
+        Writes the JSON run report of the outermost span.
+
+        Parameters:
+            report_path (str, optional): The path of the report, `<report_dir>/run_<run_id>.json` by default.
+
+        Returns:
+            report_path (str): The path of the written report, None if nothing was measured.
+        """
+        if not self.enabled or self.root is None:
+            return None
+
+        report_path = report_path or os.path.join(self.report_dir, f"run_{self.run_id}.json")
+        report = {
+            "run_id": self.run_id,
+            "python": sys.version.split()[0],
+            "cpu_count": os.cpu_count(),
+            "trace_memory": self.trace_memory,
+            "spans": self.root.to_dict()
+        }
+
+        try:
+            os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+            with open(report_path, 'w') as file:
+                json.dump(report, file, indent=2, default=str)
+        except OSError as e:
+            print(f"Error: Issue occurred while writing the run report: {str(e)}")
+            return None
+
+        return report_path
+
+    def summary(self) -> str:
+        """
+        Formats the timings of the stages for the log output.
+
+        Parameters:
+            None
+
+        Returns:
+            summary (str): One line per stage with its wall time, CPU time and peak memory.
+        """
+        if self.root is None:
+            return ""
+
+        lines = list()
+        for span in [self.root] + self.root.children:
+            memory = f", peak {span.peak_memory_bytes / 2 ** 20:.1f} MiB" if span.peak_memory_bytes is not None else ""
+            lines.append(f"{span.name:<10} wall {span.wall_seconds:8.2f}s, cpu {span.cpu_seconds:8.2f}s{memory}, "
+                         f"{span.rows} rows, {span.bytes_downloaded} B downloaded, {span.bytes_read} B read, "
+                         f"{span.bytes_written} B written")
+
+        return "\n".join(lines)
+
+    def _write_profile(self, profile: cProfile.Profile, name: str) -> str:
+        """
+        Writes the cProfile statistics of a stage, they can be inspected with `python -m pstats <file>`.
+
+        Parameters:
+            profile (cProfile.Profile): The profiler of the stage.
+            name (str): The name of the stage.
+
+        Returns:
+            profile_path (str): The path of the statistics file.
+        """
+        profile_path = os.path.join(self.report_dir, f"run_{self.run_id}_{name}.prof")
+
+        os.makedirs(self.report_dir, exist_ok=True)
+        pstats.Stats(profile).dump_stats(profile_path)
+
+        return profile_path
@@ -1,47 +1,100 @@
-# Python imports
-from typing import Dict, Union
-import json, sys
-
-# Third party imports
-
-# Self imports
-
-
-class HelperService:
-    """
-    A class for providing external services for implementing ETL pipeline
-
-    Attributes:
-        None
-
-    Methods:
-        load_json(file_path: str) -> Dict/None: Loads a JSON file as a dictionary.
-    """
-
-    def __init__(self) -> None:
-        pass
-
-    def load_json(self, file_path: str) -> Union[Dict, None]:
-        """
-        Loads a JSON file as a dictionary.
-
-        Parameters:
-            file_path (str): Path to the JSON file.
-
-        Returns:
-            data (dict/none): Loaded JSON data as a dictionary.
-        """
-        try:
-            with open(file_path, 'r') as file:
-                data = json.load(file)
-            print(f"Succeed: JSON loaded successfully")
-            return data
-        except FileNotFoundError:
-            print(f"Error: File '{file_path}' not found.")
-            sys.exit(1)
-        except json.JSONDecodeError:
-            print(f"Error: Failed to decode JSON data in file '{file_path}'.")
-            sys.exit(1)
-        except Exception as e:
-            print(f"Error: An unexpected error occurred. {str(e)}")
-            sys.exit(1)
+# Python imports
+from typing import Dict, Iterator, List, Union, TYPE_CHECKING
+import json, sys, hashlib
+
+# Third party imports
+if TYPE_CHECKING:
+    # only the type hints need pandas, the light commands of main.py import this module without it
+    import pandas as pd
+
+# Self imports
+
+
+class HelperService:
+    """
+    A class for providing external services for implementing ETL pipeline
+
+    Attributes:
+        None
+
+    Methods:
+        load_json(file_path: str) -> Dict/None: Loads a JSON file as a dictionary.
+        file_sha256(file_path: str) -> str: Computes the SHA-256 hash of a file.
+        get_row_batches(data_df: pd.DataFrame, batch_size: int) -> Iterator[List]: Converts the rows of a frame
+            into batches of SQL parameter tuples.
+    """
+
+    def __init__(self) -> None:
+        pass
+
+    def load_json(self, file_path: str) -> Union[Dict, None]:
+        """
+        Loads a JSON file as a dictionary.
+
+        Parameters:
+            file_path (str): Path to the JSON file.
+
+        Returns:
+            data (dict/none): Loaded JSON data as a dictionary.
+        """
+        try:
+            with open(file_path, 'r') as file:
+                data = json.load(file)
+            print(f"Succeed: JSON loaded successfully")
+            return data
+        except FileNotFoundError:
+            print(f"Error: File '{file_path}' not found.")
+            sys.exit(1)
+        except json.JSONDecodeError:
+            print(f"Error: Failed to decode JSON data in file '{file_path}'.")
+            sys.exit(1)
+        except Exception as e:
+            print(f"Error: An unexpected error occurred. {str(e)}")
+            sys.exit(1)
+
+    def file_sha256(self, file_path: str) -> str:
+        """
+        Computes the SHA-256 hash of a file, reading it in chunks.
+
+        Parameters:
+            file_path (str): Path to the file.
+
+        Returns:
+            digest (str): The hex digest of the file content.
+        """
+        digest = hashlib.sha256()
+
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def get_row_batches(self, data_df: 'pd.DataFrame', batch_size: int) -> Iterator[List]:
+        """
+        Converts the rows of a frame into batches of parameter tuples for executemany, column by column.
+
+        Every column of a batch is converted with a single tolist() into Python values, only the missing
+        values of the columns which have any are replaced with None, so the frame is never copied into
+        Python objects as a whole.
+
+        Parameters:
+            data_df (pd.DataFrame): The rows to convert.
+            batch_size (int): The number of rows of a batch.
+
+        Returns:
+            batches (Iterator[List]): Lists of at most batch_size row tuples, missing values as None.
+        """
+        for start in range(0, len(data_df), batch_size):
+            batch_df = data_df.iloc[start:start + batch_size]
+            columns = list()
+
+            for position in range(batch_df.shape[1]):
+                values = batch_df.iloc[:, position]
+                column_values = values.tolist()
+                if values.hasnans:
+                    for row in values.isna().to_numpy().nonzero()[0]:
+                        column_values[row] = None
+                columns.append(column_values)
+
+            yield list(zip(*columns))